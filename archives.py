@@ -0,0 +1,185 @@
+from pathlib import Path
+import threading
+import struct
+import mmap
+import zlib
+import zipfile
+
+from errors import *
+
+# ################################## Variables ###################################
+
+# Entries the read layer can serve in place: stored ones are sliced from the mapping,
+# deflated ones are inflated from it.
+_supported_methods: tuple[int, ...] = (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED)
+
+_local_header: struct.Struct = struct.Struct('<IHHHHHIIIHH')
+
+# ############################### Archive indexes ################################
+
+def index_archive(path: Path) -> dict[str, list[int]] | Error:
+    """Maps the files of a zip archive to where their data is in it.
+
+    Args:
+    path (Path): The path of the archive.
+
+    Returns:
+    dict[str, list[int]] | Error: The `[offset, compressed size, size, method]` of each file, or the error
+    """
+
+    entries: dict[str, list[int]] = {}
+
+    try:
+        with open(path, 'rb') as f, zipfile.ZipFile(f) as zip_ref, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+            for info in zip_ref.infolist():
+                if info.is_dir():
+                    continue
+
+                if info.compress_type not in _supported_methods or info.flag_bits & 0x1:
+                    return InvalidArchiveError(path, f'"{info.filename}" is encrypted or compressed with an unsupported method')
+
+                # The local header can have another extra field than the central directory
+                header: tuple = _local_header.unpack_from(mapping, info.header_offset)
+                if header[0] != 0x04034b50:
+                    return InvalidArchiveError(path, f'bad local header for "{info.filename}"')
+
+                offset: int = info.header_offset + _local_header.size + header[9] + header[10]
+                entries[info.filename] = [offset, info.compress_size, info.file_size, info.compress_type]
+    except (OSError, ValueError, struct.error, zipfile.BadZipFile) as e:
+        return InvalidArchiveError(path, str(e))
+
+    return entries
+
+# ################################# Read layer ##################################
+
+class PackageArchive:
+    """A package installed without extraction, its files read in place from its archive.
+
+    The archive is memory mapped: reading a stored file is a slice of the mapping (the
+    OS pages in what's read, and shares it between processes), reading a deflated
+    file inflates it from there. Nothing is written to the disk.
+    """
+
+    def __init__(self, path: Path, entries: dict[str, list[int]] | None = None) -> None:
+        """Initialize a package archive, opened on the first read.
+
+        Args:
+        path (Path): The path of the archive.
+        entries (dict[str, list[int]] | None, optional): Its index (see `index_archive`), as recorded in the install manifest, None to build it. Defaults to None
+        """
+
+        self.path: Path = path
+        self.entries: dict[str, list[int]] | None = entries
+
+        self._file = None
+        self._mapping: mmap.mmap | None = None
+        self._lock: threading.Lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({str(self.path)!r})'
+
+    def __contains__(self, name: str) -> bool:
+        return self._open() is None and name in self.entries # type: ignore
+
+    def _open(self) -> None | Error:
+        with self._lock:
+            if self._mapping is not None:
+                return None
+
+            if self.entries is None:
+                entries: dict[str, list[int]] | Error = index_archive(self.path)
+                if isinstance(entries, Error):
+                    return entries
+                self.entries = entries
+
+            try:
+                self._file = open(self.path, 'rb')
+                self._mapping = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError) as e:
+                return InvalidArchiveError(self.path, str(e))
+
+        return None
+
+    def namelist(self) -> list[str] | Error:
+        """Lists the files of the package.
+
+        Returns:
+        list[str] | Error: The paths of the files, or the error
+        """
+
+        err: Error | None = self._open()
+        if err:
+            return err
+
+        return list(self.entries) # type: ignore
+
+    def read(self, name: str) -> bytes | Error:
+        """Reads a file of the package.
+
+        Args:
+        name (str): The path of the file in the package (e.g. `init.mscr`).
+
+        Returns:
+        bytes | Error: The content of the file, or the error
+        """
+
+        err: Error | None = self._open()
+        if err:
+            return err
+
+        entry: list[int] | None = self.entries.get(name) # type: ignore
+        if entry is None:
+            return FileOrDirectoryNotFoundError(f'{self.path}/{name}')
+
+        offset, compressed_size, size, method = entry
+        data: bytes = self._mapping[offset:offset + compressed_size] # type: ignore
+
+        if method == zipfile.ZIP_DEFLATED:
+            try:
+                data = zlib.decompress(data, -zlib.MAX_WBITS, size)
+            except zlib.error as e:
+                return InvalidArchiveError(self.path, f'"{name}": {e}')
+
+        return data
+
+    def close(self) -> None:
+        with self._lock:
+            if self._mapping is not None:
+                self._mapping.close()
+                self._mapping = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self) -> 'PackageArchive':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+def read_package_file(packages_dir: Path, package_name: str, name: str, entries: dict[str, list[int]] | None = None) -> bytes | Error:
+    """Reads a file of an installed package, whether it's extracted or not (the entry point of the MathScript runtime).
+
+    An archived package is `<packages_dir>/<package_name>.zip`, an extracted one the
+    `<packages_dir>/<package_name>` directory.
+
+    Args:
+    packages_dir (Path): The directory of the installed packages (`user_packages`).
+    package_name (str): The name of the package.
+    name (str): The path of the file in the package (e.g. `init.mscr`).
+    entries (dict[str, list[int]] | None, optional): The index of the archive, as recorded in the install manifest. Defaults to None
+
+    Returns:
+    bytes | Error: The content of the file, or the error
+    """
+
+    archive_path: Path = packages_dir / f'{package_name}.zip'
+
+    if archive_path.is_file():
+        with PackageArchive(archive_path, entries) as archive:
+            return archive.read(name)
+
+    try:
+        return (packages_dir / package_name / name).read_bytes()
+    except FileNotFoundError:
+        return FileOrDirectoryNotFoundError(packages_dir / package_name / name)
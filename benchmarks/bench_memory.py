@@ -0,0 +1,107 @@
+"""Measures the peak memory of `mathget install` for packages of growing size.
+
+A package of each size is served by the fake index and installed in a fresh
+process, whose peak resident set size is read from the OS once it exits. The
+download, the extraction and the metadata handling all stream with bounded
+buffers, so the peak RSS should stay flat whatever the size of the package.
+
+Usage: python benchmarks/bench_memory.py [--sizes 16 256 1024]
+
+Only supported on Unix (it relies on `os.wait4`).
+"""
+
+from pathlib import Path
+import argparse
+import subprocess
+import tempfile
+import zipfile
+import time
+import os
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from fake_index import FakeIndexServer
+from run import Environment, repo_dir
+
+chunk_size: int = 1024 * 1024
+
+def generate_package(index_dir: Path, name: str, size: int) -> None:
+    """Generates a package of incompressible data, written chunk by chunk.
+
+    Args:
+    index_dir (Path): The directory of the index.
+    name (str): The name of the package.
+    size (int): The size of the package data, in bytes.
+    """
+
+    (index_dir / 'metadata_files').mkdir(parents=True, exist_ok=True)
+    (index_dir / 'install_files').mkdir(parents=True, exist_ok=True)
+
+    with open(index_dir / 'metadata_files' / f'{name}-1.0.metadata', 'w') as f:
+        f.write(f'[package]\nname = "{name}"\nversion = "1.0"\ndescription = "Memory benchmark package"\nlicense = "GPL-2.0"\n\n[dependencies]\nmathscript = "^1.0"\n')
+
+    with zipfile.ZipFile(index_dir / 'install_files' / f'{name}-1.0.zip', 'w', zipfile.ZIP_STORED) as zip_file:
+        zip_file.writestr('init.mscr', f'// {name}\n')
+        with zip_file.open('data/blob.bin', 'w', force_zip64=True) as f:
+            for offset in range(0, size, chunk_size):
+                f.write(os.urandom(min(chunk_size, size - offset)))
+
+def peak_rss(env: Environment, *args: str) -> tuple[float, float]:
+    """Runs a MathGet command and measures its peak memory.
+
+    Args:
+    env (Environment): The environment to run the command in.
+    *args (str): The arguments of the command.
+
+    Returns:
+    tuple[float, float]: The peak resident set size of the process in MB, and its wall time in seconds
+    """
+
+    start: float = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, str(repo_dir / 'main.py'), '--index-url', env.index_url, *args],
+        env=env.env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    stderr: bytes = process.stderr.read() # type: ignore
+
+    # `wait4` gives the resource usage of this child only, unlike RUSAGE_CHILDREN
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    elapsed: float = time.perf_counter() - start
+
+    if process.returncode != 0:
+        raise RuntimeError(f'`mathget {" ".join(args)}` failed:\n{stderr.decode(errors="replace")}')
+
+    # Bytes on macOS, kilobytes elsewhere
+    return usage.ru_maxrss / (1e6 if sys.platform == 'darwin' else 1e3), elapsed
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Measure the peak memory of installing packages of growing size.')
+    arg_parser.add_argument('--sizes', type=int, nargs='+', default=[16, 256, 1024], help='The sizes of the packages, in MB')
+    args = arg_parser.parse_args()
+
+    if not hasattr(os, 'wait4'):
+        sys.exit('This benchmark needs os.wait4 (Unix only).')
+
+    with tempfile.TemporaryDirectory(prefix='mathget-bench-memory-') as tmp:
+        root: Path = Path(tmp)
+
+        for size in args.sizes:
+            generate_package(root / 'index', f'big{size}', size * 1_000_000)
+
+        server: FakeIndexServer = FakeIndexServer(root / 'index')
+        server.start()
+
+        env: Environment = Environment(root / 'env', server.url)
+
+        baseline, _ = peak_rss(env, '--help')
+        print(f'{"Package":>10} {"Peak RSS (MB)":>14} {"Over startup":>13} {"Time (s)":>9}')
+        print(f'{"(startup)":>10} {baseline:>14.1f} {"":>13} {"":>9}')
+
+        for size in args.sizes:
+            env.reset()
+            rss, elapsed = peak_rss(env, 'install', f'big{size}')
+            print(f'{f"{size} MB":>10} {rss:>14.1f} {rss - baseline:>+13.1f} {elapsed:>9.2f}')
+
+        server.shutdown()
@@ -0,0 +1,47 @@
+"""Compares the parse throughput of the TOML and JSON metadata formats.
+
+Usage: python benchmarks/bench_metadata_parse.py [documents]
+"""
+
+from pathlib import Path
+import json
+import sys
+import time
+import toml # type: ignore
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from metadata import parse_metadata
+
+def make_metadata(i: int) -> dict:
+    return {
+        'package': {
+            'name': f'package{i}',
+            'version': f'1.{i % 10}.{i % 7}',
+            'description': 'A synthetic package used to benchmark metadata parsing.',
+            'author': 'MathGet',
+            'license': 'GPL-2.0',
+            'homepage': f'https://example.org/package{i}',
+            'keywords': ['math', 'benchmark', f'kw{i % 13}'],
+            'changelog': [f'Change {j}' for j in range(10)],
+        },
+        'dependencies': {f'package{(i + j) % 100}': f'^1.{j}' for j in range(1, 6)},
+    }
+
+def bench(label: str, documents: list[str], content_type: str) -> float:
+    start: float = time.perf_counter()
+    for document in documents:
+        parse_metadata(document, content_type)
+    elapsed: float = time.perf_counter() - start
+
+    print(f'{label:<6} {len(documents) / elapsed:>12.0f} docs/s {sum(map(len, documents)) / elapsed / 1e6:>8.2f} MB/s')
+    return elapsed
+
+if __name__ == '__main__':
+    count: int = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    metadata: list[dict] = [make_metadata(i) for i in range(count)]
+
+    toml_time: float = bench('toml', [toml.dumps(m) for m in metadata], 'text/plain')
+    json_time: float = bench('json', [json.dumps(m, separators=(',', ':')) for m in metadata], 'application/json')
+
+    print(f'JSON parses {toml_time / json_time:.1f}x faster than TOML.')
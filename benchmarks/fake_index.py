@@ -0,0 +1,191 @@
+"""A local stand-in for the `mathget-index/` PHP host, with simulated latency and
+bandwidth.
+
+It answers the same endpoints (`/packages/metadata.php/<name>`,
+`/packages/install.php/<name>`, `/packages/versions.php/<name>` and
+`/search.php/<keyword>`) from an index directory, using the same version
+resolution as the client's local index sources. Text documents are compressed
+like `encoding.php` does (zstd, br or gzip, depending on the Accept-Encoding of
+the request and the modules installed). Like a shared host, it can throttle:
+past `rate_limit` requests per second it answers 429 with a `Retry-After`.
+
+Usage: python benchmarks/fake_index.py index_dir [--port 8000] [--latency 0.05] [--bandwidth 1e6]
+"""
+
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qsl, unquote
+import argparse
+import threading
+import gzip
+import io
+import time
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sources import IndexSource
+from scheduler import TokenBucket
+
+try:
+    import zstandard # type: ignore
+except ImportError:
+    zstandard = None
+
+try:
+    import brotli # type: ignore
+except ImportError:
+    brotli = None
+
+min_compress_size: int = 256 # bytes
+
+def encode(data: bytes, accept_encoding: str) -> tuple[bytes, str | None]:
+    """Compresses a document with the best encoding a client accepts.
+
+    Args:
+    data (bytes): The document.
+    accept_encoding (str): The Accept-Encoding header of the request.
+
+    Returns:
+    tuple[bytes, str | None]: The encoded document and its encoding (None if it's sent as is)
+    """
+
+    accepted: list[str] = [
+        part.split(';')[0].strip().lower() for part in accept_encoding.split(',')
+        if not part.replace(' ', '').endswith(('q=0', 'q=0.0'))
+    ]
+
+    if len(data) < min_compress_size:
+        return data, None
+    if 'zstd' in accepted and zstandard is not None:
+        return zstandard.ZstdCompressor().compress(data), 'zstd'
+    if 'br' in accepted and brotli is not None:
+        return brotli.compress(data), 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return gzip.compress(data, 6, mtime=0), 'gzip'
+
+    return data, None
+
+class FakeIndexServer(ThreadingHTTPServer):
+    """An HTTP server serving an index directory like the PHP index does."""
+
+    daemon_threads = True
+
+    def __init__(self, index_dir: Path, port: int = 0, latency: float = 0.0, bandwidth: float | None = None, rate_limit: float | None = None) -> None:
+        """Initialize a fake index server.
+
+        Args:
+        index_dir (Path): The directory of the index (containing `metadata_files/` and `install_files/`).
+        port (int, optional): The port to listen on, 0 picks a free one. Defaults to 0
+        latency (float, optional): The delay before answering each request, in seconds. Defaults to 0.0
+        bandwidth (float | None, optional): The maximum transfer rate of each response, in bytes per second. Defaults to None
+        rate_limit (float | None, optional): The number of requests per second past which requests are throttled. Defaults to None
+        """
+
+        super().__init__(('127.0.0.1', port), FakeIndexHandler)
+        self.source: IndexSource = IndexSource(str(index_dir))
+        self.latency: float = latency
+        self.bandwidth: float | None = bandwidth
+        self.bucket: TokenBucket | None = TokenBucket(rate_limit, rate_limit) if rate_limit else None
+        self.requests: int = 0
+        self.throttled: int = 0
+        self.bytes_sent: int = 0
+        self._lock: threading.Lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}/'
+
+    def start(self) -> None:
+        """Serves requests in a background thread."""
+
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+class FakeIndexHandler(BaseHTTPRequestHandler):
+    server: FakeIndexServer
+    chunk_size: int = 16 * 1024
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        parsed = urlparse(self.path)
+        parts: list[str] = [unquote(p) for p in parsed.path.split('/') if p]
+
+        if len(parts) == 3 and parts[0] == 'packages':
+            endpoint, argument = parts[1], parts[2]
+        elif len(parts) == 2 and parts[0] == 'search.php':
+            endpoint, argument = parts
+        else:
+            self.send_error(404)
+            return
+
+        with self.server._lock:
+            self.server.requests += 1
+            wait: float = self.server.bucket.take() if self.server.bucket is not None else 0.0
+            if wait > 0:
+                self.server.throttled += 1
+
+        if wait > 0:
+            self.send_response(429)
+            self.send_header('Retry-After', str(max(1, round(wait))))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        time.sleep(self.server.latency)
+
+        response = self.server.source.get(endpoint, argument, dict(parse_qsl(parsed.query)), headers={'Accept': self.headers.get('Accept', '')})
+
+        if response.status_code != 200:
+            self.send_response(response.status_code)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = response.raw
+        content_type: str = response.headers.get('content-type', 'text/plain')
+        length: str | None = response.headers.get('content-length')
+        encoding: str | None = None
+
+        # Archives are streamed as they are, documents are small and get compressed
+        if content_type != 'application/zip':
+            with body:
+                data, encoding = encode(body.read(), self.headers.get('Accept-Encoding', ''))
+            length = str(len(data))
+            body = io.BytesIO(data)
+
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        if encoding is not None:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', length) # type: ignore
+        self.end_headers()
+
+        start: float = time.perf_counter()
+        sent: int = 0
+        with body:
+            while chunk := body.read(self.chunk_size):
+                self.wfile.write(chunk)
+                sent += len(chunk)
+
+                if self.server.bandwidth:
+                    ahead: float = sent / self.server.bandwidth - (time.perf_counter() - start)
+                    if ahead > 0:
+                        time.sleep(ahead)
+
+        with self.server._lock:
+            self.server.bytes_sent += sent
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Serve an index directory like the MathGet PHP index.')
+    arg_parser.add_argument('index_dir', help='The index directory (containing metadata_files/ and install_files/)')
+    arg_parser.add_argument('--port', type=int, default=8000, help='The port to listen on')
+    arg_parser.add_argument('--latency', type=float, default=0.0, help='The delay before each response, in seconds')
+    arg_parser.add_argument('--bandwidth', type=float, default=None, help='The transfer rate of each response, in bytes per second')
+    arg_parser.add_argument('--rate-limit', type=float, default=None, help='The number of requests per second past which requests get a 429')
+    args = arg_parser.parse_args()
+
+    server = FakeIndexServer(Path(args.index_dir), args.port, args.latency, args.bandwidth, args.rate_limit)
+    print(f'Serving "{args.index_dir}" on {server.url}')
+    server.serve_forever()
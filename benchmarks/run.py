@@ -0,0 +1,217 @@
+"""Runs the MathGet benchmark suite against a local fake index.
+
+Every command runs in a fresh process with a throwaway MathScript installation
+(a fake `mathscript` executable on the PATH), against a synthetic index served by
+`fake_index.py` with the configured latency and bandwidth. Results are appended
+to a JSON lines file with the commit they were measured on, and compared with the
+last run of the same configuration.
+
+Usage: python benchmarks/run.py [--packages 20] [--fan-out 3] [--latency 0.05] [--repeat 3]
+"""
+
+from pathlib import Path
+from datetime import datetime, timezone
+import argparse
+import statistics
+import subprocess
+import tempfile
+import platform
+import zipfile
+import shutil
+import time
+import json
+import os
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from fake_index import FakeIndexServer
+from synthetic import generate_index
+
+repo_dir: Path = Path(__file__).parent.parent
+
+class Environment:
+    """A throwaway MathScript installation the benchmarked commands install into."""
+
+    def __init__(self, root: Path, index_url: str) -> None:
+        """Initialize a benchmark environment.
+
+        Args:
+        root (Path): The directory of the environment.
+        index_url (str): The URL of the fake index.
+        """
+
+        self.bin_dir: Path = root / 'bin'
+        self.bin_dir.mkdir(parents=True, exist_ok=True)
+        self.index_url: str = index_url
+
+        if os.name == 'nt':
+            (self.bin_dir / 'mathscript.bat').write_text('@exit /b 0\n')
+        else:
+            (self.bin_dir / 'mathscript').write_text('#!/bin/sh\nexit 0\n')
+            (self.bin_dir / 'mathscript').chmod(0o755)
+
+        self.env: dict[str, str] = {**os.environ, 'PATH': str(self.bin_dir) + os.pathsep + os.environ.get('PATH', '')}
+
+    @property
+    def packages_dir(self) -> Path:
+        return self.bin_dir / 'user_packages'
+
+    def reset(self) -> None:
+        if self.packages_dir.exists():
+            shutil.rmtree(self.packages_dir)
+
+    def mathget(self, *args: str) -> float:
+        """Runs a MathGet command and times it.
+
+        Args:
+        *args (str): The arguments of the command.
+
+        Returns:
+        float: The wall time of the command, in seconds
+        """
+
+        start: float = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, str(repo_dir / 'main.py'), '--index-url', self.index_url, *args],
+            env=self.env, input=b'y\n' * 1000, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        )
+        elapsed: float = time.perf_counter() - start
+
+        if result.returncode != 0:
+            raise RuntimeError(f'`mathget {" ".join(args)}` failed:\n{result.stderr.decode(errors="replace")}')
+
+        return elapsed
+
+def measure(repeat: int, setup, run) -> dict[str, float]:
+    times: list[float] = []
+    for _ in range(repeat):
+        setup()
+        times.append(run())
+
+    return {'median': statistics.median(times), 'min': min(times)}
+
+def extraction_throughput(index_dir: Path, work_dir: Path) -> float:
+    """Measures the extraction throughput of the synthetic archives in-process.
+
+    Returns:
+    float: The throughput, in uncompressed MB per second
+    """
+
+    total_bytes: int = 0
+    start: float = time.perf_counter()
+
+    for archive in sorted((index_dir / 'install_files').glob('*.zip')):
+        with zipfile.ZipFile(archive) as zip_file:
+            for member in zip_file.infolist():
+                zip_file.extract(member, work_dir / archive.stem)
+                total_bytes += member.file_size
+
+    return total_bytes / (time.perf_counter() - start) / 1e6
+
+def git_commit() -> tuple[str, bool]:
+    try:
+        commit: str = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=repo_dir, capture_output=True, text=True, check=True).stdout.strip()
+        dirty: bool = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=repo_dir, capture_output=True, text=True, check=True).stdout.strip() != ''
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+
+    return commit, dirty
+
+def previous_run(results_file: Path, config: dict) -> dict | None:
+    if not results_file.exists():
+        return None
+
+    runs: list[dict] = [json.loads(line) for line in results_file.read_text().splitlines() if line.strip()]
+    matching: list[dict] = [run for run in runs if run['config'] == config]
+
+    return matching[-1] if matching else None
+
+def run_suite(args: argparse.Namespace) -> dict:
+    config: dict = {
+        'packages': args.packages, 'fan_out': args.fan_out, 'files': args.files, 'file_size': args.file_size,
+        'latency': args.latency, 'bandwidth': args.bandwidth, 'rate_limit': args.rate_limit, 'repeat': args.repeat,
+    }
+
+    with tempfile.TemporaryDirectory(prefix='mathget-bench-') as tmp:
+        root: Path = Path(tmp)
+        names: list[str] = generate_index(root / 'index', args.packages, args.fan_out, args.files, args.file_size)
+
+        server: FakeIndexServer = FakeIndexServer(root / 'index', latency=args.latency, bandwidth=args.bandwidth or None, rate_limit=args.rate_limit or None)
+        server.start()
+
+        env: Environment = Environment(root / 'env', server.url)
+        requirements_file: Path = root / 'requirements.req'
+        requirements_file.write_text('\n'.join(names) + '\n')
+
+        def install_all() -> None:
+            env.reset()
+            env.mathget('install', names[0])
+
+        results: dict[str, dict[str, float]] = {
+            'startup': measure(args.repeat, lambda: None, lambda: env.mathget('--help')),
+            'install': measure(args.repeat, env.reset, lambda: env.mathget('install', names[0])),
+            'update -r': measure(args.repeat, install_all, lambda: env.mathget('update', '-f', '-r', str(requirements_file))),
+            'list': measure(args.repeat, lambda: None, lambda: env.mathget('list')),
+            'search': measure(args.repeat, lambda: None, lambda: env.mathget('search', 'pkg')),
+        }
+
+        server.shutdown()
+        bytes_sent: int = server.bytes_sent
+        throttled: int = server.throttled
+
+        extraction: float = extraction_throughput(root / 'index', root / 'extracted')
+
+    commit, dirty = git_commit()
+
+    return {
+        'commit': commit,
+        'dirty': dirty,
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': config,
+        'results': results,
+        'extraction_mb_s': extraction,
+        'bytes_sent': bytes_sent,
+        'throttled': throttled,
+    }
+
+def print_report(run: dict, previous: dict | None) -> None:
+    print(f'Commit {run["commit"]}{" (dirty)" if run["dirty"] else ""}, {run["config"]}\n')
+    print(f'{"Benchmark":<12} {"Median (ms)":>12} {"Min (ms)":>10} {"Change":>10}')
+
+    for name, timing in run['results'].items():
+        change: str = ''
+        if previous is not None and name in previous['results']:
+            before: float = previous['results'][name]['median']
+            change = f'{(timing["median"] - before) / before * 100:+.1f}%'
+        print(f'{name:<12} {timing["median"] * 1000:>12.1f} {timing["min"] * 1000:>10.1f} {change:>10}')
+
+    print(f'\nExtraction throughput: {run["extraction_mb_s"]:.1f} MB/s')
+    print(f'Bytes sent by the index: {run["bytes_sent"] / 1e6:.2f} MB')
+    print(f'Requests throttled by the index: {run["throttled"]}')
+
+    if previous is not None:
+        print(f'Compared with commit {previous["commit"]} ({previous["date"]}).')
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Run the MathGet benchmark suite against a local fake index.')
+    arg_parser.add_argument('--packages', type=int, default=20, help='The number of synthetic packages')
+    arg_parser.add_argument('--fan-out', type=int, default=3, help='The number of dependencies of each package')
+    arg_parser.add_argument('--files', type=int, default=20, help='The number of files in each package')
+    arg_parser.add_argument('--file-size', type=int, default=4096, help='The size of each file, in bytes')
+    arg_parser.add_argument('--latency', type=float, default=0.05, help='The latency of the fake index, in seconds')
+    arg_parser.add_argument('--bandwidth', type=float, default=0, help='The bandwidth of the fake index, in bytes per second (0 for unlimited)')
+    arg_parser.add_argument('--rate-limit', type=float, default=0, help='The requests per second past which the fake index answers 429 (0 for unlimited)')
+    arg_parser.add_argument('--repeat', type=int, default=3, help='The number of runs of each benchmark')
+    arg_parser.add_argument('--results', default=str(Path(__file__).parent / 'results.jsonl'), help='The file where results are recorded')
+    arg_parser.add_argument('--no-record', action='store_true', help='Don\'t record the results')
+    args = arg_parser.parse_args()
+
+    run: dict = run_suite(args)
+    print_report(run, previous_run(Path(args.results), run['config']))
+
+    if not args.no_record:
+        with open(args.results, 'a') as f:
+            f.write(json.dumps(run) + '\n')
@@ -0,0 +1,44 @@
+"""Generates synthetic package indexes for the benchmarks."""
+
+from pathlib import Path
+import random
+import zipfile
+
+def generate_index(index_dir: Path, packages: int = 20, fan_out: int = 3, files: int = 20, file_size: int = 4096, seed: int = 0) -> list[str]:
+    """Generates an index of synthetic packages.
+
+    Package `pkgN` depends on the next `fan_out` packages, so installing `pkg0` pulls
+    the whole graph and shared dependencies are reached through several paths.
+
+    Args:
+    index_dir (Path): The directory of the index to create.
+    packages (int, optional): The number of packages. Defaults to 20
+    fan_out (int, optional): The number of dependencies of each package. Defaults to 3
+    files (int, optional): The number of files in each package. Defaults to 20
+    file_size (int, optional): The size of each file, in bytes. Defaults to 4096
+    seed (int, optional): The seed of the generated contents, for reproducible indexes. Defaults to 0
+
+    Returns:
+    list[str]: The names of the packages
+    """
+
+    rng: random.Random = random.Random(seed)
+    names: list[str] = [f'pkg{i}' for i in range(packages)]
+
+    (index_dir / 'metadata_files').mkdir(parents=True, exist_ok=True)
+    (index_dir / 'install_files').mkdir(parents=True, exist_ok=True)
+
+    for i, name in enumerate(names):
+        dependencies: list[str] = names[i + 1:i + 1 + fan_out]
+
+        with open(index_dir / 'metadata_files' / f'{name}-1.0.metadata', 'w') as f:
+            f.write(f'[package]\nname = "{name}"\nversion = "1.0"\ndescription = "Synthetic benchmark package {i}"\nlicense = "GPL-2.0"\nkeywords = ["benchmark"]\n\n[dependencies]\nmathscript = "^1.0"\n')
+            f.writelines(f'{dependency} = "^1.0"\n' for dependency in dependencies)
+
+        with zipfile.ZipFile(index_dir / 'install_files' / f'{name}-1.0.zip', 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            zip_file.writestr('init.mscr', f'// {name}\n' + ''.join(f'import {dependency}\n' for dependency in dependencies))
+            for j in range(files - 1):
+                # Half random (incompressible) and half repetitive, like real sources and data
+                zip_file.writestr(f'src/module{j}.mscr', rng.randbytes(file_size // 2) + b'x = 1\n' * (file_size // 12))
+
+    return names
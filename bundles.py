@@ -0,0 +1,63 @@
+from typing import BinaryIO
+import gzip
+
+from errors import *
+
+# ################################## Variables ###################################
+
+compressions: tuple[str, ...] = ('none', 'gzip', 'zstd')
+
+_gzip_magic: bytes = b'\x1f\x8b'
+_zstd_magic: bytes = b'\x28\xb5\x2f\xfd'
+
+# ############################## Compression streams #############################
+
+def open_compressed_writer(f: BinaryIO, compression: str, level: int | None = None) -> BinaryIO | Error:
+    """Wraps a file in a compressing stream.
+
+    Args:
+    f (BinaryIO): The file to write to.
+    compression (str): The compression (`none`, `gzip` or `zstd`).
+    level (int | None, optional): The compression level, None for the default one. Defaults to None
+
+    Returns:
+    BinaryIO | Error: The stream to write the uncompressed data to, or the error
+    """
+
+    match compression:
+        case 'gzip':
+            return gzip.GzipFile(fileobj=f, mode='wb', compresslevel=level if level is not None else 6, mtime=0) # type: ignore
+        case 'zstd':
+            try:
+                import zstandard # type: ignore
+            except ImportError:
+                return OptionalModuleNotFoundError('zstandard', 'zstd compression')
+
+            return zstandard.ZstdCompressor(level=level if level is not None else 3, threads=-1).stream_writer(f, closefd=False)
+        case _:
+            return f
+
+def open_decompressed_reader(f: BinaryIO) -> BinaryIO | Error:
+    """Wraps a file in a decompressing stream, the compression being detected from its first bytes.
+
+    Args:
+    f (BinaryIO): The file to read from, it must support `peek` (e.g. opened with buffering).
+
+    Returns:
+    BinaryIO | Error: The stream of uncompressed data, or the error
+    """
+
+    magic: bytes = f.peek(4)[:4] # type: ignore
+
+    if magic.startswith(_gzip_magic):
+        return gzip.GzipFile(fileobj=f, mode='rb') # type: ignore
+
+    if magic == _zstd_magic:
+        try:
+            import zstandard # type: ignore
+        except ImportError:
+            return OptionalModuleNotFoundError('zstandard', 'zstd compression')
+
+        return zstandard.ZstdDecompressor().stream_reader(f, closefd=False)
+
+    return f
@@ -1,14 +1,37 @@
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed
+from typing import BinaryIO, Callable
 import shutil
+import hashlib
+import fnmatch
+import tarfile
+import json
+import io
+import uuid
+import time
+import os
 import sys
-import re
 import requests
 import toml # type: ignore
 import zipfile # type: ignore
-from tqdm import tqdm # type: ignore
 
 from errors import *
 from _types import *
+from sources import *
+from metadata import *
+from tracing import *
+from manifest import *
+from bundles import *
+from requirements import *
+from precompile import *
+from publish import *
+from graph import *
+from metrics import *
+from locks import *
+from archives import *
+from versions import *
+from events import *
+from integrity import *
 
 # ################################## Variables ###################################
 
@@ -30,60 +53,247 @@ if not packages_install_dir.exists():
 (packages_install_dir / 'metadata_files').mkdir(parents=True, exist_ok=True)
 (packages_install_dir / 'metadata_files' / 'cached').mkdir(parents=True, exist_ok=True)
 
+trash_dir: Path = packages_install_dir / '.trash'
+lock_dir: Path = packages_install_dir / '.locks'
+metrics_file: Path = packages_install_dir / 'metrics.json'
+
+download_chunk_size: int = 256 * 1024
+
+index_sources: IndexSources = load_index_sources(packages_install_dir / 'indexes.toml', package_index_repo_url)
+
 # ############################## Utility functions ###############################
 
-def get_metadata_file_for_version(package_name: str, version: str = 'latest', state: str | None = None) -> Path | Error:
-    path: Path = packages_install_dir / 'metadata_files' / 'cached' if state == 'cached' else packages_install_dir / 'metadata_files'
-    metadata_files: list[Path] = [f for f in path.iterdir() if '-'.join(f.name.split('-')[:-1]) == package_name]
+def set_index_sources(locations: list[str]) -> None:
+    """Puts index sources given on the command line before the configured ones.
 
-    def get_version(filename: str) -> str | Error:
-        match = re.search(r'-(.*?)\.metadata$', filename)
-        if match:
-            return match.group(1)
-        return InternalError(package_name)
+    Args:
+    locations (list[str]): The URLs or local directories of the indexes, by priority.
+    """
 
-    if metadata_files == []:
-        return PackageMetadataNotFoundError(package_name)
+    global index_sources
+    index_sources = load_index_sources(packages_install_dir / 'indexes.toml', package_index_repo_url, locations)
 
-    versions: list[str | Error] = [get_version(f.name) for f in metadata_files]
+def load_manifest() -> Manifest:
+    """Loads the install manifest, building it from the installed packages the first time.
 
-    err = next((item for item in versions if isinstance(item, Error)), None)
-    if err:
-        return err
-    
-    versions = sorted(versions, key=lambda v: list(map(int, v.split('.')))) # type: ignore
-
-    if version == 'latest':
-        version = versions[-1] # type: ignore
-    elif version.startswith('^'):
-        version = version[1:]
-        version = max(version, versions[-1]) # type: ignore
-    elif version.startswith('_'):
-        version = version[1:]
-        version = min(version, versions[0]) # type: ignore
-    elif version.startswith('~'):
-        version = version[1:]
-        matching_versions = [v for v in versions if v.startswith(version) or v == version] # type: ignore
-        version = matching_versions[-1] if matching_versions else None # type: ignore
-
-    if version not in versions:
-        return PackageMetadataNotFoundError(package_name)
+    Returns:
+    Manifest: The install manifest
+    """
+
+    manifest: Manifest = Manifest(packages_install_dir / 'manifest.json')
+
+    if not manifest.exists:
+        # Packages installed before the manifest existed: nothing tells whether they were
+        # requested, so they all are to never remove them as orphans.
+        for package_dir in packages_install_dir.iterdir():
+            if not (package_dir / 'init.mscr').is_file():
+                continue
+
+            metadata: dict | Error = get_local_metadata(package_dir.name)
+            if isinstance(metadata, Error):
+                continue
+
+            files: list[Path] = [f for f in package_dir.rglob('*') if f.is_file()]
+            manifest.add(package_dir.name, metadata['package']['version'], True, _dependency_names(metadata), [f.relative_to(package_dir).as_posix() for f in files], sum(f.stat().st_size for f in files))
+
+        manifest.save()
+
+    return manifest
+
+def _dependency_names(metadata: dict) -> list[str]:
+    return [d for d in metadata.get('dependencies', None) or {} if d != 'mathscript']
+
+def package_lock(package_name: str) -> FileLock:
+    """The lock held while a package directory and its metadata files change.
+
+    Args:
+    package_name (str): The name of the package.
+
+    Returns:
+    FileLock: The lock (not acquired)
+    """
+
+    return FileLock(lock_dir / 'packages' / f'{package_name}.lock')
+
+def installed_path(package_name: str) -> Path:
+    """The path of an installed package: its archive if it's installed without extraction, else its directory.
+
+    Args:
+    package_name (str): The name of the package.
+
+    Returns:
+    Path: The path (which may not exist)
+    """
+
+    archive_path: Path = packages_install_dir / f'{package_name}.zip'
+
+    return archive_path if archive_path.is_file() else packages_install_dir / package_name
+
+def confirm(question: str) -> bool | Error:
+    """Asks the user to confirm an action.
+
+    Nobody is asked when the events are printed as JSON, or when there's no input: the
+    action is refused with an error, it has to be forced.
+
+    Args:
+    question (str): The question (e.g. `Reclaim it?`).
+
+    Returns:
+    bool | Error: Whether the user confirmed, or the error
+    """
+
+    if json_output():
+        return ConfirmationRequiredError(question)
+
+    try:
+        return input(f'{question} (y/N) ').lower() == 'y'
+    except EOFError:
+        return ConfirmationRequiredError(question)
+
+def delete_trees(paths: list[Path]) -> None:
+    """Deletes directories (or files), their top-level entries being removed in parallel.
+
+    Args:
+    paths (list[Path]): The directories to delete.
+    """
+
+    def delete(path: Path) -> None:
+        if path.is_dir() and not path.is_symlink():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            path.unlink(missing_ok=True)
+
+    if paths == []:
+        return
+
+    def entries_of(path: Path) -> list[Path]:
+        try:
+            return list(path.iterdir()) if path.is_dir() and not path.is_symlink() else []
+        except FileNotFoundError:
+            return [] # deleted meanwhile, e.g. by a concurrent `gc`
+
+    entries: list[Path] = [entry for path in paths for entry in entries_of(path)]
+
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+        with progress('delete', 'Deleting files', len(entries), 'files') as p:
+            for _ in executor.map(delete, entries):
+                p.advance()
+
+    for path in paths:
+        delete(path)
+
+def move_to_trash(path: Path) -> Path:
+    """Moves a directory (or file) to the trash directory, which is a single rename.
+
+    Args:
+    path (Path): The directory to move.
+
+    Returns:
+    Path: The new path of the directory
+    """
+
+    trash_dir.mkdir(exist_ok=True)
+    trashed_path: Path = trash_dir / f'{path.name}-{uuid.uuid4().hex}'
+    path.rename(trashed_path)
 
-    filename = f'{package_name}-{version}.metadata'
+    return trashed_path
 
-    return path / filename
+def disk_usage(path: Path) -> tuple[int, int]:
+    """Computes the size of a directory, its subdirectories being walked in parallel.
 
-def get_local_metadata(package_name: str, version: str = 'latest') -> dict | Error:
+    Args:
+    path (Path): The directory (or file).
+
+    Returns:
+    tuple[int, int]: The total size in bytes and the number of files
+    """
+
+    if not path.exists():
+        return 0, 0
+
+    if not path.is_dir():
+        return path.stat().st_size, 1
+
+    def scan(directory: str) -> tuple[int, int, list[str]]:
+        size: int = 0
+        files: int = 0
+        subdirectories: list[str] = []
+
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirectories.append(entry.path)
+                    else:
+                        size += entry.stat(follow_symlinks=False).st_size
+                        files += 1
+        except OSError:
+            pass
+
+        return size, files, subdirectories
+
+    total_size: int = 0
+    total_files: int = 0
+
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+        pending = {executor.submit(scan, str(path))}
+        while pending:
+            future = pending.pop()
+            size, files, subdirectories = future.result()
+            total_size += size
+            total_files += files
+            pending.update(executor.submit(scan, subdirectory) for subdirectory in subdirectories)
+
+    return total_size, total_files
+
+def format_size(size: int) -> str:
+    """Formats a size in bytes for humans.
+
+    Args:
+    size (int): The size in bytes.
+
+    Returns:
+    str: The formatted size (e.g. `1.5 MB`)
+    """
+
+    for unit in ('B', 'kB', 'MB', 'GB'):
+        if size < 1000:
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1000 # type: ignore
+
+    return f'{size:.1f} TB'
+
+@traced('metadata.lookup')
+def get_metadata_file_for_version(package_name: str, version: str = 'latest', state: str | None = None) -> Path | Error:
+    path: Path = packages_install_dir / 'metadata_files' / 'cached' if state == 'cached' else packages_install_dir / 'metadata_files'
+
+    # Every stored version has its metadata file, the active one is the installed one
+    if version == 'active':
+        version = active_version(packages_install_dir, package_name) or 'latest'
+    metadata_files: list[Path] = [f for f in path.iterdir() if '-'.join(f.name.split('-')[:-1]) == package_name and f.name.endswith('.metadata')]
+
+    # Resolved like the index resolves it, so that both pick the same version
+    resolved: str | None = resolve_version([f.name.removeprefix(f'{package_name}-').removesuffix('.metadata') for f in metadata_files], version)
+    if resolved is None:
+        return PackageMetadataNotFoundError(package_name)
+
+    return path / f'{package_name}-{resolved}.metadata'
+
+def get_local_metadata(package_name: str, version: str = 'latest', cache: MetadataCache | None = None) -> dict | Error:
     """Gets the metadata of a package from the local package index
 
     Args:
     package_name (str): The name of the package to get metadata for
     version (str, optional): The version of the package to get metadata for. Defaults to 'latest'
+    cache (MetadataCache | None, optional): The metadata cache of the current command. Defaults to None
 
     Returns:
     dict: The metadata of the package
     """
 
+    if cache is not None:
+        return cache.get(('local', package_name, version), lambda: get_local_metadata(package_name, version))
+
     package_metadata_path: Path | Error = get_metadata_file_for_version(package_name, version)
 
     if isinstance(package_metadata_path, Error):
@@ -92,8 +302,7 @@ def get_local_metadata(package_name: str, version: str = 'latest') -> dict | Err
     if not package_metadata_path.exists():
         return PackageMetadataNotFoundError(package_name)
     
-    with open(package_metadata_path) as f:
-        return toml.load(f)
+    return load_metadata_file(package_metadata_path)
 
 def get_local_cached_metadata(package_name: str, version: str = 'latest') -> dict | Error:
     """Gets the metadata of a package from the local cached packages index
@@ -114,38 +323,71 @@ def get_local_cached_metadata(package_name: str, version: str = 'latest') -> dic
     if not package_metadata_path.exists():
         return PackageNotFoundError(package_name, 'cached')
     
-    with open(package_metadata_path) as f:
-        return toml.load(f)
+    return load_metadata_file(package_metadata_path)
 
-def get_remote_metadata(package_name: str, version: str = 'latest') -> dict | Error:
+def get_remote_metadata(package_name: str, version: str = 'latest', cache: MetadataCache | None = None) -> dict | Error:
     """Gets the metadata of a package from the remote package index
 
     Args:
     package_name (str): The name of the package to get metadata for
     version (str, optional): The version of the package to get metadata for. Defaults to 'latest'
+    cache (MetadataCache | None, optional): The metadata cache of the current command. Defaults to None
 
     Returns:
     dict: The metadata of the package
     """
-    
-    try:
-        response: requests.Response = requests.get(str(package_index_repo_url / 'packages' / 'metadata.php' / f'{package_name}?version={version}'))
-    except requests.exceptions.RequestException as e:
-        if isinstance(e, requests.exceptions.ConnectionError):
-            return NetworkError("Unable to connect to the package index.")
-        elif isinstance(e, requests.exceptions.Timeout):
-            return NetworkError("Request timed out.")
-        else:
-            return NetworkError(f"An error occurred while fetching package metadata: {e}")
 
-    
+    document: tuple[dict, str | None] | Error = get_remote_metadata_document(package_name, version, cache)
+
+    if isinstance(document, Error):
+        return document
+
+    return document[0]
+
+def get_remote_metadata_document(package_name: str, version: str = 'latest', cache: MetadataCache | None = None) -> tuple[dict, str | None] | Error:
+    """Gets the metadata of a package from the remote package index along with its TOML source
+
+    Args:
+    package_name (str): The name of the package to get metadata for
+    version (str, optional): The version of the package to get metadata for. Defaults to 'latest'
+    cache (MetadataCache | None, optional): The metadata cache of the current command. Defaults to None
+
+    Returns:
+    tuple[dict, str | None]: The metadata of the package and its TOML source (None if the index sent JSON)
+    """
+
+    if cache is not None:
+        document: tuple[dict, str | None] | Error = cache.get(('remote', package_name, version), lambda: get_remote_metadata_document(package_name, version))
+        if not isinstance(document, Error):
+            # `latest` and version ranges resolve to a version that may be asked for later
+            cache.put(('remote', package_name, document[0]['package']['version']), document)
+        return document
+
+    response: requests.Response | Error = index_sources.fetch('metadata.php', package_name, {'version': version}, headers={'Accept': accept_header})
+
+    if isinstance(response, Error):
+        return response
+
     if response.status_code == 404:
         return PackageNotFoundError(package_name, 'remote')
     
     if not (200 <= response.status_code <= 299):
         return HTTPError(response.status_code)
 
-    return toml.loads(response.text)
+    with span('metadata.transfer', package=package_name) as s:
+        text: str | Error = read_document(response)
+        if isinstance(text, Error):
+            return text
+        s.add_bytes(len(text))
+        s.set('encoding', response.headers.get('content-encoding', 'identity'))
+        s.set('transferred', response.raw.tell())
+
+    count('mathget_metadata_fetches_total')
+    count('mathget_metadata_bytes_total', response.raw.tell())
+
+    content_type: str = response.headers.get('content-type', '')
+
+    return parse_metadata(text, content_type), None if 'json' in content_type else text
 
 def download_package_from_index(package_name: str, version: str, path: Path) -> None | Error:
     """Downloads a package from the package index.
@@ -158,537 +400,2150 @@ def download_package_from_index(package_name: str, version: str, path: Path) ->
     Returns:
     None | Error: The error (None if there isn't)
     """
-    try:
-        response: requests.Response = requests.get(str(package_index_repo_url / 'packages' / 'install.php' / f'{package_name}?version={version}'), stream=True)
-    except requests.exceptions.RequestException as e:
-        if isinstance(e, requests.exceptions.ConnectionError):
-            return NetworkError("Unable to connect to the package index.")
-        elif isinstance(e, requests.exceptions.Timeout):
-            return NetworkError("Request timed out.")
-        else:
-            return NetworkError(f"An error occurred while fetching package metadata: {e}")
-
-    if response.status_code == 404:
-        return PackageNotFoundError(package_name, 'remote')
-    
-    if not (200 <= response.status_code <= 299):
-        return HTTPError(response.status_code)
-
-    total_size = int(response.headers.get('content-length', 0))
-    with open(path, 'wb') as f:
-        with tqdm(ascii=' ━', colour='#00af50', bar_format='{desc}: {percentage:3.0f}% {bar:50} {n_fmt}/{total_fmt}', total=total_size, unit='B', unit_scale=True, desc=f"Downloading {package_name}-{version}") as pbar:
-            for chunk in response.iter_content(chunk_size=1024):
-                if chunk:
-                    f.write(chunk)
-                    pbar.update(len(chunk))
+    # Archives are already compressed, an encoded transfer would only cost CPU and hide their size
+    response: requests.Response | Error = index_sources.fetch('install.php', package_name, {'version': version}, stream=True, headers={'Accept-Encoding': 'identity'})
+
+    if isinstance(response, Error):
+        return response
+
+    # Closing the response gives its slot back to the scheduler of the index
+    with response:
+        if response.status_code == 404:
+            return PackageNotFoundError(package_name, 'remote')
+
+        if not (200 <= response.status_code <= 299):
+            return HTTPError(response.status_code)
+
+        total_size = int(response.headers.get('content-length', 0))
+        start: float = time.perf_counter()
+        with open(path, 'wb') as f, span('download.transfer', package=package_name, version=version) as s:
+            # Advancing is an addition, the renderer samples it: progress costs nothing per chunk
+            with progress('download', f'Downloading {package_name}-{version}', total_size or None, 'B', package=package_name, version=version) as p:
+                for chunk in response.iter_content(chunk_size=download_chunk_size):
+                    if chunk:
+                        f.write(chunk)
+                        p.advance(len(chunk))
+                        s.add_bytes(len(chunk))
+
+    count('mathget_downloads_total')
+    observe('mathget_download_duration_seconds', time.perf_counter() - start)
+    count('mathget_downloaded_bytes_total', p.done)
 
     return None
 
-def download_metadata_from_index(package_name: str, version: str, path: Path) -> None | Error:
+def download_metadata_from_index(package_name: str, version: str, path: Path, cache: MetadataCache | None = None) -> None | Error:
     """Downloads a package from the package index.
 
     Args:
     package_name (str): The name of the package to download.
     version (str): The version of the package to download.
     path (Path): The path to the directory where the package will be downloaded.
+    cache (MetadataCache | None, optional): The metadata cache of the current command. Defaults to None
 
     Returns:
     None | Error: The error (None if there isn't)
     """
-    try:
-        response: requests.Response = requests.get(str(package_index_repo_url / 'packages' / 'metadata.php' / f'{package_name}?version={version}'))
-    except requests.exceptions.RequestException as e:
-        if isinstance(e, requests.exceptions.ConnectionError):
-            return NetworkError("Unable to connect to the package index.")
-        elif isinstance(e, requests.exceptions.Timeout):
-            return NetworkError("Request timed out.")
-        else:
-            return NetworkError(f"An error occurred while fetching package metadata: {e}")
 
-    if response.status_code == 404:
-        return PackageNotFoundError(package_name, 'remote')
-    
-    if not (200 <= response.status_code <= 299):
-        return HTTPError(response.status_code)
+    document: tuple[dict, str | None] | Error = get_remote_metadata_document(package_name, version, cache)
 
-    with open(path, 'w') as f:
-        f.write(response.text)
+    if isinstance(document, Error):
+        return document
+
+    write_metadata_file(path, *document)
 
     return None
 
-# ############################## Command functions ###############################
+def format_dependency(name: str, index_version: str) -> str:
+    """Formats a dependency of a package as a requirement (e.g. `package>=1.2`).
 
-def install(package_name: str | None = None, requirements_file: str | None = None, force: bool = False) -> None | Error:
-    """Installs a package
-    
     Args:
-    package_name (str | None): The name of the package to install. Defaults to None.
-    requirements_file (str | None): The path to the requirements file. Defaults to None.
-    force (bool): Whether to force the installation of the package Defaults to False.
+    name (str): The name of the dependency.
+    index_version (str): Its package index version specifier (e.g. `^1.2`).
 
     Returns:
-    None | Error: The error (None if there isn't)
+    str: The requirement
     """
 
-    if package_name is not None:
-        metadata: dict | Error = get_remote_metadata(package_name)
+    op = ('>' if index_version.startswith('^')
+          else '<' if index_version.startswith('_')
+          else '~' if index_version.startswith('~')
+          else '=')
+    if op != '=':
+        index_version = index_version[1:]
 
-        if isinstance(metadata, Error):
-            return metadata
+    return f'{name}{op}={index_version}'
 
-        if not force:
-            local_metadata: dict | Error = get_local_metadata(package_name)
-            if isinstance(local_metadata, dict):
-                if local_metadata['package']['version'] == metadata['package']['version']:
-                    print(f'Package "{package_name}" is already installed.\nVersion {metadata["package"]["version"]} is already installed.\nUse `mathget update` to update the package.')
-                    return None
-        
-        package_dir: Path = packages_install_dir / f'{package_name}'
-        if package_dir.exists():
-            shutil.rmtree(package_dir)
-
-        package_dir.mkdir(parents=True, exist_ok=True)
-
-        zip_file_path: Path = packages_install_dir / 'cached' / f'{package_name}-{metadata["package"]["version"]}.zip'
-        
-        err: Error | None = download_package_from_index(package_name, metadata['package']['version'], zip_file_path) # type: ignore
-        if err:
-            return err
+def package_queries(package_names: list[str], installed: bool = False) -> list[Requirement] | Error:
+    """Gets the packages a query command is about.
 
-        print(f'Unzipping {package_name}-{metadata["package"]["version"]}.')
-        with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
-            with tqdm(ascii=' ━', colour='#00af50', bar_format='{desc}: {percentage:3.0f}% {bar:50} {n_fmt}/{total_fmt} ', total=len(zip_ref.infolist()), unit='files', desc="Unzipping") as pbar:
-                for i, file in enumerate(zip_ref.infolist()):
-                    zip_ref.extract(file, package_dir)
-                    pbar.update(1)
+    Args:
+    package_names (list[str]): The packages, with an optional version (e.g. `package==1.2`).
+    installed (bool, optional): Whether to query the installed packages, at their installed version, rather than `package_names`. Defaults to False
 
-        zip_file_path.unlink()
+    Returns:
+    list[Requirement] | Error: The packages, or the error
+    """
 
-        print(f'Package "{package_name}" installed.\nVersion {metadata["package"]["version"]} installed.')
+    if installed:
+        return [Requirement(name, '==', entry['version']) for name, entry in sorted(load_manifest().packages.items())]
 
-        err: Error | None = download_metadata_from_index(package_name, metadata['package']['version'], packages_install_dir / 'metadata_files' / f'{package_name}-{metadata["package"]["version"]}.metadata') # type: ignore
-        if err:
-            return err
+    if package_names == []:
+        return InvalidArgumentsError('package', '--installed')
 
-        err: Error | None = download_metadata_from_index(package_name, metadata['package']['version'], packages_install_dir / 'metadata_files' / 'cached' / f'{package_name}-{metadata["package"]["version"]}.metadata') # type: ignore
-        if err:
-            return err
+    requirements: list[Requirement] = []
 
-        if 'dependencies' in metadata and metadata['dependencies']:
-            for dependency in metadata['dependencies']:
-                if dependency == 'mathscript': continue
-                err: Error | None = install(dependency, force=True) # type: ignore
-                if err:
-                    return err
+    for package_name in dict.fromkeys(package_names):
+        requirement: Requirement | Error = parse_requirement(package_name)
+        if isinstance(requirement, Error):
+            return requirement
+        requirements.append(requirement)
 
-        return None
-    elif requirements_file is not None:
-        requirements_file_path = Path(requirements_file)
-
-        if not requirements_file_path.exists() or not requirements_file_path.is_file():
-            return FileOrDirectoryNotFoundError(requirements_file)
-        
-        with open(requirements_file_path, 'r') as f:
-            requirements = f.readlines()
-
-        for requirement in requirements:
-            requirement = requirement.strip()
-            if requirement:
-                err: Error | None = install(requirement, force=force) # type: ignore
-                if err:
-                    return err
-        return None
+    return requirements
 
-    return InvalidArgumentsError('package', '-r/--requirements')
+def query_metadata(requirement: Requirement, cache: MetadataCache) -> dict | Error:
+    """Gets the metadata of a queried package, from its metadata file if that version is installed, else from the package index.
+
+    Args:
+    requirement (Requirement): The package, with an optional version.
+    cache (MetadataCache): The metadata cache of the current command.
 
-def list_packages() -> None | Error:
-    """Lists all packages in the package index.
-    
     Returns:
-    None | Error: The error (None if there isn't)
+    dict | Error: The metadata, or the error
     """
 
-    print('Installed packages:\n')
+    if requirement.operator == '==':
+        metadata_path: Path = packages_install_dir / 'metadata_files' / f'{requirement.name}-{requirement.version}.metadata'
+        if metadata_path.exists():
+            try:
+                return load_metadata_file(metadata_path)
+            except (OSError, ValueError):
+                pass
 
-    packages_path_list = [
-        path for path in packages_install_dir.iterdir()
-        if path.is_dir() and path.name not in ('metadata_files',)
-        and (path / 'init.mscr').exists() and (path / 'init.mscr').is_file()
-    ]
-
-    if packages_path_list == []:
-        print('(None)')
-
-    for package_path in packages_path_list:
-        metadata = get_local_metadata(package_path.name)
-
-        if isinstance(metadata, Error):
-            return metadata
-        
-        name = package_path.name
-        version = metadata['package']['version']
-        print(f'{name}=={version}')
+    return get_remote_metadata(requirement.name, requirement.index_version, cache)
 
-    return None
+def run_queries(requirements: list[Requirement], query: Callable[[Requirement], dict | Error], describe: Callable[[dict], str], output_json: bool = False) -> None | Error:
+    """Runs a query on packages concurrently, showing the results in the order of the packages.
 
-def uninstall(package_name: str | None = None, requirements_file: str | None = None, force: bool = False) -> None | Error:
-    """Uninstalls a package.
+    Each result is shown as soon as it and the ones before it have arrived. The
+    requests share the connection pools of the index sources, whose schedulers bound
+    the concurrency. With several packages, a failure is shown in place of the result
+    and the packages that failed are reported once all are done.
 
     Args:
-    package_name (str | None): The name of the package to uninstall. Defaults to None.
-    requirements_file (str | None): The path to the requirements file. Defaults to None.
-    force (bool): Whether to force the uninstallation of the package Defaults to False.
+    requirements (list[Requirement]): The queried packages.
+    query (Callable[[Requirement], dict | Error]): Gets the result for a package (JSON serializable).
+    describe (Callable[[dict], str]): Formats a result as text.
+    output_json (bool, optional): Whether the `query.result` events are sent without their text (for the JSON output). Defaults to False
 
     Returns:
     None | Error: The error (None if there isn't)
     """
 
-    if package_name is not None:
-        package_dir: Path = packages_install_dir / f'{package_name}'
-
-        if not package_dir.exists():
-            return PackageNotFoundError(package_name)
-
-        metadata: dict | Error = get_local_metadata(package_name)
-
-        if isinstance(metadata, Error):
-            return metadata
+    failed: list[str] = []
 
-        if not force:
-            confirm = input(f'Are you sure you want to uninstall package "{package_name}"? (y/N) ')
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        futures: dict[Future, Requirement] = {executor.submit(query, requirement): requirement for requirement in requirements}
 
-            if confirm.lower() != 'y':
-                print('Aborting uninstallation.')
-                return None
+        # In the order of the arguments, so that the output is the same from one run to the next
+        for i, future in enumerate(futures):
+            requirement: Requirement = futures[future]
+            result: dict | Error = future.result()
 
-        print(f'Uninstalling package "{package_name}" version {metadata["package"]["version"]}.')
+            if isinstance(result, Error) and len(requirements) == 1 and not output_json:
+                return result
 
-        with tqdm(ascii=' ━', colour='#00af50', bar_format='{desc}: {percentage:3.0f}% {bar:50} {n_fmt}/{total_fmt} ', total=len(list(package_dir.iterdir())), unit='files', desc="Deleting files") as pbar:
-            for file in package_dir.iterdir():
-                if file.is_file():
-                    file.unlink()
-                    pbar.update(1)
+            if isinstance(result, Error):
+                failed.append(str(requirement))
 
-        print('Deleting directories...')
-        shutil.rmtree(package_dir)
+            line: dict = {'error': {'type': result.type, 'code': result.code, 'message': result.message}} if isinstance(result, Error) else result # type: ignore
 
-        metadata_file_path: Path = packages_install_dir / 'metadata_files' / f'{package_name}-{metadata["package"]["version"]}.metadata'
-        if metadata_file_path.exists():
-            metadata_file_path.unlink()
+            if output_json:
+                emit('query.result', query=str(requirement), **line)
+                continue
 
-        metadata_file_path: Path = packages_install_dir / 'metadata_files' / 'cached' / f'{package_name}-{metadata["package"]["version"]}.metadata' # type: ignore
-        if metadata_file_path.exists():
-            metadata_file_path.unlink()
+            text: str = f'Package "{requirement}": {result.message}' if isinstance(result, Error) else describe(result)
+            emit('query.result', query=str(requirement), **line, text=text if i == 0 else f'\n{text}')
 
-        print(f'Package "{package_name}" uninstalled.')
+    if failed:
+        return QueryFailedError(failed)
 
-        return None
-    elif requirements_file is not None:
-        requirements_file_path = Path(requirements_file)
-
-        if not requirements_file_path.exists() or not requirements_file_path.is_file():
-            return FileOrDirectoryNotFoundError(requirements_file)
-        
-        with open(requirements_file_path, 'r') as f:
-            requirements = f.readlines()
-
-        for requirement in requirements:
-            requirement = requirement.strip()
-            if requirement:
-                err: Error | None = uninstall(requirement, force=force) # type: ignore
-                if err:
-                    return err
-        return None
+    return None
 
-    return InvalidArgumentsError('package', '-r/--requirements')
+def expected_hashes(package_name: str, entry: dict) -> dict[str, str | None]:
+    """Gets the hashes the files of an installed package are verified against.
 
-def update(package_name: str | None = None, requirements_file: str | None = None, force: bool = False) -> None | Error:
-    """Updates a package to the latest version available in the package index.
+    They're recorded in the install manifest when the package is installed. Packages
+    installed before that are verified against the `[files]` table of their metadata,
+    or else only checked for missing files.
 
     Args:
-    package_name (str | None): The name of the package to update. Defaults to None.
-    requirements_file (str | None): The path to the requirements file. Defaults to None.
-    force (bool): Whether to force the update of the package. Defaults to False.
+    package_name (str): The name of the package.
+    entry (dict): Its entry in the install manifest.
 
     Returns:
-    None | Error: The error (None if there isn't)
+    dict[str, str | None]: The hash of each installed file, None if it isn't known
     """
 
-    if package_name is not None:
-        metadata: dict | Error = get_remote_metadata(package_name)
-
-        if isinstance(metadata, Error):
-            return metadata
+    hashes: dict[str, str] | None = entry.get('hashes')
 
-        local_metadata: dict | Error = get_local_metadata(package_name)
-        if isinstance(local_metadata, Error):
-            return local_metadata
+    if hashes is None:
+        metadata: dict | Error = get_local_metadata(package_name, entry['version'])
+        hashes = {} if isinstance(metadata, Error) else {name: h for name, h in metadata.get('files', {}).items() if h.split(':', 1)[0] in hash_algorithms}
 
-        if local_metadata['package']['version'] == metadata['package']['version'] and force == False:
-            print(f'Package "{package_name}" is already up to date.\nVersion {metadata["package"]["version"]} is already installed.')
-            return None
+    return {file: hashes.get(file) for file in entry.get('files', [])}
 
-        print(f'Updating package "{package_name}" to version {metadata["package"]["version"]}.')
+def check_installed(package_names: list[str], manifest: Manifest) -> dict[str, dict[str, str]]:
+    """Hashes the files of installed packages in parallel and compares them to their expected hashes.
 
-        package_dir: Path = packages_install_dir / package_name
-        if package_dir.exists():
-            shutil.rmtree(package_dir)
+    The files of a package installed without extraction are read from its archive,
+    through the index recorded in the install manifest, as MathScript reads them.
 
-        package_dir.mkdir(parents=True, exist_ok=True)
+    Args:
+    package_names (list[str]): The packages to check.
+    manifest (Manifest): The install manifest.
 
-        zip_file_path: Path = packages_install_dir / 'cached' / f'{package_name}-{metadata["package"]["version"]}.zip'
-        
-        err: Error | None = download_package_from_index(package_name, metadata['package']['version'], zip_file_path) # type: ignore
-        if isinstance(err, Error):
-            return err
+    Returns:
+    dict[str, dict[str, str]]: What is wrong with each damaged file (see `integrity.check_file`), by damaged package
+    """
 
-        print(f'Unzipping {package_name}-{metadata["package"]["version"]}.')
-        with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
-            with tqdm(ascii=' ━', colour='#00af50', bar_format='{desc}: {percentage:3.0f}% {bar:50} {n_fmt}/{total_fmt} ', total=len(zip_ref.infolist()), unit='files', desc="Unzipping") as pbar:
-                for i, file in enumerate(zip_ref.infolist()):
-                    zip_ref.extract(file, package_dir)
-                    pbar.update(1)
+    expected: dict[str, dict[str, str | None]] = {name: expected_hashes(name, manifest.packages[name]) for name in package_names}
+    archives: dict[str, PackageArchive] = {name: PackageArchive(installed_path(name), manifest.packages[name].get('archive')) for name in package_names if installed_path(name).is_file()}
 
-        zip_file_path.unlink()
+    def check(package_name: str, file: str) -> str | None:
+        if package_name in archives:
+            return check_archived_file(archives[package_name], file, expected[package_name][file])
 
-        err: Error = download_metadata_from_index(package_name, metadata['package']['version'], packages_install_dir / 'metadata_files' / f'{package_name}-{metadata["package"]["version"]}.metadata') # type: ignore
-        if err:
-            return err
+        return check_file(installed_path(package_name) / file, expected[package_name][file])
 
-        err: Error = download_metadata_from_index(package_name, metadata['package']['version'], packages_install_dir / 'metadata_files' / 'cached' / f'{package_name}-{metadata["package"]["version"]}.metadata') # type: ignore
-        if err:
-            return err
+    tasks: list[tuple[str, str]] = [(name, file) for name in package_names for file in expected[name]]
+    damaged: dict[str, dict[str, str]] = {}
 
-        if 'dependencies' in metadata and metadata['dependencies']:
-            for dependency in metadata['dependencies']:
-                if dependency == 'mathscript': continue
-                err: Error = update(dependency, force=True) # type: ignore
-                if err:
-                    return err
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 2)) as executor, progress('verify', 'Verifying files', len(tasks), 'files') as p:
+        for (name, file), problem in zip(tasks, executor.map(check, [name for name, _ in tasks], [file for _, file in tasks])):
+            p.advance()
+            if problem is not None:
+                damaged.setdefault(name, {})[file] = problem
 
-        print(f'Package "{package_name}" updated to version {metadata["package"]["version"]}.')
+    for archive in archives.values():
+        archive.close()
 
-        return None
-    elif requirements_file is not None:
-        requirements_file_path = Path(requirements_file)
-
-        if not requirements_file_path.exists() or not requirements_file_path.is_file():
-            return FileOrDirectoryNotFoundError(requirements_file)
-        
-        with open(requirements_file_path, 'r') as f:
-            requirements = f.readlines()
-
-        for requirement in requirements:
-            requirement = requirement.strip()
-            if requirement:
-                err: Error = update(requirement, force=force) # type: ignore
-                if err:
-                    return err
-        return None
+    return damaged
 
-    return InvalidArgumentsError('package', '-r/--requirements')
+def repair_package(package_name: str, entry: dict, damaged: dict[str, str], cache: MetadataCache) -> dict[str, list[int]] | None | Error:
+    """Repairs an installed package from its archive, taken from the download cache or the index again.
 
-def search(keyword: str, package_index_url: str | None = None) -> None | Error: # type: ignore
-    """Searches the package index for packages matching the keyword.
+    Only the damaged files of an extracted package are rewritten, each replaced in a
+    single rename. A package installed without extraction gets its whole archive back.
 
     Args:
-    keyword (str): The keyword to search for
-    package_index_url (str | None): The URL of the package index. Defaults to None.
+    package_name (str): The name of the package.
+    entry (dict): Its entry in the install manifest.
+    damaged (dict[str, str]): Its damaged files (see `check_installed`).
+    cache (MetadataCache): The metadata cache of the current command.
+
+    Returns:
+    dict[str, list[int]] | None | Error: The new index of the archive of an archived package (None if extracted), or the error
     """
 
-    if package_index_url is not None:
-        package_index_url: URL = URL(package_index_url) # type: ignore
-    else:
-        package_index_url: URL = package_index_repo_url # type: ignore
+    version: str = entry['version']
 
-    try:
-        response: requests.Response = requests.get(str(package_index_url / 'search.php' / keyword)) # type: ignore
-    except requests.exceptions.RequestException as e:
-        if isinstance(e, requests.exceptions.ConnectionError):
-            return NetworkError("Unable to connect to the package index.")
-        elif isinstance(e, requests.exceptions.Timeout):
-            return NetworkError("Request timed out.")
-        else:
-            return NetworkError(f"An error occurred while fetching package metadata: {e}")
+    metadata: dict | Error = get_local_metadata(package_name, version, cache)
+    if isinstance(metadata, Error):
+        metadata = get_remote_metadata(package_name, version, cache)
+        if isinstance(metadata, Error):
+            return metadata
 
-    if response.status_code == 404:
-        return PackageNotFoundError(keyword, 'remote')
-    
-    if not (200 <= response.status_code <= 299):
-        return HTTPError(response.status_code)
+    requirement: Requirement | Error = parse_requirement(f'{package_name}=={version}')
+    if isinstance(requirement, Error):
+        return requirement
 
-    packages = toml.loads(response.text)['packages']
-    
-    print(f'Found {len(packages)} packages matching the keyword "{keyword}":')
+    # A damaged archive left in the download cache is refused rather than installed again
+    if 'sha256' in metadata.get('archive', {}):
+        requirement.hashes = [f'sha256:{metadata["archive"]["sha256"]}']
 
-    if packages == []:
-        print('(None)')
-    else:
-        for package in packages:
-            print(f'- {package["name"]}=={package["version"]} (License: {package["license"] if "license" in package else "Not specified"})')
+    archive: tuple[Path, FileLock] | Error = download_resolved_package(ResolvedPackage(package_name, metadata, requirement, False))
+    if isinstance(archive, Error):
+        return archive
 
-    return None
+    zip_file_path, in_use = archive
+    entries: dict[str, list[int]] | None = None
+
+    with package_lock(package_name):
+        # The version in the store, where the package points to it
+        root: Path = (packages_install_dir / (f'{package_name}.zip' if 'archive' in entry else package_name)).resolve()
 
-def get_info(package_name: str) -> None | Error:
-    """Retrieves information about a package from the package index.
+        try:
+            if 'archive' in entry:
+                tmp_path: Path = root.with_name(f'.{root.name}.{uuid.uuid4().hex}.tmp')
+                try:
+                    os.link(zip_file_path, tmp_path)
+                except OSError:
+                    shutil.copyfile(zip_file_path, tmp_path)
+                os.replace(tmp_path, root)
+
+                index: dict[str, list[int]] | Error = index_archive(root)
+                if isinstance(index, Error):
+                    return index
+                entries = index
+            else:
+                with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
+                    for file in damaged:
+                        path: Path = root / file
+                        path.parent.mkdir(parents=True, exist_ok=True)
+                        tmp_path = path.with_name(f'.{path.name}.{uuid.uuid4().hex}.tmp')
+                        with zip_ref.open(file) as source, open(tmp_path, 'wb') as destination:
+                            shutil.copyfileobj(source, destination)
+                        os.replace(tmp_path, path)
+        except KeyError as e:
+            return InvalidArchiveError(zip_file_path, f'{e} isn\'t in the archive')
+        except (OSError, zipfile.BadZipFile) as e:
+            return InvalidArchiveError(zip_file_path, str(e))
+        finally:
+            release_archive(zip_file_path, in_use)
+
+    return entries
+
+# ############################## Command functions ###############################
+
+def get_requirements(package_name: str | None = None, requirements_file: str | None = None) -> list[Requirement] | Error:
+    """Gets the requirements of a command, from a package argument or a requirements file.
 
     Args:
-    packaged_name (str): The name of the package to retrieve informations about
+    package_name (str | None): The package argument, with an optional version (e.g. `package>=1.2`). Defaults to None.
+    requirements_file (str | None): The path to the requirements file. Defaults to None.
 
     Returns:
-    None | Error: The error (None if there isn't)
+    list[Requirement] | Error: The requirements, or the error
     """
 
-    metadata: dict | Error = get_remote_metadata(package_name)
+    if package_name is not None:
+        requirement: Requirement | Error = parse_requirement(package_name)
+        return requirement if isinstance(requirement, Error) else [requirement]
+    elif requirements_file is not None:
+        return parse_requirements_file(Path(requirements_file))
 
-    if isinstance(metadata, Error):
-        return metadata
+    return InvalidArgumentsError('package', '-r/--requirements')
 
-    print(f'Package: {metadata["package"]["name"]}')
-    print(f'Version: {metadata["package"]["version"]}')
-    print(f'Description: {metadata["package"]["description"] if "description" in metadata["package"] else "Not specified"}')
-    print(f'Author: {metadata["package"]["author"] if "author" in metadata["package"] else "Not specified"}')
-    print(f'License: {metadata["package"]["license"] if "license" in metadata["package"] else "Not specified"}')
-    print(f'Homepage: {metadata["package"]["homepage"] if "homepage" in metadata["package"] else "Not specified"}')
-    
-    if 'keywords' in metadata['package'] and metadata['package']['keywords']:
-        print(f'Keywords:')
-        for keyword in metadata['package']['keywords']:
-            print(f'- {keyword}')
-    else:
-        print(f'Keywords: (None)')
-
-    if 'dependencies' in metadata and metadata['dependencies']:
-        print(f'Dependencies:')
-        for dependency_name, dependency_version in metadata['dependencies'].items():
-            op = ('>' if dependency_version.startswith('^')
-                  else '<' if dependency_version.startswith('_')
-                  else '~' if dependency_version.startswith('~')
-                  else '=')
-            if op != '=':
-                dependency_version = dependency_version[1:]
-
-            print(f'- {dependency_name}{op}={dependency_version}')
-    else:
-        print(f'Dependencies: (None)')
+@traced('resolve')
+def resolve_requirements(requirements: list[Requirement], cache: MetadataCache | None = None, on_resolved: Callable[[ResolvedPackage], None] | None = None) -> list[ResolvedPackage] | Error:
+    """Resolves requirements and their dependencies against the package index.
 
-    return None
+    The dependency graph is walked level by level, the metadata of a whole level being
+    fetched concurrently. The first requirement found for a package wins, so explicit
+    requirements take precedence over the dependencies of other packages.
 
-def get_dependencies(package_name: str) -> None | Error:
-    """Retrieves the dependencies of a package from the package index.
+    Metadata is also fetched ahead of the walk: the dependencies of a package are
+    requested as soon as its metadata arrives, and the dependencies it had in the
+    cached metadata of a previous installation before that. Those lookups go
+    through the metadata cache, so a right guess is never fetched twice.
 
     Args:
-    packaged_name (str): The name of the package to retrive dependencies of
+    requirements (list[Requirement]): The explicit requirements.
+    cache (MetadataCache | None): The metadata cache of the current command. Defaults to None.
+    on_resolved (Callable[[ResolvedPackage], None] | None): Called as soon as a package is resolved (e.g. to start its download). Defaults to None.
 
     Returns:
-    None | Error: The error (None if there isn't)
+    list[ResolvedPackage] | Error: The resolved packages, or the error
     """
 
-    metadata: dict | Error = get_remote_metadata(package_name)
+    if cache is None:
+        cache = MetadataCache()
 
-    if isinstance(metadata, Error):
-        return metadata
-    
-    if 'dependencies' in metadata and metadata['dependencies']:
-        print(f'Dependencies:')
-        for dependency_name, dependency_version in metadata['dependencies'].items():
-            op = ('>' if dependency_version.startswith('^')
-                  else '<' if dependency_version.startswith('_')
-                  else '~' if dependency_version.startswith('~')
-                  else '=')
-            if op != '=':
-                dependency_version = dependency_version[1:]
-
-            print(f'- {dependency_name}{op}={dependency_version}')
-    else:
-        print(f'Dependencies for {metadata["package"]["name"]}: (None)')
+    resolved: dict[str, ResolvedPackage] = {}
+    prefetched: set[tuple[str, str]] = set()
+    level: list[tuple[Requirement, bool]] = [(requirement, True) for requirement in requirements]
 
-    return None
+    executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=8)
+
+    def fetch_ahead(package_name: str, version: str) -> dict | Error:
+        # The span times the lookup itself, on the worker running it
+        with span('resolve.prefetch', package=package_name):
+            return get_remote_metadata(package_name, version, cache)
 
-def get_versions(package_name: str) -> None | Error:
-    """Retrieves the versions of a package from the package index.
+    def prefetch(dependencies: dict[str, str]) -> None:
+        for dependency, version in dependencies.items():
+            index_version: str = Requirement.from_index_version(dependency, version).index_version
+            if dependency not in resolved and (dependency, index_version) not in prefetched:
+                prefetched.add((dependency, index_version))
+                executor.submit(fetch_ahead, dependency, index_version)
+
+    try:
+        while level:
+            pending: dict[str, tuple[Requirement, bool]] = {}
+            for requirement, requested in level:
+                if requirement.name not in resolved and requirement.name not in pending:
+                    pending[requirement.name] = (requirement, requested)
+
+            futures: dict[str, Future] = {name: executor.submit(get_remote_metadata, name, requirement.index_version, cache) for name, (requirement, _) in pending.items()}
+
+            for name in pending:
+                # A package usually keeps the dependencies of its previous version
+                try:
+                    history: dict | Error = get_local_cached_metadata(name)
+                except ValueError:
+                    continue
+                if not isinstance(history, Error):
+                    prefetch(dependency_specs(history))
+
+            for future in as_completed(futures.values()):
+                if not isinstance(metadata := future.result(), Error):
+                    prefetch(dependency_specs(metadata))
+
+            level = []
+            for name, future in futures.items():
+                metadata: dict | Error = future.result()
+                if isinstance(metadata, Error):
+                    return metadata
+
+                package: ResolvedPackage = ResolvedPackage(name, metadata, *pending[name])
+                resolved[name] = package
+                level += [(Requirement.from_index_version(dependency, version), False) for dependency, version in package.dependencies.items()]
+
+                if on_resolved is not None:
+                    on_resolved(package)
+    finally:
+        # Wrong guesses aren't worth waiting for
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return list(resolved.values())
+
+def verify_hashes(path: Path, package: ResolvedPackage) -> None | Error:
+    """Checks a downloaded archive against the hashes of its requirement.
 
     Args:
-    packaged_name (str): The name of the package to retrive its versions
+    path (Path): The path of the archive.
+    package (ResolvedPackage): The package the archive belongs to.
 
     Returns:
     None | Error: The error (None if there isn't)
     """
 
-    try:
-        response: requests.Response = requests.get(str(package_index_repo_url / 'packages' / 'versions.php' / f'{package_name}'))
-    except requests.exceptions.RequestException as e:
-        if isinstance(e, requests.exceptions.ConnectionError):
-            return NetworkError("Unable to connect to the package index.")
-        elif isinstance(e, requests.exceptions.Timeout):
-            return NetworkError("Request timed out.")
-        else:
-            return NetworkError(f"An error occurred while fetching package metadata: {e}")
+    digests: dict[str, str] = {}
 
-    if response.status_code == 404:
-        return PackageNotFoundError(package_name, 'remote')
-    
-    if not (200 <= response.status_code <= 299):
-        return HTTPError(response.status_code)
+    for expected in package.requirement.hashes:
+        algorithm, _ = expected.split(':', 1)
 
-    versions = toml.loads(response.text)['versions']
+        if algorithm not in digests:
+            try:
+                with open(path, 'rb') as f:
+                    digests[algorithm] = hashlib.file_digest(f, algorithm).hexdigest()
+            except ValueError:
+                return InvalidRequirementError(f'{package.requirement} --hash={expected}', package.requirement.source)
 
-    if versions == []:
-        print(f'No versions found for package "{package_name}".')
-    else:
-        print(f'Versions for package "{package_name}":')
-        for version in versions:
-            print(f'- {version}')
-    
-    return None
+        if expected == f'{algorithm}:{digests[algorithm]}':
+            return None
+
+    return HashMismatchError(package.name, package.version, package.requirement.hashes, ', '.join(f'{a}:{d}' for a, d in digests.items()))
 
-def get_changelog(package_name: str) -> None | Error:
-    """Retrieves the changelog of a package from the package index.
+def download_resolved_package(package: ResolvedPackage, require_hashes: bool = False) -> tuple[Path, FileLock] | Error:
+    """Downloads the archive of a resolved package and verifies it.
+
+    An archive is downloaded once even if several processes need it at the same time:
+    the first one downloads it while the others wait, then they all use it. It stays
+    in the cache until the last one releases it (see `release_archive`).
 
     Args:
-    packaged_name (str): The name of the package to retrive its changelog
+    package (ResolvedPackage): The package to download.
+    require_hashes (bool): Whether the package archive must match a hash of its requirement. Defaults to False.
 
     Returns:
-    None | Error: The error (None if there isn't)
+    tuple[Path, FileLock] | Error: The path of the archive and the (shared) lock keeping it in the cache, or the error
     """
 
-    metadata = get_remote_metadata(package_name)
+    if require_hashes and package.requirement.hashes == []:
+        return HashMismatchError(package.name, package.version, [])
+
+    zip_file_path: Path = packages_install_dir / 'cached' / f'{package.name}-{package.version}.zip'
+
+    in_use: FileLock = FileLock(lock_dir / 'cached' / f'{zip_file_path.name}.use.lock')
+    in_use.acquire(shared=True)
+
+    with FileLock(lock_dir / 'cached' / f'{zip_file_path.name}.lock'):
+        count('mathget_cache_requests_total', cache='archive', result='hit' if zip_file_path.exists() else 'miss')
+
+        if not zip_file_path.exists():
+            # Downloaded aside then renamed, the archive is either complete or missing
+            part_file_path: Path = zip_file_path.with_name(f'{zip_file_path.stem}.{uuid.uuid4().hex}.part')
+
+            err: Error | None = download_package_from_index(package.name, package.version, part_file_path)
+            if err:
+                part_file_path.unlink(missing_ok=True)
+                in_use.release()
+                return err
+
+            os.replace(part_file_path, zip_file_path)
+
+    if package.requirement.hashes:
+        err = verify_hashes(zip_file_path, package)
+        if err:
+            release_archive(zip_file_path, in_use)
+            return err
+
+    return zip_file_path, in_use
+
+def release_archive(zip_file_path: Path, in_use: FileLock) -> None:
+    """Releases a downloaded archive, it's removed from the cache if no other process uses it.
+
+    Args:
+    zip_file_path (Path): The path of the archive.
+    in_use (FileLock): The lock returned along with it by `download_resolved_package`.
+    """
+
+    in_use.release()
+
+    if in_use.acquire(blocking=False):
+        try:
+            zip_file_path.unlink(missing_ok=True)
+        finally:
+            in_use.release()
+
+def discard_downloads(downloads: dict[str, Future]) -> None:
+    """Cancels the downloads that haven't started and releases the downloaded archives.
+
+    Args:
+    downloads (dict[str, Future]): The downloads, by package name.
+    """
+
+    for future in downloads.values():
+        if not future.cancel() and not isinstance(archive := future.result(), Error):
+            release_archive(*archive)
+
+def install_resolved_package(package: ResolvedPackage, download: Future | None, cache: MetadataCache, extract: bool | None = None, installed_version: str | None = None) -> tuple[list[str], int, dict[str, list[int]] | None, dict[str, str]] | None | Error:
+    """Installs a resolved package once its archive is downloaded, and writes its metadata.
+
+    The version is built in the store of the package (see `versions`), then made the
+    active one. It's either extracted, or installed without extraction: the archive
+    itself is linked to the store and its files are read in place (see
+    `archives.PackageArchive`). A version already stored is only switched to.
+
+    Args:
+    package (ResolvedPackage): The package to install.
+    download (Future | None): The download of the package archive (see `download_resolved_package`), None to switch to the stored version.
+    cache (MetadataCache): The metadata cache of the current command.
+    extract (bool | None, optional): Whether to extract the package, None to keep how it's installed (new packages are extracted). Defaults to None
+    installed_version (str | None, optional): The active version of the package, as recorded in the install manifest. Defaults to None
+
+    Returns:
+    tuple[list[str], int, dict[str, list[int]] | None, dict[str, str]] | None | Error: The installed files, their total size, the archive index (None if extracted) and the hashes of the files, None if switched to the stored version, or the error
+    """
+
+    package_name: str = package.name
+    version: str = package.version
+
+    if download is None:
+        with package_lock(package_name):
+            message(f'Switching {package_name} to version {version}.', package=package_name, version=version)
+            with span('switch', package=package_name):
+                trashed: list[Path] | Error = activate(packages_install_dir, package_name, version, installed_version, move_to_trash)
+            if isinstance(trashed, Error):
+                return trashed
+
+            delete_trees(trashed)
+
+        cache.invalidate('local', package_name)
+
+        return None
+
+    archive: tuple[Path, FileLock] | Error = download.result()
+    if isinstance(archive, Error):
+        return archive
+
+    zip_file_path, in_use = archive
+
+    # Other processes can install other packages meanwhile, not this one
+    with package_lock(package_name):
+        if extract is None:
+            extract = not installed_path(package_name).is_file()
+
+        entries: dict[str, list[int]] | None = None
+
+        if not extract:
+            index: dict[str, list[int]] | Error = index_archive(zip_file_path)
+            if isinstance(index, Error):
+                release_archive(zip_file_path, in_use)
+                return index
+            entries = index
+
+        # Built aside, then renamed into the store: a stored version is always complete
+        store: Path = store_dir(packages_install_dir, package_name)
+        store.mkdir(parents=True, exist_ok=True)
+        build_path: Path = store / f'.{version}.{uuid.uuid4().hex}.tmp'
+
+        if entries is None:
+            build_path.mkdir()
+
+            start: float = time.perf_counter()
+            with zipfile.ZipFile(zip_file_path, 'r') as zip_ref, span('extract', package=package_name) as s:
+                with progress('extract', f'Unzipping {package_name}-{version}', len(zip_ref.infolist()), 'files', package=package_name, version=version) as p:
+                    for file in zip_ref.infolist():
+                        zip_ref.extract(file, build_path)
+                        p.advance()
+                        s.add_bytes(file.file_size)
+
+                installed_files: list[str] = [file.filename for file in zip_ref.infolist() if not file.is_dir()]
+                installed_size: int = sum(file.file_size for file in zip_ref.infolist())
+                hashes: dict[str, str] = archive_hashes(zip_ref, package.metadata.get('files', {}))
+
+            observe('mathget_extraction_duration_seconds', time.perf_counter() - start)
+            count('mathget_extracted_bytes_total', installed_size)
+        else:
+            message(f'Linking {package_name}-{version}.', package=package_name, version=version)
+            with span('link', package=package_name):
+                # Cached archives are replaced, never written in place: a hard link is as good as a copy
+                try:
+                    os.link(zip_file_path, build_path)
+                except OSError:
+                    shutil.copyfile(zip_file_path, build_path)
+
+            installed_files = list(entries)
+            installed_size = sum(entry[2] for entry in entries.values())
+            with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
+                hashes = archive_hashes(zip_ref, package.metadata.get('files', {}))
+
+        release_archive(zip_file_path, in_use)
+
+        # A reinstalled version replaces the stored one
+        trashed = [move_to_trash(path) for path in (store / version, store / f'{version}.zip') if path.exists()]
+        build_path.rename(store / (version if entries is None else f'{version}.zip'))
+
+        switched: list[Path] | Error = activate(packages_install_dir, package_name, version, installed_version, move_to_trash)
+        if isinstance(switched, Error):
+            return switched
+
+        delete_trees(trashed + switched)
+
+        for metadata_dir in (packages_install_dir / 'metadata_files', packages_install_dir / 'metadata_files' / 'cached'):
+            err: Error | None = download_metadata_from_index(package_name, version, metadata_dir / f'{package_name}-{version}.metadata', cache)
+            if err:
+                return err
+
+    cache.invalidate('local', package_name)
+
+    return installed_files, installed_size, entries, hashes
+
+def needs_install(package: ResolvedPackage, manifest: Manifest, force: bool = False) -> bool:
+    """Whether a resolved package has to be installed (it's missing or installed in another version).
+
+    Args:
+    package (ResolvedPackage): The resolved package.
+    manifest (Manifest): The install manifest.
+    force (bool): Whether explicitly requested packages are reinstalled anyway. Defaults to False.
+
+    Returns:
+    bool: True if the package has to be installed
+    """
+
+    return manifest.packages.get(package.name, {}).get('version') != package.version or (force and package.requested)
+
+def needs_download(package: ResolvedPackage, manifest: Manifest, force: bool = False, extract: bool | None = None) -> bool:
+    """Whether a package to install has to be downloaded, rather than switched to from its store.
+
+    Args:
+    package (ResolvedPackage): The resolved package.
+    manifest (Manifest): The install manifest.
+    force (bool): Whether explicitly requested packages are reinstalled anyway. Defaults to False.
+    extract (bool | None): Whether the package is to be extracted, None to keep how each version is installed. Defaults to None.
+
+    Returns:
+    bool: True if the package has to be downloaded
+    """
+
+    if force and package.requested or package.version not in manifest.stored(package.name):
+        return True
+
+    path: Path | None = stored_path(packages_install_dir, package.name, package.version)
+
+    return path is None or (extract is not None and extract == path.name.endswith('.zip'))
+
+def mark_requested(package_names: list[str], manifest: Manifest) -> None:
+    """Records installed packages asked for explicitly as requested, so that they don't go as orphans
+    with the packages they were installed as dependencies of.
+
+    Args:
+    package_names (list[str]): The names of the explicitly requested packages, installed or not.
+    manifest (Manifest): The install manifest.
+    """
+
+    promoted: list[str] = [name for name in package_names if name in manifest and not manifest.packages[name].get('requested', False)]
+
+    for name in promoted:
+        manifest.set_requested(name)
+
+    if promoted:
+        manifest.save()
+
+def install_resolved(packages: list[ResolvedPackage], downloads: dict[str, Future], cache: MetadataCache, updating: bool = False, precompile: bool = False, extract: bool | None = None) -> None | Error:
+    """Installs resolved packages concurrently and records them in the install manifest.
+
+    Args:
+    packages (list[ResolvedPackage]): The packages to install.
+    downloads (dict[str, Future]): The downloads of their archives, by package name (see `download_resolved_package`), the packages without one are switched to from their store.
+    cache (MetadataCache): The metadata cache of the current command.
+    updating (bool): Whether the packages are updated (for the messages). Defaults to False.
+    precompile (bool): Whether to precompile the installed packages with the MathScript toolchain. Defaults to False.
+    extract (bool | None): Whether to extract the packages rather than read them from their archives, None to keep how each is installed. Defaults to None.
+
+    Returns:
+    None | Error: The first error (None if there isn't)
+    """
+
+    manifest: Manifest = load_manifest()
+    first_error: Error | None = None
+    installed: list[str] = []
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = {executor.submit(install_resolved_package, package, downloads.get(package.name), cache, extract, manifest.packages.get(package.name, {}).get('version')): package for package in packages}
+
+        for future, package in futures.items():
+            result: tuple[list[str], int, dict[str, list[int]] | None, dict[str, str]] | None | Error = future.result()
+
+            if isinstance(result, Error):
+                first_error = first_error or result
+                continue
+
+            if result is None:
+                manifest.activate(package.name, package.version, package.requested)
+            else:
+                files, size, entries, hashes = result
+                manifest.add(package.name, package.version, package.requested, list(package.dependencies), files, size, hashes)
+                if entries is not None:
+                    manifest.set_archive(package.name, entries)
+            installed.append(package.name)
+            count('mathget_packages_installed_total')
+
+            if updating:
+                emit('package.updated', package=package.name, version=package.version, text=f'Package "{package.name}" updated to version {package.version}.')
+            else:
+                emit('package.installed', package=package.name, version=package.version, text=f'Package "{package.name}" installed.\nVersion {package.version} installed.')
+
+    if precompile and installed:
+        # Compiled files are written next to the sources, archived packages have nowhere to put them
+        for package_name in [name for name in installed if 'archive' in manifest.packages[name]]:
+            message(f'Package "{package_name}" isn\'t extracted, it isn\'t precompiled.', package=package_name)
+            installed.remove(package_name)
+
+    if precompile and installed:
+        message(f'Precompiling {len(installed)} package{"s" if len(installed) > 1 else ""}.')
+
+        # Precompilation only warms up the first imports, a failure doesn't fail the installation
+        for package_name, compiled in precompile_packages([packages_install_dir / name for name in installed]).items():
+            if isinstance(compiled, Error):
+                message(compiled.message, package=package_name)
+            else:
+                manifest.set_compiled(package_name, compiled)
+
+    manifest.save()
+
+    return first_error
+
+def archive_size(package: ResolvedPackage) -> int | None:
+    """Gets the size of the archive of a resolved package, from its metadata or else from the index.
+
+    Args:
+    package (ResolvedPackage): The package.
+
+    Returns:
+    int | None: The size, in bytes (None if the index doesn't tell)
+    """
+
+    size: int | None = package.metadata.get('archive', {}).get('size')
+    if size is not None:
+        return size
+
+    # Only the headers are read, the body is never transferred
+    response: requests.Response | Error = index_sources.fetch('install.php', package.name, {'version': package.version}, stream=True, headers={'Accept-Encoding': 'identity'})
+    if isinstance(response, Error):
+        return None
+
+    with response:
+        if 200 <= response.status_code <= 299 and 'content-length' in response.headers:
+            return int(response.headers['content-length'])
+
+    return None
+
+def make_plan(command: str, resolved: list[ResolvedPackage], manifest: Manifest, force: bool = False, require_hashes: bool = False, precompile: bool = False, extract: bool | None = None) -> dict:
+    """Describes what installing resolved packages will do, without doing it.
+
+    Args:
+    command (str): The planned command (`install` or `update`).
+    resolved (list[ResolvedPackage]): The resolved packages.
+    manifest (Manifest): The install manifest, it's changed as planned (it mustn't be saved).
+    force (bool): Whether explicitly requested packages are reinstalled anyway. Defaults to False.
+    require_hashes (bool): Whether every package archive must match a hash of its requirement. Defaults to False.
+    precompile (bool): Whether to precompile the installed packages. Defaults to False.
+    extract (bool | None): Whether to extract the packages, None to keep how each is installed. Defaults to None.
+
+    Returns:
+    dict: The plan, as saved by `--save-plan`
+    """
+
+    to_install: list[ResolvedPackage] = [package for package in resolved if needs_install(package, manifest, force)]
+    to_download: list[ResolvedPackage] = [package for package in to_install if needs_download(package, manifest, force, extract)]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        sizes: dict[str, int | None] = {package.name: None for package in to_install}
+        sizes.update(zip((package.name for package in to_download), executor.map(archive_size, to_download)))
+
+    packages: list[dict] = []
+
+    for package in resolved:
+        installed_version: str | None = manifest.packages.get(package.name, {}).get('version')
+
+        if package.name not in sizes:
+            action: str = 'keep'
+        elif package not in to_download:
+            action = 'switch'
+        elif installed_version is None:
+            action = 'install'
+        elif installed_version == package.version:
+            action = 'reinstall'
+        else:
+            action = 'update'
+
+        packages.append({
+            'name': package.name,
+            'version': package.version,
+            'installed_version': installed_version,
+            'action': action,
+            'requested': package.requested,
+            'requirement': str(package.requirement),
+            'hashes': package.requirement.hashes,
+            'size': sizes.get(package.name),
+            'unpacked_size': package.metadata.get('archive', {}).get('unpacked_size'),
+            'metadata': package.metadata,
+        })
+
+    for package in to_install:
+        manifest.add(package.name, package.version, package.requested, list(package.dependencies), [])
+
+    return {
+        'command': command,
+        'created': time.time(),
+        'force': force,
+        'require_hashes': require_hashes,
+        'precompile': precompile,
+        'extract': extract,
+        'packages': packages,
+        'orphans': {name: manifest.packages[name]['version'] for name in sorted(manifest.orphans())},
+    }
+
+def estimate_duration(plan: dict) -> tuple[float, float] | None:
+    """Estimates how long applying a plan takes, from the transfers and extractions measured by the previous commands.
+
+    Downloads are counted 4 at a time (as they run) each paying the mean request
+    latency, plus the download size at the measured bandwidth, plus the unpacked size
+    at the measured extraction throughput.
+
+    Args:
+    plan (dict): The plan.
+
+    Returns:
+    tuple[float, float] | None: The estimated time in seconds and the measured bandwidth in bytes per second, None if nothing was measured yet
+    """
+
+    document: dict = load_metrics(metrics_file)
+
+    downloaded: float = sum(e['value'] for e in document['counters'] if e['name'] == 'mathget_downloaded_bytes_total')
+    download_time: float = sum(h['sum'] for h in document['histograms'] if h['name'] == 'mathget_download_duration_seconds')
+    if not downloaded or not download_time:
+        return None
+
+    requests_latency: list[dict] = [h for h in document['histograms'] if h['name'] == 'mathget_index_request_duration_seconds' and h['labels'].get('endpoint') == 'install.php']
+    latency: float = sum(h['sum'] for h in requests_latency) / max(1, sum(sum(h['buckets']) for h in requests_latency))
+
+    extracted: float = sum(e['value'] for e in document['counters'] if e['name'] == 'mathget_extracted_bytes_total')
+    extraction_time: float = sum(h['sum'] for h in document['histograms'] if h['name'] == 'mathget_extraction_duration_seconds')
+
+    bandwidth: float = downloaded / download_time
+    downloads: list[dict] = [p for p in plan['packages'] if p['action'] not in ('keep', 'switch')]
+
+    duration: float = -(-len(downloads) // 4) * latency + sum(p['size'] or 0 for p in downloads) / bandwidth
+    if extracted and extraction_time:
+        duration += sum(p['unpacked_size'] or p['size'] or 0 for p in plan['packages'] if p['action'] not in ('keep', 'switch')) / (extracted / extraction_time)
+
+    return duration, bandwidth
+
+def show_plan(plan: dict) -> None:
+    """Shows a plan: the packages to install, update or keep, the transfer size and the estimated time.
+
+    Args:
+    plan (dict): The plan.
+    """
+
+    changes: list[dict] = [p for p in plan['packages'] if p['action'] != 'keep']
+    lines: list[str] = [f'{"Action":<10} {"Package":<30} {"Version":<20} {"Download":>10}']
+
+    for p in plan['packages']:
+        version: str = f'{p["installed_version"]} -> {p["version"]}' if p['action'] == 'update' else p['version']
+        download: str = '' if p['action'] in ('keep', 'switch') else format_size(p['size']) if p['size'] is not None else 'unknown'
+        lines.append(f'{p["action"]:<10} {p["name"]:<30} {version:<20} {download:>10}')
+
+    if plan['orphans']:
+        lines.append('\nNo longer needed afterwards (removed by `mathget gc`):')
+        for name, version in plan['orphans'].items():
+            lines.append(f'- {name}=={version}')
+
+    estimate: tuple[float, float] | None = estimate_duration(plan)
+
+    if changes == []:
+        lines.append('\nNothing to install.')
+    else:
+        downloads: list[dict] = [p for p in changes if p['action'] != 'switch']
+        unknown: int = sum(1 for p in downloads if p['size'] is None)
+
+        lines.append(f'\n{len(changes)} package{"s" if len(changes) != 1 else ""} to install, {len(changes) - len(downloads)} already stored.')
+        lines.append(f'Download size: {format_size(sum(p["size"] or 0 for p in downloads))}' + (f' (+ {unknown} of unknown size)' if unknown else ''))
+
+        if any(p['unpacked_size'] is not None for p in changes):
+            lines.append(f'Installed size: {format_size(sum(p["unpacked_size"] or 0 for p in changes))}')
+
+        if estimate is None:
+            lines.append('Estimated time: unknown (no download measured yet)')
+        else:
+            lines.append(f'Estimated time: {estimate[0]:.1f} s (measured bandwidth: {format_size(int(estimate[1]))}/s)')
+
+    emit('plan', plan=plan, estimated_seconds=None if estimate is None else round(estimate[0], 1), text='\n'.join(lines))
+
+def plan_requirements(command: str, requirements: list[Requirement], cache: MetadataCache, manifest: Manifest, force: bool, require_hashes: bool, precompile: bool, save_plan: str | None, extract: bool | None = None) -> None | Error:
+    """Resolves requirements and shows what installing them would do, saving the plan if asked (see `apply_plan`).
+
+    Args:
+    command (str): The planned command (`install` or `update`).
+    requirements (list[Requirement]): The requirements.
+    cache (MetadataCache): The metadata cache of the current command.
+    manifest (Manifest): The install manifest.
+    force (bool): Whether explicitly requested packages are reinstalled anyway.
+    require_hashes (bool): Whether every package archive must match a hash of its requirement.
+    precompile (bool): Whether to precompile the installed packages.
+    save_plan (str | None): The file to save the plan to, None to only show it.
+    extract (bool | None, optional): Whether to extract the packages, None to keep how each is installed. Defaults to None
+
+    Returns:
+    None | Error: The error (None if there isn't)
+    """
+
+    resolved: list[ResolvedPackage] | Error = resolve_requirements(requirements, cache)
+    if isinstance(resolved, Error):
+        return resolved
+
+    plan: dict = make_plan(command, resolved, manifest, force, require_hashes, precompile, extract)
+    show_plan(plan)
+
+    if save_plan is not None:
+        with open(save_plan, 'w') as f:
+            json.dump(plan, f, indent=1, default=str)
+        message(f'\nPlan saved to "{save_plan}", apply it with `mathget apply {save_plan}`.', path=save_plan)
+
+    return None
+
+@traced('apply')
+def apply_plan(plan_file: str) -> None | Error:
+    """Applies a plan saved by `install --save-plan` or `update --save-plan`, without resolving again.
+
+    The plan is refused if a package it changes was installed, updated or removed since.
+
+    Args:
+    plan_file (str): The path of the plan.
+
+    Returns:
+    None | Error: The error (None if there isn't)
+    """
+
+    plan_path: Path = Path(plan_file)
+
+    if not plan_path.is_file():
+        return FileOrDirectoryNotFoundError(plan_file)
+
+    try:
+        with open(plan_path) as f:
+            plan: dict = json.load(f)
+        entries: list[dict] = [p for p in plan['packages'] if p['action'] != 'keep']
+        kept: list[str] = [p['name'] for p in plan['packages'] if p['action'] == 'keep' and p['requested'] is True and is_valid_name(p['name'])]
+
+        # A plan is a file like any other: its names and versions end up in paths
+        for entry in entries:
+            if not is_valid_name(entry['name']) or not is_valid_name(entry['version']) or entry['metadata']['package']['version'] != entry['version']:
+                return InvalidPlanError(plan_file, f'"{entry["name"]}" isn\'t a valid package name or has no valid version')
+            if not isinstance(entry['requirement'], str) or not isinstance(entry['hashes'], list) or not isinstance(entry['requested'], bool) or entry['installed_version'] is not None and not isinstance(entry['installed_version'], str):
+                return InvalidPlanError(plan_file, f'the "{entry["name"]}" package is malformed')
+    except (ValueError, KeyError, TypeError) as e:
+        return InvalidPlanError(plan_file, f'it isn\'t a plan ({e})')
+
+    manifest: Manifest = load_manifest()
+    cache: MetadataCache = MetadataCache()
+    packages: list[ResolvedPackage] = []
+
+    mark_requested(kept, manifest)
+
+    for entry in entries:
+        if manifest.packages.get(entry['name'], {}).get('version') != entry['installed_version']:
+            return InvalidPlanError(plan_file, f'the "{entry["name"]}" package changed since it was planned, plan again')
+
+        requirement: Requirement | Error = parse_requirement(entry['requirement'])
+        if isinstance(requirement, Error):
+            return requirement
+        requirement.hashes = entry['hashes']
+
+        packages.append(ResolvedPackage(entry['name'], entry['metadata'], requirement, entry['requested']))
+        # The metadata files are written from the plan, not fetched again
+        cache.put(('remote', entry['name'], entry['version']), (entry['metadata'], None))
+
+    if packages == []:
+        message('Nothing to do.')
+        return None
+
+    with ThreadPoolExecutor(max_workers=4) as downloader:
+        downloads: dict[str, Future] = {package.name: downloader.submit(download_resolved_package, package, plan.get('require_hashes', False)) for package in packages if needs_download(package, manifest, plan.get('force', False), plan.get('extract'))}
+
+        return install_resolved(packages, downloads, cache, updating=plan.get('command') == 'update', precompile=plan.get('precompile', False), extract=plan.get('extract'))
+
+@traced('install')
+def install(package_name: str | None = None, requirements_file: str | None = None, force: bool = False, require_hashes: bool = False, precompile: bool = False, dry_run: bool = False, save_plan: str | None = None, extract: bool | None = None) -> None | Error:
+    """Installs packages along with their dependencies
+
+    Every requirement is resolved first, then the packages missing or installed in
+    another version are installed concurrently. Their downloads start as soon as
+    they're resolved, while the rest of the graph is being resolved.
+    
+    Args:
+    package_name (str | None): The package to install, with an optional version (e.g. `package>=1.2`). Defaults to None.
+    requirements_file (str | None): The path to the requirements file. Defaults to None.
+    force (bool): Whether to force the installation of the package Defaults to False.
+    require_hashes (bool): Whether every package archive must match a hash given in the requirements. Defaults to False.
+    precompile (bool): Whether to precompile the installed packages with the MathScript toolchain. Defaults to False.
+    dry_run (bool): Whether to only show what would be installed, with the download size and an estimated time. Defaults to False.
+    save_plan (str | None): The file to save the plan of the dry run to (see `apply_plan`), implies `dry_run`. Defaults to None.
+    extract (bool | None): Whether to extract the packages rather than read them from their archives (see `install_resolved_package`), None to keep how each is installed. Defaults to None.
+
+    Returns:
+    None | Error: The error (None if there isn't)
+    """
+
+    requirements: list[Requirement] | Error = get_requirements(package_name, requirements_file)
+    if isinstance(requirements, Error):
+        return requirements
+
+    cache: MetadataCache = MetadataCache()
+    manifest: Manifest = load_manifest()
+
+    if dry_run or save_plan is not None:
+        return plan_requirements('install', requirements, cache, manifest, force, require_hashes, precompile, save_plan, extract)
+
+    downloads: dict[str, Future] = {}
+
+    with ThreadPoolExecutor(max_workers=4) as downloader:
+        def start_download(package: ResolvedPackage) -> None:
+            if needs_install(package, manifest, force) and needs_download(package, manifest, force, extract):
+                downloads[package.name] = downloader.submit(download_resolved_package, package, require_hashes)
+
+        resolved: list[ResolvedPackage] | Error = resolve_requirements(requirements, cache, start_download)
+        if isinstance(resolved, Error):
+            discard_downloads(downloads)
+            return resolved
+
+        for package in resolved:
+            if package.requested and not needs_install(package, manifest, force):
+                emit('package.unchanged', package=package.name, version=package.version, text=f'Package "{package.name}" is already installed.\nVersion {package.version} is already installed.\nUse `mathget update` to update the package.')
+
+        mark_requested([package.name for package in resolved if package.requested and not needs_install(package, manifest, force)], manifest)
+
+        return install_resolved([package for package in resolved if needs_install(package, manifest, force)], downloads, cache, precompile=precompile, extract=extract)
+
+def list_packages(output_format: str | None = None, pattern: str | None = None, requested_only: bool = False, sort: str = 'name') -> None | Error:
+    """Lists the installed packages from the install manifest.
+
+    Args:
+    output_format (str | None): The output format (`table`, `freeze` or `json`), None for the plain listing. Defaults to None.
+    pattern (str | None): A glob pattern the package names must match. Defaults to None.
+    requested_only (bool): Whether to list only the explicitly requested packages. Defaults to False.
+    sort (str): The sort key (`name`, `version` or `size`). Defaults to 'name'.
+
+    Returns:
+    None | Error: The error (None if there isn't)
+    """
+
+    manifest: Manifest = load_manifest()
+
+    packages: list[tuple[str, dict]] = [
+        (name, entry) for name, entry in manifest.packages.items()
+        if (pattern is None or fnmatch.fnmatchcase(name, pattern))
+        and (not requested_only or entry.get('requested', False))
+    ]
+
+    match sort:
+        case 'version':
+            packages.sort(key=lambda item: [int(p) if p.isdigit() else 0 for p in item[1]['version'].split('.')])
+        case 'size':
+            packages.sort(key=lambda item: item[1].get('size', 0), reverse=True)
+        case _:
+            packages.sort(key=lambda item: item[0])
+
+    listed: list[dict] = [
+        {
+            'name': name,
+            'version': entry['version'],
+            'requested': entry.get('requested', False),
+            'dependencies': entry.get('dependencies', []),
+            'size': entry.get('size', 0),
+            'files': len(entry.get('files', [])),
+        }
+        for name, entry in packages
+    ]
+
+    match output_format:
+        case 'json':
+            text: str = json.dumps(listed, indent=2)
+        case 'freeze':
+            text = '\n'.join(f'{name}=={entry["version"]}' for name, entry in packages)
+        case 'table':
+            name_width: int = max([len('Package')] + [len(name) for name, _ in packages])
+            lines: list[str] = [f'{"Package":<{name_width}} {"Version":<12} {"Size":>10} {"Files":>7}  Installed as']
+            for name, entry in packages:
+                lines.append(f'{name:<{name_width}} {entry["version"]:<12} {format_size(entry.get("size", 0)):>10} {len(entry.get("files", [])):>7}  {"requested" if entry.get("requested", False) else "dependency"}')
+            text = '\n'.join(lines)
+        case _:
+            text = '\n'.join(['Installed packages:\n', *(['(None)'] if packages == [] else []), *(f'{name}=={entry["version"]}' for name, entry in packages)])
+
+    emit('packages.list', packages=listed, text=text)
+
+    return None
+
+def trash_package(package_name: str, manifest: Manifest) -> list[Path]:
+    """Moves an installed package to the trash, its stored versions included, and removes their metadata files.
+
+    Args:
+    package_name (str): The name of the package.
+    manifest (Manifest): The install manifest.
+
+    Returns:
+    list[Path]: The trashed paths, to delete once done
+    """
+
+    # Renaming is instant: the package is gone for MathScript before its files are deleted
+    paths: list[Path] = [packages_install_dir / package_name, packages_install_dir / f'{package_name}.zip', store_dir(packages_install_dir, package_name)]
+    trashed: list[Path] = [move_to_trash(path) for path in paths if path.is_symlink() or path.exists()]
+
+    entry: dict | None = manifest.packages.get(package_name)
+    for version in [entry['version'], *manifest.stored(package_name)] if entry is not None else []:
+        remove_metadata_file(packages_install_dir / 'metadata_files' / f'{package_name}-{version}.metadata')
+        remove_metadata_file(packages_install_dir / 'metadata_files' / 'cached' / f'{package_name}-{version}.metadata')
+
+    return trashed
+
+def uninstall(package_name: str | None = None, requirements_file: str | None = None, force: bool = False, keep_orphans: bool = False) -> None | Error:
+    """Uninstalls packages, along with the dependencies nothing else needs.
+
+    The whole removal set is computed and confirmed first, then the package
+    directories are moved to a trash directory and deleted in parallel.
+
+    Args:
+    package_name (str | None): The name of the package to uninstall. Defaults to None.
+    requirements_file (str | None): The path to the requirements file. Defaults to None.
+    force (bool): Whether to force the uninstallation of the package Defaults to False.
+    keep_orphans (bool): Whether to keep the dependencies no other package needs. Defaults to False.
+
+    Returns:
+    None | Error: The error (None if there isn't)
+    """
+
+    requirements: list[Requirement] | Error = get_requirements(package_name, requirements_file)
+    if isinstance(requirements, Error):
+        return requirements
+
+    package_names: list[str] = list(dict.fromkeys(requirement.name for requirement in requirements))
+
+    manifest: Manifest = load_manifest()
+
+    for name in package_names:
+        if not installed_path(name).exists():
+            return PackageNotFoundError(name)
+
+        if name not in manifest:
+            return PackageMetadataNotFoundError(name)
+
+    orphans: set[str] = set() if keep_orphans else manifest.orphans(set(package_names))
+    removal_set: list[str] = package_names + sorted(orphans)
+
+    lines: list[str] = ['The following packages will be uninstalled:']
+    for name in removal_set:
+        lines.append(f'- {name}=={manifest.packages[name]["version"]}{" (no longer needed)" if name in orphans else ""}')
+
+    broken: set[str] = {dependent for name in removal_set for dependent in manifest.dependents(name)} - set(removal_set)
+    if broken:
+        lines.append('The following installed packages depend on them and will break:')
+        for name in sorted(broken):
+            lines.append(f'- {name}=={manifest.packages[name]["version"]} (needs {", ".join(sorted(set(manifest.packages[name].get("dependencies", [])) & set(removal_set)))})')
+
+    emit('uninstall.plan', packages=removal_set, orphans=sorted(orphans), broken=sorted(broken), text='\n'.join(lines))
+
+    if not force:
+        confirmed: bool | Error = confirm(f'Are you sure you want to uninstall {len(removal_set)} package{"s" if len(removal_set) > 1 else ""}?')
+        if isinstance(confirmed, Error):
+            return confirmed
+
+        if not confirmed:
+            message('Aborting uninstallation.')
+            return None
+
+    trashed: list[Path] = []
+
+    for name in removal_set:
+        with package_lock(name):
+            trashed += trash_package(name, manifest)
+            manifest.remove(name)
+
+    manifest.save()
+
+    # Only what this uninstallation trashed: other processes may be using the trash, leftovers are for `gc`
+    delete_trees(trashed)
+
+    for name in removal_set:
+        emit('package.uninstalled', package=name, text=f'Package "{name}" uninstalled.')
+
+    return None
+
+def collect_garbage(dry_run: bool = False, max_age: float = 30, force: bool = False, keep_versions: bool = False) -> None | Error:
+    """Reports the disk usage of the installation and reclaims what isn't needed anymore.
+
+    Reclaimed are the dependencies no explicitly requested package needs, the versions
+    kept installed but not active, the leftover downloads and cached metadata of
+    packages not installed anymore older than `max_age` days, and the leftovers of
+    interrupted uninstallations.
+
+    Args:
+    dry_run (bool): Whether to only report what would be reclaimed. Defaults to False.
+    max_age (float): The age in days after which unused cache entries are stale. Defaults to 30.
+    force (bool): Whether to skip the confirmation. Defaults to False.
+    keep_versions (bool): Whether to keep the inactive versions of the installed packages. Defaults to False.
+
+    Returns:
+    None | Error: The error (None if there isn't)
+    """
+
+    manifest: Manifest = load_manifest()
+    orphans: set[str] = manifest.orphans()
+    installed: set[str] = {f'{name}-{version}' for name, entry in manifest.packages.items() for version in [entry['version'], *entry.get('stored', {})]}
+    deadline: float = time.time() - max_age * 24 * 60 * 60
+
+    def is_stale(path: Path, stem: str) -> bool:
+        return stem not in installed and path.stat().st_mtime < deadline
+
+    stale_entries: list[Path] = [f for f in (packages_install_dir / 'cached').iterdir() if is_stale(f, f.name.removesuffix('.part').removesuffix('.zip'))]
+
+    for metadata_dir in (packages_install_dir / 'metadata_files', packages_install_dir / 'metadata_files' / 'cached'):
+        stale_entries += [f for f in metadata_dir.glob('*.metadata') if is_stale(f, f.name.removesuffix('.metadata'))]
+        if (metadata_dir / parsed_dir_name).exists():
+            # Pre-parsed forms whose metadata file is gone
+            stale_entries += [f for f in (metadata_dir / parsed_dir_name).glob('*.json') if not (metadata_dir / (f.name.removesuffix('.json') + '.metadata')).exists()]
+
+    trash: list[Path] = list(trash_dir.iterdir()) if trash_dir.exists() else []
+
+    # Versions recorded as stored but not on the disk anymore are forgotten in any case
+    inactive: dict[tuple[str, str], Path | None] = {(name, version): stored_path(packages_install_dir, name, version) for name in manifest.packages if name not in orphans for version in manifest.stored(name)}
+    for name, version in [key for key, path in inactive.items() if path is None or keep_versions]:
+        if inactive.pop((name, version)) is None:
+            manifest.remove_stored(name, version)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        package_usage: dict[str, tuple[int, int]] = dict(zip(manifest.packages, executor.map(disk_usage, [installed_path(name) for name in manifest.packages])))
+        store_usage: dict[str, tuple[int, int]] = dict(zip(orphans, executor.map(disk_usage, [store_dir(packages_install_dir, name) for name in orphans])))
+        inactive_usage: dict[tuple[str, str], tuple[int, int]] = dict(zip(inactive, executor.map(disk_usage, inactive.values()))) # type: ignore
+        cache_usage: tuple[int, int] = disk_usage(packages_install_dir / 'cached')
+        metadata_usage: tuple[int, int] = disk_usage(packages_install_dir / 'metadata_files')
+        trash_usage: list[tuple[int, int]] = list(executor.map(disk_usage, trash))
+        stale_usage: list[tuple[int, int]] = list(executor.map(disk_usage, stale_entries))
+
+    lines: list[str] = [f'{"Package":<30} {"Version":<12} {"Files":>8} {"Size":>10}']
+    for name, entry in sorted(manifest.packages.items()):
+        size, files = package_usage[name]
+        lines.append(f'{name:<30} {entry["version"]:<12} {files:>8} {format_size(size):>10}{"  (orphan)" if name in orphans else ""}')
+
+        for version in sorted((v for n, v in inactive_usage if n == name), key=version_key):
+            size, files = inactive_usage[name, version]
+            lines.append(f'{"":<30} {version:<12} {files:>8} {format_size(size):>10}  (inactive)')
+
+    lines.append('')
+    lines.append(f'{"Download cache":<43} {cache_usage[1]:>8} {format_size(cache_usage[0]):>10}')
+    lines.append(f'{"Metadata":<43} {metadata_usage[1]:>8} {format_size(metadata_usage[0]):>10}')
+    lines.append(f'{"Trash":<43} {sum(f for _, f in trash_usage):>8} {format_size(sum(s for s, _ in trash_usage)):>10}')
+
+    # An orphan goes with all its versions (the active one is out of the store where symlinks aren't available)
+    orphan_usage: int = sum(store_usage[name][0] + (0 if installed_path(name).is_symlink() else package_usage[name][0]) for name in orphans)
+    reclaimable: int = orphan_usage + sum(s for s, _ in inactive_usage.values()) + sum(s for s, _ in trash_usage) + sum(s for s, _ in stale_usage)
+    lines.append(f'\nReclaimable: {format_size(reclaimable)} ({len(orphans)} orphaned packages, {len(inactive)} inactive versions, {len(stale_entries)} stale cache entries).')
+
+    emit('gc.report', reclaimable=reclaimable, orphans=sorted(orphans), inactive=[f'{name}=={version}' for name, version in inactive], stale_entries=len(stale_entries), text='\n'.join(lines))
+
+    if dry_run or (not orphans and not inactive and not stale_entries and not trash):
+        if not dry_run:
+            manifest.save()
+        return None
+
+    if not force:
+        confirmed: bool | Error = confirm('Reclaim it?')
+        if isinstance(confirmed, Error):
+            return confirmed
+
+        if not confirmed:
+            message('Aborting garbage collection.')
+            return None
+
+    for name in sorted(orphans):
+        with package_lock(name):
+            trash += trash_package(name, manifest)
+            manifest.remove(name)
+
+    for (name, version), path in inactive.items():
+        with package_lock(name):
+            trash.append(move_to_trash(path)) # type: ignore
+            remove_metadata_file(packages_install_dir / 'metadata_files' / f'{name}-{version}.metadata')
+            remove_metadata_file(packages_install_dir / 'metadata_files' / 'cached' / f'{name}-{version}.metadata')
+            manifest.remove_stored(name, version)
+
+    manifest.save()
+
+    for entry in stale_entries:
+        entry.unlink(missing_ok=True)
+
+    delete_trees(trash)
+
+    emit('gc.reclaimed', size=reclaimable, text=f'Reclaimed {format_size(reclaimable)}.')
+
+    return None
+
+def bundle(output: str, compression: str = 'gzip', level: int | None = None) -> None | Error:
+    """Packs the installed packages and their metadata into a single archive.
+
+    The archive is a tar stream starting with the install manifest, so that it can be
+    restored in one sequential read.
+
+    Args:
+    output (str): The path of the bundle to write.
+    compression (str): The compression (`none`, `gzip` or `zstd`). Defaults to 'gzip'.
+    level (int | None): The compression level, None for the default one. Defaults to None.
+
+    Returns:
+    None | Error: The error (None if there isn't)
+    """
+
+    manifest: Manifest = load_manifest()
+    # Only the active versions are bundled
+    manifest_data: bytes = json.dumps({'packages': {name: {k: v for k, v in entry.items() if k != 'stored'} for name, entry in manifest.packages.items()}}, sort_keys=True).encode()
+
+    def normalize(info: tarfile.TarInfo) -> tarfile.TarInfo:
+        info.uid = info.gid = 0
+        info.uname = info.gname = ''
+        return info
+
+    with open(output, 'wb') as f:
+        stream: BinaryIO | Error = open_compressed_writer(f, compression, level)
+        if isinstance(stream, Error):
+            f.close()
+            Path(output).unlink()
+            return stream
+
+        with tarfile.open(fileobj=stream, mode='w|', format=tarfile.PAX_FORMAT) as tar:
+            info: tarfile.TarInfo = tarfile.TarInfo('manifest.json')
+            info.size = len(manifest_data)
+            info.mtime = int(time.time())
+            tar.addfile(info, io.BytesIO(manifest_data))
+
+            with progress('bundle', 'Bundling', len(manifest.packages), 'packages') as p:
+                for name, entry in sorted(manifest.packages.items()):
+                    package_path: Path = installed_path(name)
+                    tar.add(package_path.resolve(), arcname=f'packages/{package_path.name}', filter=normalize)
+
+                    for metadata_dir in ('metadata_files', 'metadata_files/cached'):
+                        metadata_path: Path = packages_install_dir / metadata_dir / f'{name}-{entry["version"]}.metadata'
+                        if metadata_path.exists():
+                            tar.add(metadata_path, arcname=f'{metadata_dir}/{metadata_path.name}', filter=normalize)
+
+                    p.advance()
+
+        if stream is not f:
+            stream.close()
+
+    size: int = Path(output).stat().st_size
+    emit('bundle.written', path=output, packages=len(manifest.packages), size=size, text=f'Bundled {len(manifest.packages)} packages into "{output}" ({format_size(size)}).')
+
+    return None
+
+def restore(bundle_file: str, force: bool = False) -> None | Error:
+    """Installs the packages of a bundle made by `bundle`, without any network access.
+
+    The bundle is extracted to a staging directory first. The installed packages are
+    only replaced, each with a rename, once the bundle was read whole: a damaged
+    bundle leaves the installation as it was.
+
+    Args:
+    bundle_file (str): The path of the bundle.
+    force (bool): Whether to skip the confirmation. Defaults to False.
+
+    Returns:
+    None | Error: The error (None if there isn't)
+    """
+
+    bundle_path: Path = Path(bundle_file)
+
+    if not bundle_path.is_file():
+        return FileOrDirectoryNotFoundError(bundle_file)
+
+    manifest: Manifest = load_manifest()
+    trashed: list[Path] = []
+    # Under `user_packages`, so that the packages are moved in place with a rename
+    staging_dir: Path = packages_install_dir / f'.restore.{uuid.uuid4().hex}.tmp'
+
+    try:
+        with open(bundle_path, 'rb') as f:
+            stream: BinaryIO | Error = open_decompressed_reader(f) # type: ignore
+            if isinstance(stream, Error):
+                return stream
+
+            try:
+                with tarfile.open(fileobj=stream, mode='r|') as tar:
+                    first: tarfile.TarInfo | None = tar.next()
+                    if first is None or first.name != 'manifest.json':
+                        return InvalidArchiveError(bundle_file, 'it doesn\'t start with a manifest')
+
+                    bundle_packages: dict[str, dict] = json.load(tar.extractfile(first))['packages'] # type: ignore
+
+                    # The names become paths, nothing is touched before they're all checked
+                    if not isinstance(bundle_packages, dict):
+                        return InvalidArchiveError(bundle_file, 'its manifest has no packages')
+                    for name, entry in bundle_packages.items():
+                        if not is_valid_name(name) or not isinstance(entry, dict) or not is_valid_name(entry.get('version')):
+                            return InvalidArchiveError(bundle_file, f'"{name}" isn\'t a valid package name or has no valid version')
+
+                    if not force:
+                        confirmed: bool | Error = confirm(f'Restore {len(bundle_packages)} packages from "{bundle_file}", replacing the installed versions?')
+                        if isinstance(confirmed, Error):
+                            return confirmed
+
+                        if not confirmed:
+                            message('Aborting restoration.')
+                            return None
+
+                    with progress('restore', 'Restoring', None, 'files') as p:
+                        for member in tar:
+                            if member.name.startswith(('packages/', 'metadata_files/')):
+                                tar.extract(member, staging_dir, filter='data')
+                                p.advance()
+            except (tarfile.TarError, EOFError, ValueError, KeyError, TypeError) as e:
+                return InvalidArchiveError(bundle_file, str(e))
+
+        staged: dict[str, Path] = {}
+        for name in bundle_packages:
+            path: Path | None = next((path for path in (staging_dir / 'packages' / name, staging_dir / 'packages' / f'{name}.zip') if path.exists()), None)
+            if path is None:
+                return InvalidArchiveError(bundle_file, f'it has no files for the "{name}" package')
+            staged[name] = path
+
+        # The bundle was read whole, the installed packages can be replaced
+        for name, entry in bundle_packages.items():
+            with package_lock(name):
+                trashed += trash_package(name, manifest)
+                staged[name].rename(packages_install_dir / staged[name].name)
+                manifest.restore(name, entry)
+
+        if (staging_dir / 'metadata_files').exists():
+            for path in [path for path in (staging_dir / 'metadata_files').rglob('*') if path.is_file()]:
+                destination: Path = packages_install_dir / path.relative_to(staging_dir)
+                destination.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(path, destination)
+
+        manifest.save()
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    delete_trees(trashed)
+
+    emit('bundle.restored', path=bundle_file, packages=sorted(bundle_packages), text=f'Restored {len(bundle_packages)} packages.')
+
+    return None
+
+def show_metrics(output_format: str = 'text', output: str | None = None, reset: bool = False) -> None | Error:
+    """Shows the metrics recorded by the previous commands: transfers, cache hit rates and index latencies.
+
+    Args:
+    output_format (str): The format (`text`, `prometheus` or `json`). Defaults to 'text'.
+    output (str | None): The file to write the metrics to (atomically, e.g. for the Prometheus textfile collector), None to print them. Defaults to None.
+    reset (bool): Whether to reset the metrics once shown. Defaults to False.
+
+    Returns:
+    None | Error: The error (None if there isn't)
+    """
+
+    document: dict = load_metrics(metrics_file)
+
+    def total(name: str, **labels: str) -> float:
+        return sum(e['value'] for e in document['counters'] if e['name'] == name and labels.items() <= e['labels'].items())
+
+    match output_format:
+        case 'prometheus':
+            text: str = to_prometheus(document)
+        case 'json':
+            text = to_json(document) + '\n'
+        case _:
+            lines: list[str] = ['Caches:']
+            for cache_name in sorted({e['labels']['cache'] for e in document['counters'] if e['name'] == 'mathget_cache_requests_total'}):
+                hits: float = total('mathget_cache_requests_total', cache=cache_name, result='hit')
+                misses: float = total('mathget_cache_requests_total', cache=cache_name, result='miss')
+                lines.append(f'  {cache_name:<20} {hits / (hits + misses):>6.1%} hits ({int(hits)}/{int(hits + misses)})')
+
+            extraction_time: float = sum(h['sum'] for h in document['histograms'] if h['name'] == 'mathget_extraction_duration_seconds')
+            lines += [
+                'Transfers:',
+                f'  {"Downloads":<20} {int(total("mathget_downloads_total")):>8} {format_size(int(total("mathget_downloaded_bytes_total"))):>10}',
+                f'  {"Metadata fetches":<20} {int(total("mathget_metadata_fetches_total")):>8} {format_size(int(total("mathget_metadata_bytes_total"))):>10}',
+                f'  {"Packages installed":<20} {int(total("mathget_packages_installed_total")):>8} {format_size(int(total("mathget_extracted_bytes_total"))):>10}' + (f' (extracted at {format_size(int(total("mathget_extracted_bytes_total") / extraction_time))}/s)' if extraction_time else ''),
+                'Index sources:',
+                f'  {"Source":<40} {"Endpoint":<14} {"Requests":>8} {"Errors":>7} {"Retries":>7} {"Hedged":>7} {"Mean (ms)":>10}',
+            ]
+
+            for h in sorted((h for h in document['histograms'] if h['name'] == 'mathget_index_request_duration_seconds'), key=lambda h: (h['labels']['source'], h['labels']['endpoint'])):
+                labels: dict[str, str] = h['labels']
+                requests_count: int = sum(h['buckets'])
+                lines.append(f'  {labels["source"]:<40} {labels["endpoint"]:<14} {requests_count:>8} {int(total("mathget_index_request_errors_total", **labels)):>7} {int(total("mathget_index_retries_total", **labels)):>7} {int(total("mathget_index_hedged_requests_total", **labels)):>7} {h["sum"] / requests_count * 1000:>10.1f}')
+
+            text = '\n'.join(lines) + '\n'
+
+    if output is None:
+        emit('metrics', format=output_format, text=text.removesuffix('\n'))
+    else:
+        output_path: Path = Path(output)
+        tmp_path: Path = output_path.with_name(f'.{output_path.name}.{uuid.uuid4().hex}.tmp')
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, output_path)
+
+    if reset:
+        metrics_file.unlink(missing_ok=True)
+
+    return None
+
+@traced('publish')
+def publish(package_dir: str, index_dir: str = '.', level: int = default_compression_level, force: bool = False) -> None | Error:
+    """Builds the archive and metadata files of a package source into a package index directory.
+
+    The source needs an `init.mscr` and a `package.metadata` file (the `[package]` and
+    `[dependencies]` tables of the index metadata). The archive is deterministic: the
+    same sources always give the same archive, and so the same hash.
+
+    Args:
+    package_dir (str): The directory of the package source.
+    index_dir (str): The directory of the package index. Defaults to '.'.
+    level (int): The deflate level, from 0 (stored) to 9. Defaults to default_compression_level.
+    force (bool): Whether to replace an already published version. Defaults to False.
+
+    Returns:
+    None | Error: The error (None if there isn't)
+    """
+
+    source_dir: Path = Path(package_dir)
+
+    if not source_dir.is_dir():
+        return FileOrDirectoryNotFoundError(package_dir)
+
+    if not 0 <= level <= 9:
+        return InvalidArgumentsError(f'--level {level}')
+
+    start: float = time.perf_counter()
+
+    metadata: dict | Error = publish_package(source_dir, Path(index_dir), level, force)
     if isinstance(metadata, Error):
         return metadata
+
+    archive: dict = metadata['archive']
+    emit('package.published', package=metadata['package']['name'], version=metadata['package']['version'], index=index_dir, size=archive['size'], sha256=archive['sha256'],
+         text=f'Published {metadata["package"]["name"]}-{metadata["package"]["version"]} to "{index_dir}": {len(metadata["files"])} files, {format_size(archive["unpacked_size"])} packed to {format_size(archive["size"])} in {time.perf_counter() - start:.2f}s.\nArchive hash: --hash=sha256:{archive["sha256"]}')
+
+    return None
+
+@traced('update')
+def update(package_name: str | None = None, requirements_file: str | None = None, force: bool = False, require_hashes: bool = False, precompile: bool = False, dry_run: bool = False, save_plan: str | None = None, extract: bool | None = None) -> None | Error:
+    """Updates packages to the latest version available in the package index.
+
+    Args:
+    package_name (str | None): The package to update, with an optional version (e.g. `package<=1.2`). Defaults to None.
+    requirements_file (str | None): The path to the requirements file. Defaults to None.
+    force (bool): Whether to force the update of the package. Defaults to False.
+    require_hashes (bool): Whether every package archive must match a hash given in the requirements. Defaults to False.
+    precompile (bool): Whether to precompile the installed packages with the MathScript toolchain. Defaults to False.
+    dry_run (bool): Whether to only show what would be updated, with the download size and an estimated time. Defaults to False.
+    save_plan (str | None): The file to save the plan of the dry run to (see `apply_plan`), implies `dry_run`. Defaults to None.
+    extract (bool | None): Whether to extract the packages rather than read them from their archives (see `install_resolved_package`), None to keep how each is installed. Defaults to None.
+
+    Returns:
+    None | Error: The error (None if there isn't)
+    """
+
+    requirements: list[Requirement] | Error = get_requirements(package_name, requirements_file)
+    if isinstance(requirements, Error):
+        return requirements
+
+    cache: MetadataCache = MetadataCache()
+    manifest: Manifest = load_manifest()
+
+    for requirement in requirements:
+        if requirement.name not in manifest:
+            return PackageMetadataNotFoundError(requirement.name)
+
+    if dry_run or save_plan is not None:
+        return plan_requirements('update', requirements, cache, manifest, force, require_hashes, precompile, save_plan, extract)
+
+    downloads: dict[str, Future] = {}
+
+    with ThreadPoolExecutor(max_workers=4) as downloader:
+        def start_download(package: ResolvedPackage) -> None:
+            if needs_install(package, manifest, force):
+                message(f'Updating package "{package.name}" to version {package.version}.', package=package.name, version=package.version)
+                if needs_download(package, manifest, force, extract):
+                    downloads[package.name] = downloader.submit(download_resolved_package, package, require_hashes)
+
+        resolved: list[ResolvedPackage] | Error = resolve_requirements(requirements, cache, start_download)
+        if isinstance(resolved, Error):
+            discard_downloads(downloads)
+            return resolved
+
+        for package in resolved:
+            if package.requested and not needs_install(package, manifest, force):
+                emit('package.unchanged', package=package.name, version=package.version, text=f'Package "{package.name}" is already up to date.\nVersion {package.version} is already installed.')
+
+        mark_requested([package.name for package in resolved if package.requested and not needs_install(package, manifest, force)], manifest)
+
+        return install_resolved([package for package in resolved if needs_install(package, manifest, force)], downloads, cache, updating=True, precompile=precompile, extract=extract)
+
+@traced('switch')
+def switch(package_name: str, version: str | None = None) -> None | Error:
+    """Switches an installed package to another of its installed versions, without any network access.
+
+    Args:
+    package_name (str): The name of the package.
+    version (str | None): The version to switch to, None to list the installed versions. Defaults to None.
+
+    Returns:
+    None | Error: The error (None if there isn't)
+    """
+
+    manifest: Manifest = load_manifest()
+
+    if package_name not in manifest:
+        return PackageMetadataNotFoundError(package_name)
+
+    active: str = manifest.packages[package_name]['version']
+    stored: list[str] = [v for v in manifest.stored(package_name) if stored_path(packages_install_dir, package_name, v) is not None]
+
+    if version is None:
+        versions: list[str] = sorted([active, *stored], key=version_key)
+        emit('package.versions', package=package_name, versions=versions, active=active,
+             text='\n'.join([f'Installed versions of package "{package_name}":', *(f'- {v}{" (active)" if v == active else ""}' for v in versions)]))
+        return None
+
+    if version == active:
+        emit('package.unchanged', package=package_name, version=version, text=f'Package "{package_name}" is already at version {version}.')
+        return None
+
+    if version not in stored:
+        return VersionNotStoredError(package_name, version)
+
+    with package_lock(package_name):
+        trashed: list[Path] | Error = activate(packages_install_dir, package_name, version, active, move_to_trash)
+        if isinstance(trashed, Error):
+            return trashed
+
+        manifest.activate(package_name, version)
+        manifest.save()
+
+    delete_trees(trashed)
+
+    emit('package.switched', package=package_name, version=version, previous_version=active, text=f'Package "{package_name}" switched from version {active} to version {version}.')
+
+    # The dependencies were resolved for this version when it was installed, they may have moved on since
+    missing: list[str] = [name for name in manifest.packages[package_name].get('dependencies', []) if name not in manifest]
+    if missing:
+        message(f'Its dependencies {", ".join(missing)} aren\'t installed, use `mathget install {package_name}=={version}` to install them.', package=package_name, missing=missing)
+
+    return None
+
+@traced('verify')
+def verify(package_names: list[str] | None = None, repair: bool = False) -> None | Error:
+    """Verifies the files of the installed packages against the hashes recorded when they were installed.
+
+    Every file is hashed in parallel through a memory mapping (see `check_installed`),
+    so the whole installation is verified at the speed of the disk. Repairing takes the
+    archives of the damaged packages from the download cache or the index again and
+    rewrites only their damaged files.
+
+    Args:
+    package_names (list[str] | None): The packages to verify, None for every installed package. Defaults to None.
+    repair (bool): Whether to repair the damaged packages. Defaults to False.
+
+    Returns:
+    None | Error: The error (None if there isn't)
+    """
+
+    manifest: Manifest = load_manifest()
+    names: list[str] = list(dict.fromkeys(package_names)) if package_names else sorted(manifest.packages)
+
+    for name in names:
+        if name not in manifest:
+            return PackageMetadataNotFoundError(name)
+
+    start: float = time.perf_counter()
+    damaged: dict[str, dict[str, str]] = check_installed(names, manifest)
+
+    files: int = sum(len(manifest.packages[name].get('files', [])) for name in names)
+
+    for name in [name for name in names if 'hashes' not in manifest.packages[name] and not any(expected_hashes(name, manifest.packages[name]).values())]:
+        message(f'Package "{name}" was installed without file hashes, reinstall it to verify its content.', package=name)
+
+    for name, problems in sorted(damaged.items()):
+        emit('package.damaged', package=name, version=manifest.packages[name]['version'], files=problems,
+             text='\n'.join([f'Package "{name}" is damaged:', *(f'- {file} ({problem})' for file, problem in sorted(problems.items()))]))
+
+    duration: float = time.perf_counter() - start
+    emit('verify.done', packages=len(names), files=files, damaged=sorted(damaged), duration=round(duration, 3),
+         text=f'Verified {files} files of {len(names)} package{"s" if len(names) != 1 else ""} in {duration:.2f}s: ' + (f'{len(damaged)} damaged.' if damaged else 'all intact.'))
+
+    if not damaged or not repair:
+        return DamagedPackageError(sorted(damaged)) if damaged else None
+
+    cache: MetadataCache = MetadataCache()
+    failed: list[str] = []
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = {executor.submit(repair_package, name, manifest.packages[name], problems, cache): name for name, problems in damaged.items()}
+
+        for future, name in futures.items():
+            entries: dict[str, list[int]] | None | Error = future.result()
+
+            if isinstance(entries, Error):
+                message(f'Package "{name}" couldn\'t be repaired: {entries.message}', package=name)
+                failed.append(name)
+                continue
+
+            if entries is not None:
+                manifest.set_archive(name, entries)
+
+    manifest.save()
+
+    # Whatever was rewritten is verified again
+    remaining: dict[str, dict[str, str]] = check_installed([name for name in damaged if name not in failed], manifest)
+
+    for name in sorted(set(damaged) - set(failed) - set(remaining)):
+        rewritten: str = 'archive replaced' if 'archive' in manifest.packages[name] else f'{len(damaged[name])} file{"s" if len(damaged[name]) > 1 else ""} rewritten'
+        emit('package.repaired', package=name, version=manifest.packages[name]['version'], files=sorted(damaged[name]), text=f'Package "{name}" repaired ({rewritten}).')
+
+    if failed or remaining:
+        return DamagedPackageError(sorted(set(failed) | set(remaining)), repaired=True)
+
+    return None
+
+def search(keyword: str, package_index_url: str | None = None) -> None | Error: # type: ignore
+    """Searches the package index for packages matching the keyword.
+
+    Args:
+    keyword (str): The keyword to search for
+    package_index_url (str | None): The URL of the package index. Defaults to None.
+    """
+
+    sources: IndexSources = IndexSources([IndexSource(package_index_url)]) if package_index_url is not None else index_sources
+
+    response: requests.Response | Error = sources.fetch('search.php', keyword, headers={'Accept': accept_header})
+
+    if isinstance(response, Error):
+        return response
+
+    if response.status_code == 404:
+        return PackageNotFoundError(keyword, 'remote')
+    
+    if not (200 <= response.status_code <= 299):
+        return HTTPError(response.status_code)
+
+    document: dict | Error = parse_response(response)
+    if isinstance(document, Error):
+        return document
+
+    packages = document['packages']
     
-    changelog = metadata['package']['changelog'] if 'changelog' in metadata['package'] else []
+    lines: list[str] = [f'Found {len(packages)} packages matching the keyword "{keyword}":']
 
-    if changelog == []:
-        print(f'No changelog found for package "{package_name}".')
+    if packages == []:
+        lines.append('(None)')
     else:
-        print(f'Changelog for package "{package_name}":')
-        for change in changelog:
-            print(f'- {change}')
+        for package in packages:
+            lines.append(f'- {package["name"]}=={package["version"]} (License: {package["license"] if "license" in package else "Not specified"})')
+
+    emit('search.results', keyword=keyword, packages=packages, text='\n'.join(lines))
 
     return None
 
-def get_license(package_name: str) -> None | Error:
-    """Retrieves the license of a package from the package index.
+def get_info(package_names: list[str], installed: bool = False, output_json: bool = False) -> None | Error:
+    """Retrieves information about packages from the package index, concurrently.
 
     Args:
-    packaged_name (str): The name of the package to retrive its license
+    package_names (list[str]): The packages to retrieve information about, with an optional version (e.g. `package==1.2`)
+    installed (bool): Whether to retrieve it for the installed packages instead. Defaults to False.
+    output_json (bool): Whether to print JSON lines. Defaults to False.
 
     Returns:
     None | Error: The error (None if there isn't)
     """
 
-    metadata: dict | Error = get_remote_metadata(package_name)
+    requirements: list[Requirement] | Error = package_queries(package_names, installed)
+    if isinstance(requirements, Error):
+        return requirements
 
-    if isinstance(metadata, Error):
-        return metadata
+    cache: MetadataCache = MetadataCache()
+
+    def query(requirement: Requirement) -> dict | Error:
+        metadata: dict | Error = query_metadata(requirement, cache)
+        if isinstance(metadata, Error):
+            return metadata
+
+        package: dict = metadata['package']
+
+        return {
+            'name': package['name'],
+            'version': package['version'],
+            'description': package.get('description'),
+            'author': package.get('author'),
+            'license': package.get('license'),
+            'homepage': package.get('homepage'),
+            'keywords': package.get('keywords') or [],
+            'dependencies': metadata.get('dependencies') or {},
+        }
+
+    def describe(info: dict) -> str:
+        lines: list[str] = [
+            f'Package: {info["name"]}',
+            f'Version: {info["version"]}',
+            f'Description: {info["description"] or "Not specified"}',
+            f'Author: {info["author"] or "Not specified"}',
+            f'License: {info["license"] or "Not specified"}',
+            f'Homepage: {info["homepage"] or "Not specified"}',
+        ]
+
+        if info['keywords']:
+            lines.append('Keywords:')
+            lines += [f'- {keyword}' for keyword in info['keywords']]
+        else:
+            lines.append('Keywords: (None)')
+
+        if info['dependencies']:
+            lines.append('Dependencies:')
+            lines += [f'- {format_dependency(dependency_name, dependency_version)}' for dependency_name, dependency_version in info['dependencies'].items()]
+        else:
+            lines.append('Dependencies: (None)')
+
+        return '\n'.join(lines)
+
+    return run_queries(requirements, query, describe, output_json)
+
+def get_dependency_graph(package_name: str, index_version: str = 'latest', graph: DependencyGraph | None = None, cache: MetadataCache | None = None) -> dict[tuple[str, str], tuple[str, dict[str, str]] | Error]:
+    """Walks the dependency graph of a package, the metadata of each level being fetched concurrently.
+
+    Every package and version specifier is looked up once however many packages depend
+    on it, and not at all if the dependency graph cache already knows it.
+
+    Args:
+    package_name (str): The name of the package.
+    index_version (str, optional): The package index version specifier of the package. Defaults to 'latest'
+    graph (DependencyGraph | None, optional): The dependency graph cache. Defaults to None
+    cache (MetadataCache | None, optional): The metadata cache of the current command. Defaults to None
+
+    Returns:
+    dict[tuple[str, str], tuple[str, dict[str, str]] | Error]: The resolved version and the dependencies of each (package, specifier), or the error of its lookup
+    """
+
+    resolved: dict[tuple[str, str], tuple[str, dict[str, str]] | Error] = {}
+    level: list[tuple[str, str]] = [(package_name, index_version)]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        while level:
+            futures: dict[tuple[str, str], Future] = {}
+            new: list[tuple[str, str]] = []
+
+            for key in dict.fromkeys(level):
+                if key in resolved:
+                    continue
+
+                known: tuple[str, dict[str, str]] | None = graph.resolve(*key) if graph is not None else None
+                if graph is not None:
+                    count('mathget_cache_requests_total', cache='dependency_graph', result='miss' if known is None else 'hit')
+
+                if known is not None:
+                    resolved[key] = known
+                    new.append(key)
+                else:
+                    futures[key] = executor.submit(get_remote_metadata, *key, cache)
+
+            for key, future in futures.items():
+                metadata: dict | Error = future.result()
+
+                if isinstance(metadata, Error):
+                    resolved[key] = metadata
+                    continue
+
+                resolved[key] = (metadata['package']['version'], dependency_specs(metadata))
+                new.append(key)
+                if graph is not None:
+                    graph.add(*key, *resolved[key]) # type: ignore
+
+            level = [dependency for key in new for dependency in resolved[key][1].items()] # type: ignore
+
+    return resolved
+
+def format_tree(root: str, children: Callable[[str], list[tuple[str, str]]]) -> str:
+    """Formats a tree, a subtree shown already being only marked with `(*)`.
+
+    Args:
+    root (str): The root node.
+    children (Callable[[str], list[tuple[str, str]]]): Gives the children of a node and their labels.
+
+    Returns:
+    str: The tree, one node per line
+    """
+
+    lines: list[str] = [root]
+    shown: set[str] = set()
+
+    def format_children(node: str, prefix: str, path: set[str]) -> None:
+        nodes: list[tuple[str, str]] = children(node)
+
+        for i, (child, label) in enumerate(nodes):
+            last: bool = i == len(nodes) - 1
+
+            if child in path:
+                lines.append(f'{prefix}{"└── " if last else "├── "}{label} (cycle)')
+            elif child in shown and children(child):
+                lines.append(f'{prefix}{"└── " if last else "├── "}{label} (*)')
+            else:
+                lines.append(f'{prefix}{"└── " if last else "├── "}{label}')
+                shown.add(child)
+                format_children(child, prefix + ("    " if last else "│   "), path | {child})
+
+    format_children(root, '', {root})
+
+    return '\n'.join(lines)
+
+def get_dependencies(package_names: list[str], tree: bool = False, refresh: bool = False, installed: bool = False, output_json: bool = False) -> None | Error:
+    """Retrieves the dependencies of packages from the package index, concurrently.
+
+    Args:
+    package_names (list[str]): The packages to retrieve the dependencies of, with an optional version (e.g. `package>=1.2`)
+    tree (bool): Whether to show the whole dependency trees rather than the direct dependencies. Defaults to False.
+    refresh (bool): Whether to look up every version again rather than trusting the dependency graph cache. Defaults to False.
+    installed (bool): Whether to retrieve them for the installed packages instead. Defaults to False.
+    output_json (bool): Whether to print JSON lines (with `tree`, each tree as the dependencies of its nodes). Defaults to False.
+
+    Returns:
+    None | Error: The error (None if there isn't)
+    """
+
+    requirements: list[Requirement] | Error = package_queries(package_names, installed)
+    if isinstance(requirements, Error):
+        return requirements
+
+    cache: MetadataCache = MetadataCache()
+
+    if tree:
+        graph: DependencyGraph = DependencyGraph(packages_install_dir / 'metadata_files' / 'cached' / 'graph.json', 0 if refresh else default_resolution_ttl)
+
+        def query_tree(requirement: Requirement) -> dict | Error:
+            resolved: dict[tuple[str, str], tuple[str, dict[str, str]] | Error] = get_dependency_graph(requirement.name, requirement.index_version, graph, cache)
+
+            root: tuple[str, dict[str, str]] | Error = resolved[(requirement.name, requirement.index_version)]
+            if isinstance(root, Error):
+                return root
+
+            # Nodes are `name-version`, the versions dependencies resolve to, each with its [node, label] children
+            nodes: dict[str, list[list[str]]] = {}
+            for (name, _), result in resolved.items():
+                if isinstance(result, Error):
+                    continue
+
+                children: list[list[str]] = nodes.setdefault(f'{name}-{result[0]}', [])
+                for dependency, index_version in sorted(result[1].items()):
+                    dependency_result: tuple[str, dict[str, str]] | Error = resolved[(dependency, index_version)]
+                    label: str = str(Requirement.from_index_version(dependency, index_version))
+                    if isinstance(dependency_result, Error):
+                        children.append([f'{dependency} {index_version}', f'{label} (not found)'])
+                    else:
+                        children.append([f'{dependency}-{dependency_result[0]}', f'{label} ({dependency_result[0]})'])
+
+            return {'name': requirement.name, 'version': root[0], 'tree': nodes}
+
+        def describe_tree(result: dict) -> str:
+            return format_tree(f'{result["name"]}-{result["version"]}', lambda node: [tuple(child) for child in result['tree'].get(node, [])]) # type: ignore
+
+        err: Error | None = run_queries(requirements, query_tree, describe_tree, output_json)
+        graph.save()
+
+        return err
+
+    def query(requirement: Requirement) -> dict | Error:
+        metadata: dict | Error = query_metadata(requirement, cache)
+        if isinstance(metadata, Error):
+            return metadata
+
+        return {'name': metadata['package']['name'], 'version': metadata['package']['version'], 'dependencies': metadata.get('dependencies') or {}}
+
+    def describe(result: dict) -> str:
+        if not result['dependencies']:
+            return f'Dependencies for {result["name"]}: (None)'
+
+        return '\n'.join([
+            f'Dependencies for {result["name"]}:' if len(requirements) > 1 else 'Dependencies:',
+            *(f'- {format_dependency(dependency_name, dependency_version)}' for dependency_name, dependency_version in result['dependencies'].items()),
+        ])
 
-    if 'license' in metadata['package']:
-        print(f'License for package "{metadata["package"]["name"]}": {metadata["package"]["license"]}')
+    return run_queries(requirements, query, describe, output_json)
+
+def get_dependents(package_name: str, tree: bool = False) -> None | Error:
+    """Shows the installed packages depending on a package.
+
+    Args:
+    package_name (str): The name of the package.
+    tree (bool): Whether to show the packages depending on it through other packages too, as a tree. Defaults to False.
+
+    Returns:
+    None | Error: The error (None if there isn't)
+    """
+
+    manifest: Manifest = load_manifest()
+    dependents: set[str] = manifest.dependents(package_name)
+
+    if package_name not in manifest and not dependents:
+        return PackageNotFoundError(package_name)
+
+    def label(name: str) -> str:
+        entry: dict = manifest.packages.get(name, {})
+        return f'{name}=={entry.get("version", "?")}{" (requested)" if entry.get("requested", False) else ""}'
+
+    if tree:
+        text: str = format_tree(package_name, lambda node: [(name, label(name)) for name in sorted(manifest.dependents(node))])
+    elif dependents:
+        text = '\n'.join([f'Packages depending on {package_name}:', *(f'- {label(name)}' for name in sorted(dependents))])
     else:
-        print(f'License for package "{metadata["package"]["name"]}": Not specified.')
-    
+        text = f'Packages depending on {package_name}: (None)'
+
+    emit('package.dependents', package=package_name, dependents=sorted(manifest.dependents(package_name, recursive=tree)), text=text)
+
     return None
 
+def get_versions(package_names: list[str], installed: bool = False, output_json: bool = False) -> None | Error:
+    """Retrieves the versions of packages from the package index, concurrently.
+
+    Args:
+    package_names (list[str]): The packages to retrieve the versions of
+    installed (bool): Whether to retrieve them for the installed packages instead. Defaults to False.
+    output_json (bool): Whether to print JSON lines. Defaults to False.
+
+    Returns:
+    None | Error: The error (None if there isn't)
+    """
+
+    requirements: list[Requirement] | Error = package_queries(package_names, installed)
+    if isinstance(requirements, Error):
+        return requirements
+
+    manifest: Manifest = load_manifest()
+
+    def query(requirement: Requirement) -> dict | Error:
+        response: requests.Response | Error = index_sources.fetch('versions.php', requirement.name, headers={'Accept': accept_header})
+
+        if isinstance(response, Error):
+            return response
+
+        if response.status_code == 404:
+            return PackageNotFoundError(requirement.name, 'remote')
+
+        if not (200 <= response.status_code <= 299):
+            return HTTPError(response.status_code)
+
+        document: dict | Error = parse_response(response)
+        if isinstance(document, Error):
+            return document
+
+        entry: dict = manifest.packages.get(requirement.name, {})
+
+        return {'name': requirement.name, 'versions': document['versions'], 'active': entry.get('version'), 'installed': sorted(entry.get('stored', {}), key=version_key)}
+
+    def describe(result: dict) -> str:
+        if result['versions'] == []:
+            return f'No versions found for package "{result["name"]}".'
+
+        return '\n'.join([
+            f'Versions for package "{result["name"]}":',
+            *(f'- {version}{" (active)" if version == result["active"] else " (installed, see `mathget switch`)" if version in result["installed"] else ""}' for version in result['versions']),
+        ])
+
+    return run_queries(requirements, query, describe, output_json)
+
+def get_changelog(package_names: list[str], installed: bool = False, output_json: bool = False) -> None | Error:
+    """Retrieves the changelog of packages from the package index, concurrently.
+
+    Args:
+    package_names (list[str]): The packages to retrieve the changelog of, with an optional version (e.g. `package==1.2`)
+    installed (bool): Whether to retrieve it for the installed packages instead. Defaults to False.
+    output_json (bool): Whether to print JSON lines. Defaults to False.
+
+    Returns:
+    None | Error: The error (None if there isn't)
+    """
+
+    requirements: list[Requirement] | Error = package_queries(package_names, installed)
+    if isinstance(requirements, Error):
+        return requirements
+
+    cache: MetadataCache = MetadataCache()
+
+    def query(requirement: Requirement) -> dict | Error:
+        metadata: dict | Error = query_metadata(requirement, cache)
+        if isinstance(metadata, Error):
+            return metadata
+
+        return {'name': metadata['package']['name'], 'version': metadata['package']['version'], 'changelog': metadata['package'].get('changelog') or []}
+
+    def describe(result: dict) -> str:
+        if result['changelog'] == []:
+            return f'No changelog found for package "{result["name"]}".'
+
+        return '\n'.join([f'Changelog for package "{result["name"]}":', *(f'- {change}' for change in result['changelog'])])
+
+    return run_queries(requirements, query, describe, output_json)
+
+def get_license(package_names: list[str], installed: bool = False, output_json: bool = False) -> None | Error:
+    """Retrieves the license of packages from the package index, concurrently.
+
+    Args:
+    package_names (list[str]): The packages to retrieve the license of, with an optional version (e.g. `package==1.2`)
+    installed (bool): Whether to retrieve it for the installed packages instead (e.g. for a license audit). Defaults to False.
+    output_json (bool): Whether to print JSON lines. Defaults to False.
+
+    Returns:
+    None | Error: The error (None if there isn't)
+    """
+
+    requirements: list[Requirement] | Error = package_queries(package_names, installed)
+    if isinstance(requirements, Error):
+        return requirements
+
+    cache: MetadataCache = MetadataCache()
+
+    def query(requirement: Requirement) -> dict | Error:
+        metadata: dict | Error = query_metadata(requirement, cache)
+        if isinstance(metadata, Error):
+            return metadata
+
+        return {'name': metadata['package']['name'], 'version': metadata['package']['version'], 'license': metadata['package'].get('license')}
+
+    def describe(result: dict) -> str:
+        return f'License for package "{result["name"]}": {result["license"] or "Not specified."}'
+
+    return run_queries(requirements, query, describe, output_json)
+
 def open_doc(package_name: str) -> None | Error:
     """Opens the documentation of a package in the default browser.
 
@@ -711,7 +2566,7 @@ def open_doc(package_name: str) -> None | Error:
         except ImportError:
             return InternalError("The `webbrowser` module is not available.")
     else:
-        print(f'No documentation found for package "{metadata["package"]["name"]}".')
+        message(f'No documentation found for package "{metadata["package"]["name"]}".', package=metadata['package']['name'])
     
     return None
 
@@ -760,6 +2615,6 @@ def open_issues(package_name: str) -> None | Error:
         except ImportError:
             return InternalError("The `webbrowser` module is not available.")
     else:
-        print(f'No issues found for package "{metadata["package"]["name"]}".')
+        message(f'No issues found for package "{metadata["package"]["name"]}".', package=metadata['package']['name'])
     
     return None
\ No newline at end of file
@@ -260,6 +260,19 @@ class HTTPError(NetworkError):
 
         super().__init__(f'HTTP status code {status_code}: {http_error_message[status_code]}.')
 
+class DocumentTooLargeError(NetworkError):
+    """Raised when a document of the package index exceeds the size it may have."""
+
+    def __init__(self, url: str, max_size: int) -> None:
+        """Initialize a document too large error.
+
+        Args:
+        url (str): The URL of the document.
+        max_size (int): The maximum size of the document, in bytes.
+        """
+
+        super().__init__(f'The document at "{url}" is larger than {max_size} bytes.')
+
 # PackageError
 
 class PackageNotFoundError(PackageError):
@@ -289,6 +302,106 @@ class PackageMetadataNotFoundError(PackageError):
 
         super().__init__(f'Could not localize metadata for the "{package_name}" package.')
 
+class HashMismatchError(PackageError):
+    """Raised when a downloaded package doesn't match the expected hashes."""
+
+    def __init__(self, package_name: str, version: str, expected: list[str], actual: str | None = None) -> None:
+        """Initialize a hash mismatch error.
+
+        Args:
+        package_name (str): The name of the package.
+        version (str): The version of the package.
+        expected (list[str]): The accepted hashes, as `algorithm:hexdigest`.
+        actual (str | None): The hash of the downloaded archive, None if no hash was given. Defaults to None.
+        """
+
+        if not expected:
+            super().__init__(f'No hash given for the "{package_name}" package ({version}), hashes are required.')
+        else:
+            super().__init__(f'The archive of the "{package_name}" package ({version}) doesn\'t match the expected hashes.\nExpected: {", ".join(expected)}\nGot: {actual}')
+
+class InvalidPackageError(PackageError):
+    """Raised when a package source can't be published."""
+
+    def __init__(self, path: Path | str, reason: str) -> None:
+        """Initialize an invalid package error.
+
+        Args:
+        path (Path | str): The path to the package source.
+        reason (str): What is wrong with the package.
+        """
+
+        super().__init__(f'Invalid package "{path}": {reason}.')
+
+class PackageAlreadyPublishedError(PackageError):
+    """Raised when publishing a version of a package that is already in the index."""
+
+    def __init__(self, package_name: str, version: str) -> None:
+        """Initialize a package already published error.
+
+        Args:
+        package_name (str): The name of the package.
+        version (str): The version of the package.
+        """
+
+        super().__init__(f'Version {version} of the "{package_name}" package is already published, a published archive must not change (use --force to replace it anyway).')
+
+class VersionNotStoredError(PackageError):
+    """Raised when switching a package to a version that isn't kept installed."""
+
+    def __init__(self, package_name: str, version: str) -> None:
+        """Initialize a version not stored error.
+
+        Args:
+        package_name (str): The name of the package.
+        version (str): The version of the package.
+        """
+
+        super().__init__(f'Version {version} of the "{package_name}" package isn\'t installed, install it with `mathget install {package_name}=={version}`.')
+
+class QueryFailedError(PackageError):
+    """Raised when a query on several packages failed for some of them."""
+
+    def __init__(self, queries: list[str]) -> None:
+        """Initialize a query failed error.
+
+        Args:
+        queries (list[str]): The packages the query failed for.
+        """
+
+        super().__init__(f'The query failed for {len(queries)} package{"s" if len(queries) > 1 else ""}: {", ".join(queries)}.')
+
+class DamagedPackageError(PackageError):
+    """Raised when installed packages don't match the hashes recorded when they were installed."""
+
+    def __init__(self, package_names: list[str], repaired: bool = False) -> None:
+        """Initialize a damaged package error.
+
+        Args:
+        package_names (list[str]): The damaged packages.
+        repaired (bool, optional): Whether repairing them was attempted. Defaults to False
+        """
+
+        if repaired:
+            super().__init__(f'{len(package_names)} package{"s" if len(package_names) > 1 else ""} couldn\'t be repaired: {", ".join(package_names)}. Reinstall them with `mathget install --force`.')
+        else:
+            super().__init__(f'{len(package_names)} package{"s" if len(package_names) > 1 else ""} damaged: {", ".join(package_names)}. Repair them with `mathget verify --repair`.')
+
+# FilesystemError
+
+class InvalidArchiveError(FilesystemError):
+    """Raised when an archive is corrupted or isn't of the expected kind."""
+
+    def __init__(self, path: Path | str, reason: str) -> None:
+        """Initialize an invalid archive error.
+
+        Args:
+        path (Path | str): The path to the archive.
+        reason (str): What is wrong with the archive.
+        """
+
+        super().__init__(f'Invalid archive "{path}": {reason}.')
+
 # UserError
 
 class InvalidCommandError(UserError):
@@ -315,6 +428,44 @@ class InvalidArgumentsError(UserError):
 
         super().__init__(f'Invalid argument: "{'", "'.join(arguments)}".')
 
+class InvalidRequirementError(UserError):
+    """Raised when a requirement can't be parsed."""
+
+    def __init__(self, requirement: str, source: str | None = None) -> None:
+        """Initialize an invalid requirement error.
+
+        Args:
+        requirement (str): The invalid requirement.
+        source (str | None): Where the requirement comes from (e.g. `file.req:3`). Defaults to None.
+        """
+
+        super().__init__(f'Invalid requirement: "{requirement}"' + (f' ({source}).' if source else '.'))
+
+class InvalidPlanError(UserError):
+    """Raised when an install plan can't be applied."""
+
+    def __init__(self, path: Path | str, reason: str) -> None:
+        """Initialize an invalid plan error.
+
+        Args:
+        path (Path | str): The path to the plan.
+        reason (str): Why the plan can't be applied.
+        """
+
+        super().__init__(f'Invalid plan "{path}": {reason}.')
+
+class ConfirmationRequiredError(UserError):
+    """Raised when a command needs a confirmation that can't be asked (JSON output, no input)."""
+
+    def __init__(self, question: str) -> None:
+        """Initialize a confirmation required error.
+
+        Args:
+        question (str): The confirmation that would have been asked.
+        """
+
+        super().__init__(f'"{question}" can\'t be asked without a terminal or with --json, use -f to proceed without confirmation.')
+
 # SystemError
 
 class InstallationNotFoundError(SystemError):
@@ -353,4 +504,30 @@ class AccesDeniedError(SystemError):
         if not isinstance(path, Path):
             path = Path(path)
 
-        super().__init__(f'The access to the {'directory' if path.is_dir() else 'file'} "{path}" is denied.')
\ No newline at end of file
+        super().__init__(f'The access to the {'directory' if path.is_dir() else 'file'} "{path}" is denied.')
+
+class OptionalModuleNotFoundError(SystemError):
+    """Raised when a feature needs a Python module that isn't installed."""
+
+    def __init__(self, module: str, feature: str) -> None:
+        """Initialize an optional module not found error.
+
+        Args:
+        module (str): The name of the missing module.
+        feature (str): The feature needing the module.
+        """
+
+        super().__init__(f'The "{module}" module is required for {feature} (pip install {module}).')
+
+class PrecompileError(SystemError):
+    """Raised when the MathScript toolchain fails to precompile a package."""
+
+    def __init__(self, package_name: str, output: str) -> None:
+        """Initialize a precompile error.
+
+        Args:
+        package_name (str): The name of the package.
+        output (str): The output of the toolchain.
+        """
+
+        super().__init__(f'Could not precompile the "{package_name}" package:\n{output}')
@@ -0,0 +1,303 @@
+from typing import Any, Callable, TextIO
+import itertools
+import threading
+import json
+import time
+import sys
+
+# ################################## Variables ###################################
+
+# How often the running operations are redrawn (or sampled, as JSON), in seconds
+render_interval: float = 0.1
+json_progress_interval: float = 0.25
+
+_bar_width: int = 50
+_bar_colour: str = '\x1b[38;2;0;175;80m'
+_reset: str = '\x1b[0m'
+
+# ################################## Event bus ###################################
+
+class Progress:
+    """A running operation (a download, an extraction...) and how far it got.
+
+    `advance` only adds to a counter, renderers sample it at their own pace: the hot
+    loops pay for an addition, however fast they run. A progress is advanced from
+    the thread running the operation only.
+    """
+
+    def __init__(self, bus: 'EventBus', operation: str, label: str, total: int | None, unit: str, fields: dict[str, Any]) -> None:
+        """Initialize a progress, started when entering its `with` block.
+
+        Args:
+        bus (EventBus): The bus its events are sent to.
+        operation (str): The kind of operation (e.g. `download`).
+        label (str): What is shown of it (e.g. `Downloading foo-1.2`).
+        total (int | None): The amount of work, None if unknown.
+        unit (str): The unit of the amounts (e.g. `B` or `files`).
+        fields (dict[str, Any]): The fields added to its events (e.g. the package).
+        """
+
+        self.bus: 'EventBus' = bus
+        self.id: int = next(bus._ids)
+        self.operation: str = operation
+        self.label: str = label
+        self.total: int | None = total
+        self.unit: str = unit
+        self.fields: dict[str, Any] = fields
+        self.done: int = 0
+        self.start: float = time.perf_counter()
+
+    def advance(self, amount: int = 1) -> None:
+        self.done += amount
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def __enter__(self) -> 'Progress':
+        self.start = time.perf_counter()
+        with self.bus._lock:
+            self.bus.running[self.id] = self
+        self.bus.emit('progress.start', id=self.id, operation=self.operation, label=self.label, total=self.total, unit=self.unit, **self.fields)
+        return self
+
+    def __exit__(self, *args) -> None:
+        with self.bus._lock:
+            self.bus.running.pop(self.id, None)
+        self.bus.emit('progress.end', id=self.id, operation=self.operation, label=self.label, done=self.done, total=self.total, unit=self.unit, duration=round(self.elapsed, 3), progress=self, **self.fields)
+
+class EventBus:
+    """Where commands report their progress and results, for a renderer to show them.
+
+    An event is a dict with its kind (`event`), its time and its fields. Events with
+    a `text` field have a human readable form, which the terminal renderer prints.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an event bus without subscribers."""
+
+        self.running: dict[int, Progress] = {}
+        self._handlers: list[Callable[[dict], None]] = []
+        self._ids = itertools.count(1)
+        self._lock: threading.Lock = threading.Lock()
+
+    def subscribe(self, handler: Callable[[dict], None]) -> None:
+        self._handlers.append(handler)
+
+    def unsubscribe(self, handler: Callable[[dict], None]) -> None:
+        if handler in self._handlers:
+            self._handlers.remove(handler)
+
+    def emit(self, event: str, **fields: Any) -> None:
+        """Sends an event to the subscribers.
+
+        Args:
+        event (str): The kind of event (e.g. `package.installed`).
+        **fields (Any): The fields of the event (JSON serializable).
+        """
+
+        record: dict = {'event': event, 'time': round(time.time(), 3), **fields}
+
+        for handler in list(self._handlers):
+            handler(record)
+
+    def message(self, text: str, **fields: Any) -> None:
+        """Sends a message, a status line without structured fields.
+
+        Args:
+        text (str): The message.
+        **fields (Any): Fields of the event, if any.
+        """
+
+        self.emit('message', text=text, **fields)
+
+    def progress(self, operation: str, label: str, total: int | None = None, unit: str = '', **fields: Any) -> Progress:
+        """Creates the progress of an operation, reported while its `with` block runs.
+
+        Args:
+        operation (str): The kind of operation (e.g. `download`).
+        label (str): What is shown of it (e.g. `Downloading foo-1.2`).
+        total (int | None, optional): The amount of work, None if unknown. Defaults to None
+        unit (str, optional): The unit of the amounts (e.g. `B` or `files`). Defaults to ''
+        **fields (Any): The fields added to its events (e.g. the package).
+
+        Returns:
+        Progress: The progress
+        """
+
+        return Progress(self, operation, label, total, unit, fields)
+
+# ################################## Renderers ###################################
+
+def _scale(amount: float, unit: str) -> str:
+    if unit != 'B':
+        return str(int(amount))
+
+    for prefix in ('', 'k', 'M', 'G'):
+        if amount < 1000:
+            return f'{amount:.3g}{prefix}' if prefix else str(int(amount))
+        amount /= 1000
+
+    return f'{amount:.3g}T'
+
+def format_progress(progress: Progress, colour: bool = True) -> str:
+    """Formats the line of an operation (e.g. `Unzipping: 40% ━━━━     2/5`).
+
+    Args:
+    progress (Progress): The operation.
+    colour (bool, optional): Whether to colour the bar. Defaults to True
+
+    Returns:
+    str: The line
+    """
+
+    if not progress.total:
+        return f'{progress.label}: {_scale(progress.done, progress.unit)} {progress.unit} [{progress.elapsed:.1f}s]'
+
+    ratio: float = min(1.0, progress.done / progress.total)
+    filled: int = round(ratio * _bar_width)
+    bar: str = '━' * filled + ' ' * (_bar_width - filled)
+    if colour:
+        bar = f'{_bar_colour}{bar}{_reset}'
+
+    return f'{progress.label}: {ratio * 100:3.0f}% {bar} {_scale(progress.done, progress.unit)}/{_scale(progress.total, progress.unit)}'
+
+class TerminalRenderer:
+    """Shows the events on a terminal: the running operations get a line each, redrawn
+    at most every `render_interval` seconds whatever the number of operations and how
+    fast they run, and messages are printed above them. A finished operation leaves
+    its final line. When the output isn't a terminal, only messages and finished
+    operations are printed, so that concurrent operations never garble it.
+    """
+
+    def __init__(self, bus: EventBus, stream: TextIO | None = None) -> None:
+        """Initialize a terminal renderer.
+
+        Args:
+        bus (EventBus): The bus whose running operations are drawn.
+        stream (TextIO | None, optional): The output, None for the standard output. Defaults to None
+        """
+
+        self.bus: EventBus = bus
+        self.stream: TextIO | None = stream
+        self.live: bool = (stream or sys.stdout).isatty()
+        self._drawn: int = 0
+        self._lock: threading.Lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def _output(self) -> TextIO:
+        # Looked up on every write, the standard output can be redirected meanwhile
+        return self.stream or sys.stdout
+
+    def _clear(self) -> None:
+        if self._drawn:
+            self._output.write(f'\x1b[{self._drawn}F\x1b[J')
+            self._drawn = 0
+
+    def _draw(self) -> None:
+        self._clear()
+        lines: list[str] = [format_progress(progress) for progress in list(self.bus.running.values())]
+        for line in lines:
+            self._output.write(f'{line}\x1b[K\n')
+        self._drawn = len(lines)
+        self._output.flush()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(render_interval)
+            with self._lock:
+                if self._drawn or self.bus.running:
+                    self._draw()
+
+    def handle(self, event: dict) -> None:
+        if event['event'] == 'progress.start':
+            if self.live and self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='mathget-renderer', daemon=True)
+                self._thread.start()
+            return
+
+        if event['event'] == 'progress.end':
+            text: str = format_progress(event['progress'], colour=self.live)
+        elif 'text' in event:
+            text = event['text']
+        else:
+            return
+
+        with self._lock:
+            if self.live:
+                self._clear()
+            self._output.write(f'{text}\n')
+            if self.live:
+                self._draw()
+            else:
+                self._output.flush()
+
+class JsonRenderer:
+    """Writes the events as JSON lines, for other programs to consume.
+
+    The progress of the running operations is sampled every `json_progress_interval`
+    seconds into `progress` events, rather than sent on every advance.
+    """
+
+    def __init__(self, bus: EventBus, stream: TextIO | None = None) -> None:
+        """Initialize a JSON renderer.
+
+        Args:
+        bus (EventBus): The bus whose running operations are sampled.
+        stream (TextIO | None, optional): The output, None for the standard output. Defaults to None
+        """
+
+        self.bus: EventBus = bus
+        self.stream: TextIO | None = stream
+        self._sampled: dict[int, int] = {}
+        self._lock: threading.Lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def _write(self, record: dict) -> None:
+        with self._lock:
+            output: TextIO = self.stream or sys.stdout
+            output.write(json.dumps(record, default=str) + '\n')
+            output.flush()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(json_progress_interval)
+            for progress in list(self.bus.running.values()):
+                if self._sampled.get(progress.id) != progress.done:
+                    self._sampled[progress.id] = progress.done
+                    self._write({'event': 'progress', 'time': round(time.time(), 3), 'id': progress.id, 'done': progress.done, 'total': progress.total})
+
+    def handle(self, event: dict) -> None:
+        if event['event'] == 'progress.start' and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='mathget-json-renderer', daemon=True)
+            self._thread.start()
+        elif event['event'] == 'progress.end':
+            self._sampled.pop(event['id'], None)
+            event = {k: v for k, v in event.items() if k != 'progress'}
+
+        self._write(event)
+
+bus: EventBus = EventBus()
+renderer: TerminalRenderer | JsonRenderer = TerminalRenderer(bus)
+bus.subscribe(renderer.handle)
+
+emit = bus.emit
+message = bus.message
+progress = bus.progress
+
+def json_output() -> bool:
+    return isinstance(renderer, JsonRenderer)
+
+def set_output(output_format: str) -> None:
+    """Chooses how the events are shown.
+
+    Args:
+    output_format (str): `text` for the terminal renderer, `json` for JSON lines.
+    """
+
+    global renderer
+
+    bus.unsubscribe(renderer.handle)
+    renderer = JsonRenderer(bus) if output_format == 'json' else TerminalRenderer(bus)
+    bus.subscribe(renderer.handle)
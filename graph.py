@@ -0,0 +1,96 @@
+from pathlib import Path
+import threading
+import json
+import time
+import uuid
+import os
+
+# ################################## Variables ###################################
+
+# How long what a version specifier resolves to is trusted, new versions get published
+default_resolution_ttl: float = 60 * 60 # seconds
+
+# ############################### Dependency graph ###############################
+
+class DependencyGraph:
+    """A cache of the dependency graph of the package index, kept between commands.
+
+    Nodes are package versions with the version specifiers of their dependencies. A
+    published version doesn't change, so nodes are kept for good. What a specifier
+    resolves to (e.g. `bar` `^1.0` to `1.2`) does, so resolutions expire after `ttl`
+    seconds.
+    """
+
+    def __init__(self, path: Path, ttl: float = default_resolution_ttl) -> None:
+        """Initialize a dependency graph, loading it if it exists.
+
+        Args:
+        path (Path): The path of the graph file.
+        ttl (float, optional): How long resolutions are trusted, in seconds. Defaults to default_resolution_ttl
+        """
+
+        self.path: Path = path
+        self.ttl: float = ttl
+        self.nodes: dict[str, dict[str, str]] = {}
+        self.resolutions: dict[str, tuple[str, float]] = {}
+        self.changed: bool = False
+
+        self._lock: threading.Lock = threading.Lock()
+
+        try:
+            with open(path) as f:
+                document: dict = json.load(f)
+            self.nodes = document.get('nodes', {})
+            self.resolutions = {key: (version, resolved_at) for key, (version, resolved_at) in document.get('resolutions', {}).items()}
+        except (OSError, ValueError, TypeError):
+            pass
+
+    def resolve(self, package_name: str, index_version: str) -> tuple[str, dict[str, str]] | None:
+        """Gets what a version specifier resolves to, if it's known and still fresh.
+
+        Args:
+        package_name (str): The name of the package.
+        index_version (str): The package index version specifier (e.g. `latest` or `^1.2`).
+
+        Returns:
+        tuple[str, dict[str, str]] | None: The version and its dependencies, None if unknown
+        """
+
+        with self._lock:
+            resolution: tuple[str, float] | None = self.resolutions.get(f'{package_name} {index_version}')
+
+            if resolution is None or time.time() - resolution[1] > self.ttl:
+                return None
+
+            dependencies: dict[str, str] | None = self.nodes.get(f'{package_name}-{resolution[0]}')
+
+            return None if dependencies is None else (resolution[0], dependencies)
+
+    def add(self, package_name: str, index_version: str, version: str, dependencies: dict[str, str]) -> None:
+        """Records what a version specifier resolves to, and the dependencies of that version.
+
+        Args:
+        package_name (str): The name of the package.
+        index_version (str): The package index version specifier it was resolved from.
+        version (str): The resolved version.
+        dependencies (dict[str, str]): The version specifier of each dependency of the version.
+        """
+
+        with self._lock:
+            self.nodes[f'{package_name}-{version}'] = dependencies
+            self.resolutions[f'{package_name} {index_version}'] = (version, time.time())
+            self.resolutions[f'{package_name} {version}'] = (version, time.time())
+            self.changed = True
+
+    def save(self) -> None:
+        """Writes the graph atomically, if it changed."""
+
+        if not self.changed:
+            return
+
+        tmp_path: Path = self.path.with_name(f'.{self.path.name}.{uuid.uuid4().hex}.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'nodes': self.nodes, 'resolutions': self.resolutions}, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+        self.changed = False
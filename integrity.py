@@ -0,0 +1,110 @@
+from pathlib import Path
+import hashlib
+import zipfile
+import mmap
+import zlib
+import os
+
+from errors import *
+from archives import *
+
+# ################################## Variables ###################################
+
+# The algorithms of the recorded file hashes: the SHA-256 published in the metadata
+# of the package (`[files]`), or the CRC-32 of its archive when it was published
+# without them
+hash_algorithms: tuple[str, ...] = ('sha256', 'crc32')
+
+# ################################# File hashes ##################################
+
+def digest(data: bytes | mmap.mmap, algorithm: str) -> str:
+    """Hashes data (hashlib and zlib release the GIL, files are hashed in parallel).
+
+    Args:
+    data (bytes | mmap.mmap): The data.
+    algorithm (str): `sha256` or `crc32`.
+
+    Returns:
+    str: The hash, as `<algorithm>:<hexdigest>`
+    """
+
+    if algorithm == 'crc32':
+        return f'crc32:{zlib.crc32(data):08x}'
+
+    return f'{algorithm}:{hashlib.new(algorithm, data).hexdigest()}'
+
+def archive_hashes(zip_ref: zipfile.ZipFile, published: dict[str, str]) -> dict[str, str]:
+    """Gets the hashes to record for the files of a package archive, without reading them.
+
+    Args:
+    zip_ref (zipfile.ZipFile): The archive.
+    published (dict[str, str]): The `[files]` table of the metadata of the package, empty if it hasn't one.
+
+    Returns:
+    dict[str, str]: The hash of each file
+    """
+
+    hashes: dict[str, str] = {}
+
+    for info in zip_ref.infolist():
+        if info.is_dir():
+            continue
+
+        expected: str | None = published.get(info.filename)
+        hashes[info.filename] = expected if expected is not None and expected.split(':', 1)[0] in hash_algorithms else f'crc32:{info.CRC:08x}'
+
+    return hashes
+
+def check_file(path: Path, expected: str | None) -> str | None:
+    """Hashes a file through a memory mapping and compares it to its recorded hash.
+
+    Args:
+    path (Path): The path of the file.
+    expected (str | None): The recorded hash (`<algorithm>:<hexdigest>`), None to only check that the file exists.
+
+    Returns:
+    str | None: What is wrong with the file (`missing`, `modified` or `unreadable`), None if it's intact
+    """
+
+    if expected is None:
+        return None if path.is_file() else 'missing'
+
+    algorithm: str = expected.split(':', 1)[0]
+
+    try:
+        with open(path, 'rb') as f:
+            # Empty files can't be mapped
+            if os.fstat(f.fileno()).st_size == 0:
+                actual: str = digest(b'', algorithm)
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+                    actual = digest(mapping, algorithm)
+    except FileNotFoundError:
+        return 'missing'
+    except (OSError, ValueError):
+        return 'unreadable'
+
+    return None if actual == expected else 'modified'
+
+def check_archived_file(archive: PackageArchive, name: str, expected: str | None) -> str | None:
+    """Reads a file of a package installed without extraction and compares it to its recorded hash.
+
+    Args:
+    archive (PackageArchive): The archive of the package.
+    name (str): The path of the file in the package.
+    expected (str | None): The recorded hash (`<algorithm>:<hexdigest>`), None to only check that the file can be read.
+
+    Returns:
+    str | None: What is wrong with the file (`missing`, `modified` or `unreadable`), None if it's intact
+    """
+
+    data: bytes | Error = archive.read(name)
+    if isinstance(data, FileOrDirectoryNotFoundError):
+        return 'missing'
+    if isinstance(data, Error):
+        return 'unreadable'
+
+    if expected is None:
+        return None
+
+    return None if digest(data, expected.split(':', 1)[0]) == expected else 'modified'
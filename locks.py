@@ -0,0 +1,121 @@
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Iterator
+import threading
+import os
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+# ################################## File locks ##################################
+
+def _lock_fd(fd: int, shared: bool, blocking: bool) -> None:
+    if os.name == 'nt':
+        msvcrt.locking(fd, msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1) # type: ignore
+    else:
+        fcntl.flock(fd, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB)) # type: ignore
+
+def _unlock_fd(fd: int) -> None:
+    if os.name == 'nt':
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1) # type: ignore
+    else:
+        fcntl.flock(fd, fcntl.LOCK_UN) # type: ignore
+
+class FileLock:
+    """An advisory lock on a file, shared between processes (and threads).
+
+    Locks can be shared (readers) or exclusive (writers). They use `flock` on Unix
+    and `msvcrt.locking` on Windows, where every lock is exclusive. The lock file is
+    created if needed and never removed, removing it would race with other lockers.
+    """
+
+    def __init__(self, path: Path) -> None:
+        """Initialize a file lock, not acquired yet.
+
+        Args:
+        path (Path): The path of the lock file.
+        """
+
+        self.path: Path = path
+        self.shared: bool = False
+        self._fd: int | None = None
+        self._lock: threading.Lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({str(self.path)!r}, locked={self.locked})'
+
+    @property
+    def locked(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self, shared: bool = False, blocking: bool = True) -> bool:
+        """Acquires the lock.
+
+        Args:
+        shared (bool, optional): Whether to acquire a shared (reader) lock rather than an exclusive one. Defaults to False
+        blocking (bool, optional): Whether to wait for the lock, rather than giving up if it's held. Defaults to True
+
+        Returns:
+        bool: True if the lock was acquired
+        """
+
+        with self._lock:
+            if self._fd is not None:
+                raise RuntimeError(f'{self!r} is already acquired.')
+
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd: int = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+
+            while True:
+                try:
+                    _lock_fd(fd, shared, blocking)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after 10 seconds, keep waiting like flock does
+                    if blocking and os.name == 'nt':
+                        continue
+                    os.close(fd)
+                    return False
+
+            self._fd = fd
+            self.shared = shared
+
+            return True
+
+    def release(self) -> None:
+        """Releases the lock."""
+
+        with self._lock:
+            if self._fd is None:
+                return
+
+            try:
+                _unlock_fd(self._fd)
+            finally:
+                os.close(self._fd)
+                self._fd = None
+
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.release()
+
+@contextmanager
+def shared_lock(path: Path) -> Iterator[FileLock]:
+    """Holds a shared (reader) lock on a file.
+
+    Args:
+    path (Path): The path of the lock file.
+    """
+
+    lock: FileLock = FileLock(path)
+    lock.acquire(shared=True)
+    try:
+        yield lock
+    finally:
+        lock.release()
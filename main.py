@@ -1,30 +1,61 @@
 import sys
 import argparse
+from pathlib import Path
 import core
 
 arg_parser = argparse.ArgumentParser(description='MathGet, the package manager to update and manage MathScript packages')
+arg_parser.add_argument('--index-url', metavar='url', action='append', dest='index_urls', help='A package index URL or local index directory to use before the configured ones (can be repeated)')
+arg_parser.add_argument('--profile', action='store_true', help='Print where the time went (network, parsing, extraction...) after the command')
+arg_parser.add_argument('--profile-output', metavar='trace_file', help='Also write the profile as a Chrome trace (JSON) file, implies --profile')
+arg_parser.add_argument('--json', dest='json_events', action='store_true', help='Print the progress and results as JSON lines (events) instead of text')
 command_parser = arg_parser.add_subparsers(dest='command', required=True)
 
 # install
 parser_install = command_parser.add_parser('install', help='Install a package')
-parser_install.add_argument('package', help='The package to install')
+parser_install.add_argument('package', nargs='?', help='The package to install')
 parser_install.add_argument('-f', '--force', action='store_true', help='Force the installation even if the package is already installed')
 parser_install.add_argument('-r', '--requirements', metavar='req_file', help='The mathsget.req file from where find the list of packages to install')
+parser_install.add_argument('--require-hashes', action='store_true', help='Require every package archive to match a --hash given in the requirements')
+parser_install.add_argument('--precompile', action='store_true', help='Precompile the installed packages with the MathScript toolchain to speed up their first import')
+parser_install.add_argument('-n', '--dry-run', action='store_true', help='Only show what would be installed, with the download size and an estimated time')
+parser_install.add_argument('--save-plan', metavar='plan_file', help='Save the plan of the dry run to apply it later with `mathget apply` (implies --dry-run)')
+parser_install.add_argument('--no-extract', dest='extract', action='store_false', default=None, help='Keep the installed packages as archives, read in place (faster to install and uninstall)')
+parser_install.add_argument('--extract', dest='extract', action='store_true', default=None, help='Extract the installed packages (the default for new packages)')
 
 # list
 parser_list = command_parser.add_parser('list', help='List all installed packages')
+parser_list.add_argument('--format', choices=('table', 'freeze', 'json'), help='The output format')
+parser_list.add_argument('--filter', metavar='pattern', help='Only list the packages matching a glob pattern')
+parser_list.add_argument('--requested', action='store_true', help='Only list the explicitly installed packages, not their dependencies')
+parser_list.add_argument('--sort', choices=('name', 'version', 'size'), default='name', help='The sort order')
 
 # uninstall
 parser_uninstall = command_parser.add_parser('uninstall', help='Uninstall a package')
-parser_uninstall.add_argument('package', help='The package to uninstall')
+parser_uninstall.add_argument('package', nargs='?', help='The package to uninstall')
 parser_uninstall.add_argument('-f', '--force', action='store_true', help='Don\'t ask for confirmation of uninstall deletions.')
 parser_uninstall.add_argument('-r', '--requirements', metavar='req_file', help='The mathsget.req file from where find the list of packages to uninstall')
+parser_uninstall.add_argument('--keep-orphans', action='store_true', help='Keep the dependencies that no other installed package needs')
 
 # update
 parser_update = command_parser.add_parser('update', help='Update package to the latest version')
-parser_update.add_argument('package', help='The package to update')
+parser_update.add_argument('package', nargs='?', help='The package to update')
 parser_update.add_argument('-f', '--force', action='store_true', help='Force the update even if the package is already updated')
 parser_update.add_argument('-r', '--requirements', metavar='req_file', help='The mathsget.req file from where find the list of packages to update')
+parser_update.add_argument('--require-hashes', action='store_true', help='Require every package archive to match a --hash given in the requirements')
+parser_update.add_argument('--precompile', action='store_true', help='Precompile the updated packages with the MathScript toolchain to speed up their first import')
+parser_update.add_argument('-n', '--dry-run', action='store_true', help='Only show what would be updated, with the download size and an estimated time')
+parser_update.add_argument('--save-plan', metavar='plan_file', help='Save the plan of the dry run to apply it later with `mathget apply` (implies --dry-run)')
+parser_update.add_argument('--no-extract', dest='extract', action='store_false', default=None, help='Keep the updated packages as archives, read in place (faster to install and uninstall)')
+parser_update.add_argument('--extract', dest='extract', action='store_true', default=None, help='Extract the updated packages (the default for new packages)')
+
+# apply
+parser_apply = command_parser.add_parser('apply', help='Apply a plan saved by install/update --save-plan, without resolving again')
+parser_apply.add_argument('plan', help='The plan file to apply')
+
+# switch
+parser_switch = command_parser.add_parser('switch', help='Switch a package to another of its installed versions, without downloading it')
+parser_switch.add_argument('package', help='The package to switch')
+parser_switch.add_argument('version', nargs='?', help='The version to switch to (lists the installed versions if omitted)')
 
 # search
 parser_search = command_parser.add_parser('search', help='Search for packages matching the given keyword.')
@@ -33,23 +64,40 @@ parser_search.add_argument('-i', '--index', metavar='url', help='The URL of the
 
 # info
 parser_info = command_parser.add_parser('info', help='Show detailed information about a package.')
-parser_info.add_argument('package', help='The package to get information about')
+parser_info.add_argument('package', nargs='*', help='The packages to get information about')
+parser_info.add_argument('--installed', action='store_true', help='Query all the installed packages, at their installed version')
+parser_info.add_argument('--json', action='store_true', help='Print the results as JSON lines, as they arrive')
 
 # dependencies
 parser_dependencies = command_parser.add_parser('dependencies', help='Shows dependencies for a package.')
-parser_dependencies.add_argument('package', help='The package to get dependencies for')
+parser_dependencies.add_argument('package', nargs='*', help='The packages to get dependencies for')
+parser_dependencies.add_argument('--installed', action='store_true', help='Query all the installed packages, at their installed version')
+parser_dependencies.add_argument('--json', action='store_true', help='Print the results as JSON lines, as they arrive')
+parser_dependencies.add_argument('-t', '--tree', action='store_true', help='Show the whole dependency tree, with the version each dependency resolves to')
+parser_dependencies.add_argument('--refresh', action='store_true', help='Look up every version again rather than using the cached dependency graph')
+
+# dependents
+parser_dependents = command_parser.add_parser('dependents', help='Shows the installed packages depending on a package.')
+parser_dependents.add_argument('package', help='The package to get dependents for')
+parser_dependents.add_argument('-t', '--tree', action='store_true', help='Also show the packages depending on it through other packages, as a tree')
 
 # versions
 parser_versions = command_parser.add_parser('versions', help='Lists available versions for a package.')
-parser_versions.add_argument('package', help='The package to get versions for')
+parser_versions.add_argument('package', nargs='*', help='The packages to get versions for')
+parser_versions.add_argument('--installed', action='store_true', help='Query all the installed packages, at their installed version')
+parser_versions.add_argument('--json', action='store_true', help='Print the results as JSON lines, as they arrive')
 
 # changelog
 parser_changelog = command_parser.add_parser('changelog', help='Shows the changelog for a package.')
-parser_changelog.add_argument('package', help='The package to get the changelog for')
+parser_changelog.add_argument('package', nargs='*', help='The packages to get the changelog for')
+parser_changelog.add_argument('--installed', action='store_true', help='Query all the installed packages, at their installed version')
+parser_changelog.add_argument('--json', action='store_true', help='Print the results as JSON lines, as they arrive')
 
 # license
 parser_license = command_parser.add_parser('license', help='Shows the license information for a package.')
-parser_license.add_argument('package', help='The package to get the license information for')
+parser_license.add_argument('package', nargs='*', help='The packages to get the license information for')
+parser_license.add_argument('--installed', action='store_true', help='Query all the installed packages, at their installed version')
+parser_license.add_argument('--json', action='store_true', help='Print the results as JSON lines, as they arrive')
 
 # doc
 parser_doc = command_parser.add_parser('doc', help='Opens the documentation for a package (if available).')
@@ -63,39 +111,118 @@ parser_source.add_argument('package', help='The package to show the source code
 parser_issues = command_parser.add_parser('issues', help='Shows open issues for a package (if available).')
 parser_issues.add_argument('package', help='The package to show open issues for')
 
+# gc
+parser_gc = command_parser.add_parser('gc', help='Show disk usage and remove orphaned dependencies and stale cache entries')
+parser_gc.add_argument('-n', '--dry-run', action='store_true', help='Only show what would be removed')
+parser_gc.add_argument('--max-age', type=float, default=30, metavar='days', help='The age after which unused cache entries are removed (default: 30 days)')
+parser_gc.add_argument('-f', '--force', action='store_true', help='Don\'t ask for confirmation')
+parser_gc.add_argument('--keep-versions', action='store_true', help='Keep the installed versions that aren\'t active')
+
+# verify
+parser_verify = command_parser.add_parser('verify', help='Check the installed files against the hashes recorded when they were installed')
+parser_verify.add_argument('package', nargs='*', help='The packages to verify (default: every installed package)')
+parser_verify.add_argument('--repair', action='store_true', help='Rewrite the damaged files from the download cache or the package index')
+
+# bundle
+parser_bundle = command_parser.add_parser('bundle', help='Pack the installed packages into a single archive')
+parser_bundle.add_argument('output', help='The bundle file to write')
+parser_bundle.add_argument('-c', '--compression', choices=('none', 'gzip', 'zstd'), default='gzip', help='The compression of the bundle (zstd needs the zstandard module)')
+parser_bundle.add_argument('-l', '--level', type=int, help='The compression level')
+
+# restore
+parser_restore = command_parser.add_parser('restore', help='Install the packages of a bundle, without network access')
+parser_restore.add_argument('bundle', help='The bundle file to restore')
+parser_restore.add_argument('-f', '--force', action='store_true', help='Don\'t ask for confirmation')
+
+# publish
+parser_publish = command_parser.add_parser('publish', aliases=['pack'], help='Build the archive and metadata files of a package source into a package index directory')
+parser_publish.add_argument('package_dir', help='The directory of the package source (with an init.mscr and a package.metadata file)')
+parser_publish.add_argument('-o', '--index-dir', default='.', metavar='dir', help='The package index directory to write to (default: the current directory)')
+parser_publish.add_argument('-l', '--level', type=int, default=core.default_compression_level, help=f'The deflate level, from 0 to 9 (default: {core.default_compression_level})')
+parser_publish.add_argument('-f', '--force', action='store_true', help='Replace the version if it\'s already published')
+
+# metrics
+parser_metrics = command_parser.add_parser('metrics', help='Show the metrics recorded by the previous commands (transfers, cache hit rates, index latencies)')
+parser_metrics.add_argument('--format', choices=('text', 'prometheus', 'json'), default='text', help='The output format')
+parser_metrics.add_argument('-o', '--output', metavar='file', help='Write the metrics to a file (atomically, e.g. for the Prometheus textfile collector)')
+parser_metrics.add_argument('--reset', action='store_true', help='Reset the metrics once shown')
+
 if __name__ == '__main__':
     args = arg_parser.parse_args()
+
+    if args.index_urls:
+        core.set_index_sources(args.index_urls)
+
+    if args.profile or args.profile_output:
+        core.tracer.enable()
+
+    # `--json` of the query commands prints their results the same way
+    json_events = args.json_events or getattr(args, 'json', False)
+
+    if json_events:
+        core.set_output('json')
     
     match args.command:
         case 'install':
-            result = core.install(args.package, args.requirements, args.force)
+            result = core.install(args.package, args.requirements, args.force, args.require_hashes, args.precompile, args.dry_run, args.save_plan, args.extract)
         case 'list':
-            result = core.list_packages()
+            result = core.list_packages(args.format, args.filter, args.requested, args.sort)
         case 'uninstall':
-            result = core.uninstall(args.package, args.requirements, args.force)
+            result = core.uninstall(args.package, args.requirements, args.force, args.keep_orphans)
         case 'update':
-            result = core.update(args.package, args.requirements, args.force)
+            result = core.update(args.package, args.requirements, args.force, args.require_hashes, args.precompile, args.dry_run, args.save_plan, args.extract)
+        case 'apply':
+            result = core.apply_plan(args.plan)
+        case 'switch':
+            result = core.switch(args.package, args.version)
         case 'search':
             result = core.search(args.keyword, args.index)
         case 'info':
-            result = core.get_info(args.package)
+            result = core.get_info(args.package, args.installed, json_events)
         case 'dependencies':
-            result = core.get_dependencies(args.package)
+            result = core.get_dependencies(args.package, args.tree, args.refresh, args.installed, json_events)
+        case 'dependents':
+            result = core.get_dependents(args.package, args.tree)
         case 'versions':
-            result = core.get_versions(args.package)
+            result = core.get_versions(args.package, args.installed, json_events)
         case 'changelog':
-            result = core.get_changelog(args.package)
+            result = core.get_changelog(args.package, args.installed, json_events)
         case 'license':
-            result = core.get_license(args.package)
+            result = core.get_license(args.package, args.installed, json_events)
         case 'doc':
             result = core.open_doc(args.package)
         case 'source':
             result = core.show_source(args.package)
         case 'issues':
             result = core.open_issues(args.package)
+        case 'gc':
+            result = core.collect_garbage(args.dry_run, args.max_age, args.force, args.keep_versions)
+        case 'verify':
+            result = core.verify(args.package, args.repair)
+        case 'bundle':
+            result = core.bundle(args.output, args.compression, args.level)
+        case 'restore':
+            result = core.restore(args.bundle, args.force)
+        case 'publish' | 'pack':
+            result = core.publish(args.package_dir, args.index_dir, args.level, args.force)
+        case 'metrics':
+            result = core.show_metrics(args.format, args.output, args.reset)
         case _:
             result = core.InvalidCommandError(args.command)
 
+    core.metrics.save(core.metrics_file)
+
+    if core.tracer.enabled:
+        core.tracer.report(Path(args.profile_output) if args.profile_output else None)
+
+    if isinstance(result, core.Error):
+        if json_events:
+            core.emit('error', type=result.type, code=result.code, message=result.message)
+        else:
+            print(result)
+
+    # Tells the consumers of the events that the command is done, and how
+    core.emit('command.end', command=args.command, code=result.code if isinstance(result, core.Error) else 0)
+
     if isinstance(result, core.Error):
-        print(result)
         sys.exit(result.code)
\ No newline at end of file
@@ -0,0 +1,307 @@
+from pathlib import Path
+import json
+import uuid
+import os
+
+from locks import *
+
+# ################################ Install manifest ##############################
+
+class Manifest:
+    """The record of the installed packages (`user_packages/manifest.json`).
+
+    Each package entry holds its version, whether it was explicitly requested or
+    only installed as a dependency, its dependencies, the files it installed with
+    their hashes (see `integrity`) and the files precompiled from them, if any. A
+    package installed without extraction also holds the index of its archive (see
+    `archives.index_archive`). The other versions kept installed (see `versions`)
+    are under `stored`, by version, with their dependencies, files and size.
+
+    Several processes can share it: it's read under a shared lock, and saving takes
+    an exclusive lock, reloads the file and applies the changes made since loading
+    it, so concurrent commands don't drop each other's packages.
+
+    The packages depending on each package are indexed on the first query, and the
+    index is then kept up to date as packages are added or removed.
+    """
+
+    def __init__(self, path: Path) -> None:
+        """Initialize a manifest, loading it if it exists.
+
+        Args:
+        path (Path): The path of the manifest file.
+        """
+
+        self.path: Path = path
+        self.lock_path: Path = path.parent / '.locks' / f'{path.name}.lock'
+        self.packages: dict[str, dict] = {}
+        self.exists: bool = path.exists()
+        self._changes: dict[str, dict | None] = {}
+        self._dependents: dict[str, set[str]] | None = None
+
+        if self.exists:
+            with shared_lock(self.lock_path):
+                self.packages = self._read()
+
+    def _read(self) -> dict[str, dict]:
+        try:
+            with open(self.path) as f:
+                return json.load(f).get('packages', {})
+        except FileNotFoundError:
+            return {}
+
+    def __contains__(self, package_name: str) -> bool:
+        return package_name in self.packages
+
+    def _set(self, package_name: str, entry: dict | None) -> None:
+        previous: dict | None = self.packages.get(package_name)
+
+        if entry is None:
+            self.packages.pop(package_name, None)
+        else:
+            self.packages[package_name] = entry
+        self._changes[package_name] = entry
+
+        if self._dependents is not None:
+            for dependency in (previous or {}).get('dependencies', []):
+                self._dependents.get(dependency, set()).discard(package_name)
+            for dependency in (entry or {}).get('dependencies', []):
+                self._dependents.setdefault(dependency, set()).add(package_name)
+
+    def _store_active(self, package_name: str, version: str) -> dict:
+        # The entry without the active version, which is kept under `stored` unless it's the one replaced
+        entry: dict = dict(self.packages.get(package_name, {}))
+        stored: dict[str, dict] = dict(entry.pop('stored', {}))
+        active: dict = {k: entry.pop(k) for k in ('version', 'dependencies', 'files', 'hashes', 'size', 'compiled', 'archive') if k in entry}
+
+        if active.get('version', version) != version:
+            stored[active.pop('version')] = active
+        stored.pop(version, None)
+
+        return {**entry, 'stored': stored} if stored else entry
+
+    def add(self, package_name: str, version: str, requested: bool, dependencies: list[str], files: list[str], size: int = 0, hashes: dict[str, str] | None = None) -> None:
+        """Records an installed package, it stays requested if it already was. The version it replaces is kept as stored.
+
+        Args:
+        package_name (str): The name of the package.
+        version (str): The installed version.
+        requested (bool): Whether the package was explicitly requested (not only pulled as a dependency).
+        dependencies (list[str]): The names of the dependencies of the package.
+        files (list[str]): The files installed, relative to the package directory.
+        size (int, optional): The size of the installed files, in bytes. Defaults to 0
+        hashes (dict[str, str] | None, optional): The hash of each installed file (`<algorithm>:<hexdigest>`). Defaults to None
+        """
+
+        previous: dict = self._store_active(package_name, version)
+
+        self._set(package_name, {
+            **previous,
+            'version': version,
+            'requested': requested or previous.get('requested', False),
+            'dependencies': sorted(set(dependencies)),
+            'files': files,
+            **({'hashes': hashes} if hashes is not None else {}),
+            'size': size,
+        })
+
+    def set_compiled(self, package_name: str, files: list[str]) -> None:
+        """Records the files precompiled for an installed package.
+
+        Args:
+        package_name (str): The name of the package.
+        files (list[str]): The precompiled files, relative to the package directory.
+        """
+
+        if package_name in self.packages:
+            self.packages[package_name]['compiled'] = files
+            self._changes[package_name] = self.packages[package_name]
+
+    def set_requested(self, package_name: str) -> None:
+        """Records that an installed package was explicitly requested, e.g. after being installed as a dependency.
+
+        Args:
+        package_name (str): The name of the package.
+        """
+
+        if package_name in self.packages and not self.packages[package_name].get('requested', False):
+            self.packages[package_name] = {**self.packages[package_name], 'requested': True}
+            self._changes[package_name] = self.packages[package_name]
+
+    def set_archive(self, package_name: str, entries: dict[str, list[int]]) -> None:
+        """Records that an installed package is read from its archive, and where its files are in it.
+
+        Args:
+        package_name (str): The name of the package.
+        entries (dict[str, list[int]]): The `[offset, compressed size, size, method]` of each file of the archive.
+        """
+
+        if package_name in self.packages:
+            self.packages[package_name]['archive'] = entries
+            self._changes[package_name] = self.packages[package_name]
+
+    def activate(self, package_name: str, version: str, requested: bool = False) -> bool:
+        """Records that a stored version of a package is the active one, the previous one being stored.
+
+        Args:
+        package_name (str): The name of the package.
+        version (str): The stored version.
+        requested (bool, optional): Whether the package was explicitly requested. Defaults to False
+
+        Returns:
+        bool: False if the version isn't stored
+        """
+
+        active: dict | None = self.stored(package_name).get(version)
+        if active is None:
+            return False
+
+        previous: dict = self._store_active(package_name, version)
+
+        self._set(package_name, {
+            **previous,
+            **active,
+            'version': version,
+            'requested': requested or previous.get('requested', False),
+        })
+
+        return True
+
+    def stored(self, package_name: str) -> dict[str, dict]:
+        """Gets the stored (inactive) versions of a package.
+
+        Args:
+        package_name (str): The name of the package.
+
+        Returns:
+        dict[str, dict]: The entry of each version (dependencies, files, hashes, size)
+        """
+
+        return self.packages.get(package_name, {}).get('stored', {})
+
+    def remove_stored(self, package_name: str, version: str) -> None:
+        """Forgets a stored version of a package, once deleted.
+
+        Args:
+        package_name (str): The name of the package.
+        version (str): The stored version.
+        """
+
+        entry: dict | None = self.packages.get(package_name)
+        if entry is None or version not in entry.get('stored', {}):
+            return
+
+        stored: dict[str, dict] = {v: e for v, e in entry['stored'].items() if v != version}
+        self._set(package_name, {**{k: v for k, v in entry.items() if k != 'stored'}, **({'stored': stored} if stored else {})})
+
+    def restore(self, package_name: str, entry: dict) -> None:
+        """Records a package entry as is, e.g. from a bundle.
+
+        Args:
+        package_name (str): The name of the package.
+        entry (dict): The entry of the package.
+        """
+
+        self._set(package_name, entry)
+
+    def remove(self, package_name: str) -> None:
+        self._set(package_name, None)
+
+    def dependents(self, package_name: str, recursive: bool = False) -> set[str]:
+        """Gets the installed packages depending on a package.
+
+        Args:
+        package_name (str): The name of the package.
+        recursive (bool, optional): Whether to include the packages depending on it through other packages. Defaults to False
+
+        Returns:
+        set[str]: The names of the dependents
+        """
+
+        if self._dependents is None:
+            self._dependents = {}
+            for name, entry in self.packages.items():
+                for dependency in entry.get('dependencies', []):
+                    self._dependents.setdefault(dependency, set()).add(name)
+
+        if not recursive:
+            return set(self._dependents.get(package_name, set()))
+
+        reached: set[str] = set()
+        stack: list[str] = [package_name]
+
+        while stack:
+            for dependent in self._dependents.get(stack.pop(), set()):
+                if dependent not in reached:
+                    reached.add(dependent)
+                    stack.append(dependent)
+
+        reached.discard(package_name)
+
+        return reached
+
+    def reachable(self, roots: set[str] | None = None) -> set[str]:
+        """Gets the packages reachable from roots through dependencies.
+
+        Args:
+        roots (set[str] | None, optional): The packages to start from. Defaults to the requested packages
+
+        Returns:
+        set[str]: The names of the reachable packages, roots included
+        """
+
+        if roots is None:
+            roots = {name for name, entry in self.packages.items() if entry.get('requested', False)}
+
+        reached: set[str] = set()
+        stack: list[str] = [name for name in roots if name in self.packages]
+
+        while stack:
+            name: str = stack.pop()
+            if name in reached:
+                continue
+            reached.add(name)
+            stack.extend(d for d in self.packages[name].get('dependencies', []) if d in self.packages and d not in reached)
+
+        return reached
+
+    def orphans(self, removed: set[str] = set()) -> set[str]:
+        """Gets the dependencies that nothing requested needs anymore once packages are removed.
+
+        When packages are removed, only their own dependencies are considered: the
+        packages orphaned before (e.g. by `uninstall --keep-orphans`) are left to `gc`,
+        and so are the dependencies they still use.
+
+        Args:
+        removed (set[str], optional): The packages about to be removed, none for every orphan of the installation. Defaults to set()
+
+        Returns:
+        set[str]: The names of the orphaned packages (the removed ones excluded)
+        """
+
+        candidates: set[str] = self.reachable(removed) if removed else set(self.packages)
+        roots: set[str] = {name for name, entry in self.packages.items() if entry.get('requested', False) and name not in removed} | (set(self.packages) - candidates)
+
+        return candidates - self.reachable(roots) - removed
+
+    def save(self) -> None:
+        """Writes the changes made to the manifest atomically, over what other processes saved meanwhile."""
+
+        with FileLock(self.lock_path):
+            packages: dict[str, dict] = self._read()
+
+            for package_name, entry in self._changes.items():
+                if entry is None:
+                    packages.pop(package_name, None)
+                else:
+                    packages[package_name] = entry
+
+            tmp_path: Path = self.path.with_name(f'.{self.path.name}.{uuid.uuid4().hex}.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump({'packages': packages}, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+        self.packages = packages
+        self._changes.clear()
+        self._dependents = None
+        self.exists = True
@@ -0,0 +1,43 @@
+"""Converts the TOML metadata files of the index to the JSON documents served to
+clients that ask for `application/json`.
+
+Usage: python build_metadata_json.py [index_dir]
+"""
+
+from pathlib import Path
+import json
+import sys
+import toml # type: ignore
+
+def build_metadata_json(index_dir: Path) -> int:
+    """Writes `metadata_json/<name>-<version>.json` for every outdated metadata file.
+
+    Args:
+    index_dir (Path): The directory of the index (containing `metadata_files/`).
+
+    Returns:
+    int: The number of converted files
+    """
+
+    (index_dir / 'metadata_json').mkdir(exist_ok=True)
+    converted: int = 0
+
+    for metadata_path in sorted((index_dir / 'metadata_files').glob('*.metadata')):
+        json_path: Path = index_dir / 'metadata_json' / (metadata_path.name.removesuffix('.metadata') + '.json')
+
+        if json_path.exists() and json_path.stat().st_mtime_ns >= metadata_path.stat().st_mtime_ns:
+            continue
+
+        with open(metadata_path) as f:
+            metadata: dict = toml.load(f)
+
+        with open(json_path, 'w') as f:
+            json.dump(metadata, f, separators=(',', ':'), default=str)
+
+        converted += 1
+
+    return converted
+
+if __name__ == '__main__':
+    index_dir: Path = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).parent
+    print(f'Converted {build_metadata_json(index_dir)} metadata files.')
@@ -0,0 +1,66 @@
+<?php
+// Content encoding negotiation for the text documents of the index (metadata,
+// version lists). Archives are already compressed and are sent as they are.
+
+$min_compress_size = 256; // bytes, smaller documents don't shrink enough to be worth it
+
+function accepted_encodings() {
+    $accepted = [];
+
+    if (!isset($_SERVER['HTTP_ACCEPT_ENCODING'])) {
+        return $accepted;
+    }
+
+    foreach (explode(',', $_SERVER['HTTP_ACCEPT_ENCODING']) as $part) {
+        $params = explode(';', trim($part));
+        $quality = 1.0;
+
+        foreach (array_slice($params, 1) as $param) {
+            $param = trim($param);
+            if (strpos($param, 'q=') === 0) {
+                $quality = (float) substr($param, 2);
+            }
+        }
+
+        if ($quality > 0) {
+            $accepted[] = strtolower(trim($params[0]));
+        }
+    }
+
+    return $accepted;
+}
+
+function send_document($body, $content_type) {
+    global $min_compress_size;
+
+    $accepted = accepted_encodings();
+    $encoding = null;
+
+    if (strlen($body) >= $min_compress_size) {
+        // Best ratio first, each one only if the PHP extension is available
+        if (in_array('zstd', $accepted) && function_exists('zstd_compress')) {
+            $encoding = 'zstd';
+            $body = zstd_compress($body);
+        } elseif (in_array('br', $accepted) && function_exists('brotli_compress')) {
+            $encoding = 'br';
+            $body = brotli_compress($body);
+        } elseif ((in_array('gzip', $accepted) || in_array('*', $accepted)) && function_exists('gzencode')) {
+            $encoding = 'gzip';
+            $body = gzencode($body, 6);
+        }
+    }
+
+    // The body is encoded here, a server-side output compression would encode it twice
+    ini_set('zlib.output_compression', 'Off');
+
+    header('Vary: Accept, Accept-Encoding');
+    header('Content-type: ' . $content_type);
+    if ($encoding !== null) {
+        header('Content-Encoding: ' . $encoding);
+    }
+    header('Content-Length: ' . strlen($body));
+
+    echo $body;
+}
+
+?>
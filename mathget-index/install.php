@@ -49,13 +49,14 @@ try {
         }
         $version = max($temp_array);
     } else {
-        $version = add_trailing_zeros($version);
         if (strpos($version, '^') === 0) {
-            $version = substr($version, 1);
+            $version = add_trailing_zeros(substr($version, 1));
             $version = max([$version, max($found_versions)]);
         } elseif (strpos($version, '_') === 0) {
-            $version = substr($version, 1);
+            $version = add_trailing_zeros(substr($version, 1));
             $version = max([$version, min($found_versions)]);
+        } else {
+            $version = add_trailing_zeros($version);
         }
     }
 } catch (\Throwable $th) {
@@ -72,13 +73,24 @@ if (in_array($version, $found_versions)) {
 
 $filename = $package_name . '-' . $version . '.zip';
 
-if (file_exists('./install_files/' . $filename)) {
-    echo file_get_contents('./install_files/' . $filename);
+$path = './install_files/' . $filename;
+
+if (file_exists($path)) {
+    // Send the archive straight from the file: buffering it (file_get_contents or
+    // an output buffer) would need as much PHP memory as the package is large.
+    // Zips are already compressed, so no content encoding either.
+    ini_set('zlib.output_compression', 'Off');
+    header('Content-type: application/zip');
+    header('Content-Length: ' . filesize($path));
+
+    while (ob_get_level() > 0) {
+        ob_end_clean();
+    }
+
+    readfile($path);
 } else {
     http_response_code(404);
     exit;
 }
 
-header('Content-type: text/plain');
-
 ?>
\ No newline at end of file
@@ -1,4 +1,6 @@
 <?php
+require_once __DIR__ . '/encoding.php';
+
 $package_name = $_SERVER['PATH_INFO'];
 $package_name = str_replace('/','', $package_name);
 
@@ -49,13 +51,14 @@ try {
         }
         $version = max($temp_array);
     } else {
-        $version = add_trailing_zeros($version);
         if (strpos($version, '^') === 0) {
-            $version = substr($version, 1);
+            $version = add_trailing_zeros(substr($version, 1));
             $version = max([$version, max($found_versions)]);
         } elseif (strpos($version, '_') === 0) {
-            $version = substr($version, 1);
+            $version = add_trailing_zeros(substr($version, 1));
             $version = max([$version, min($found_versions)]);
+        } else {
+            $version = add_trailing_zeros($version);
         }
     }
 } catch (\Throwable $th) {
@@ -71,14 +74,27 @@ if (in_array($version, $found_versions)) {
 }
 
 $filename = $package_name . '-' . $version . '.metadata';
+$json_filename = $package_name . '-' . $version . '.json';
+
+// Clients asking for JSON get the pre-converted document from metadata_json/
+// (see build_metadata_json.py), TOML stays the authoring format.
+$wants_json = isset($_SERVER['HTTP_ACCEPT']) && strpos($_SERVER['HTTP_ACCEPT'], 'application/json') !== false;
+
+$json_path = './metadata_json/' . $json_filename;
+$metadata_path = './metadata_files/' . $filename;
 
-if (file_exists('./metadata_files/' . $filename)) {
-    echo file_get_contents('./metadata_files/' . $filename);
+// A JSON document older than its TOML is stale (the TOML was edited without running
+// build_metadata_json.py again), the TOML is served instead
+$json_is_fresh = file_exists($json_path) && (!file_exists($metadata_path) || filemtime($json_path) >= filemtime($metadata_path));
+
+// Metadata documents are small, they're read whole to be compressed
+if ($wants_json && $json_is_fresh) {
+    send_document(file_get_contents($json_path), 'application/json');
+} elseif (file_exists($metadata_path)) {
+    send_document(file_get_contents($metadata_path), 'text/plain; charset=utf-8');
 } else {
     http_response_code(404);
     exit;
 }
 
-header('Content-type: text/plain');
-
 ?>
\ No newline at end of file
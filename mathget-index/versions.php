@@ -1,4 +1,6 @@
 <?php
+require_once __DIR__ . '/encoding.php';
+
 $package_name = $_SERVER['PATH_INFO'];
 $package_name = str_replace('/','', $package_name);
 
@@ -36,15 +38,22 @@ function make_array() {
     return $output;
 }
 
+$wants_json = isset($_SERVER['HTTP_ACCEPT']) && strpos($_SERVER['HTTP_ACCEPT'], 'application/json') !== false;
+
 if (make_array() == '') {
     http_response_code(404);
     exit;
+} elseif ($wants_json) {
+    $versions = [];
+    foreach ($original_found_versions as $version) {
+        if (file_exists('./metadata_files/' . $package_name . '-' . $version . '.metadata')) {
+            $versions[] = $version;
+        }
+    }
+
+    send_document(json_encode(['versions' => $versions]), 'application/json');
 } else {
-    echo "versions = [\n";
-    echo make_array();
-    echo "]\n";
-    
-    header('Content-type: text/plain');
+    send_document("versions = [\n" . make_array() . "]\n", 'text/plain; charset=utf-8');
 }
 
 ?>
\ No newline at end of file
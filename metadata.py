@@ -0,0 +1,243 @@
+from pathlib import Path
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable
+import threading
+import json
+import uuid
+import os
+import requests
+import toml # type: ignore
+
+from errors import *
+from tracing import *
+from metrics import *
+
+# ################################## Variables ###################################
+
+# The index serves pre-converted JSON documents when asked for it, TOML stays the
+# authoring format and the fallback for indexes that only have `.metadata` files.
+accept_header: str = 'application/json, text/plain;q=0.5'
+
+parsed_dir_name: str = 'parsed'
+
+# Metadata, versions and search documents are read in chunks up to this size, so a
+# broken or hostile index can't make the client buffer an unbounded response.
+max_document_size: int = 4 * 1024 * 1024
+document_chunk_size: int = 64 * 1024
+
+# ############################## Metadata documents ##############################
+
+def parse_metadata(text: str, content_type: str | None = None) -> dict:
+    """Parses a metadata document (or a versions/search document) from the index.
+
+    Args:
+    text (str): The document.
+    content_type (str | None, optional): The `Content-Type` of the response. Defaults to None
+
+    Returns:
+    dict: The parsed document
+    """
+
+    with span('metadata.parse', format='json' if content_type is not None and 'json' in content_type else 'toml') as s:
+        s.add_bytes(len(text))
+
+        if content_type is not None and 'json' in content_type:
+            return json.loads(text)
+
+        return toml.loads(text)
+
+def read_document(response: requests.Response, max_size: int = max_document_size) -> str | Error:
+    """Reads the body of a (streamed) index response, without buffering more than a bounded size.
+
+    Args:
+    response (requests.Response): The response of the index.
+    max_size (int, optional): The maximum size of the document, in bytes. Defaults to max_document_size
+
+    Returns:
+    str | Error: The document, or the error
+    """
+
+    if int(response.headers.get('content-length', 0)) > max_size:
+        response.close()
+        return DocumentTooLargeError(response.url, max_size)
+
+    chunks: list[bytes] = []
+    size: int = 0
+
+    for chunk in response.iter_content(chunk_size=document_chunk_size):
+        size += len(chunk)
+        if size > max_size:
+            response.close()
+            return DocumentTooLargeError(response.url, max_size)
+        chunks.append(chunk)
+
+    # The documents are UTF-8 whatever the charset of a `text/plain` response says
+    return b''.join(chunks).decode('utf-8', errors='replace')
+
+def parse_response(response: requests.Response) -> dict | Error:
+    """Parses the body of an index response according to its content type.
+
+    Args:
+    response (requests.Response): The response of the index.
+
+    Returns:
+    dict | Error: The parsed document, or the error
+    """
+
+    text: str | Error = read_document(response)
+    if isinstance(text, Error):
+        return text
+
+    return parse_metadata(text, response.headers.get('content-type'))
+
+def parsed_path(path: Path) -> Path:
+    """Gets the path of the pre-parsed (JSON) form of a local metadata file.
+
+    Args:
+    path (Path): The path of the `.metadata` file.
+
+    Returns:
+    Path: The path of the pre-parsed form
+    """
+
+    return path.parent / parsed_dir_name / (path.name.removesuffix('.metadata') + '.json')
+
+@traced('metadata.load')
+def load_metadata_file(path: Path) -> dict:
+    """Loads a local metadata file, using its pre-parsed form when it's up to date.
+
+    Args:
+    path (Path): The path of the `.metadata` file.
+
+    Returns:
+    dict: The metadata
+    """
+
+    json_path: Path = parsed_path(path)
+
+    try:
+        if json_path.stat().st_mtime_ns >= path.stat().st_mtime_ns:
+            with open(json_path, 'rb') as f:
+                return json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    with open(path) as f:
+        metadata: dict = toml.load(f)
+
+    _write_parsed(json_path, metadata)
+
+    return metadata
+
+def write_metadata_file(path: Path, metadata: dict, text: str | None = None) -> None:
+    """Writes a local metadata file along with its pre-parsed form.
+
+    Args:
+    path (Path): The path of the `.metadata` file.
+    metadata (dict): The metadata.
+    text (str | None, optional): The TOML document if it's already available, it's generated from `metadata` otherwise. Defaults to None
+    """
+
+    # Write then rename, another process may be reading it
+    tmp_path: Path = path.with_name(f'.{path.name}.{uuid.uuid4().hex}.tmp')
+    with open(tmp_path, 'w') as f:
+        f.write(text if text is not None else toml.dumps(metadata))
+    os.replace(tmp_path, path)
+
+    _write_parsed(parsed_path(path), metadata)
+
+def remove_metadata_file(path: Path) -> None:
+    """Removes a local metadata file and its pre-parsed form.
+
+    Args:
+    path (Path): The path of the `.metadata` file.
+    """
+
+    for p in (path, parsed_path(path)):
+        if p.exists():
+            p.unlink()
+
+def _write_parsed(json_path: Path, metadata: dict) -> None:
+    json_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Write then rename so a reader never sees a truncated document
+    tmp_path: Path = json_path.with_name(f'.{json_path.name}.{uuid.uuid4().hex}.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(metadata, f, separators=(',', ':'), default=str)
+    os.replace(tmp_path, json_path)
+
+# ################################ Metadata cache ################################
+
+class MetadataCache:
+    """A cache of the metadata documents looked up during a single command.
+
+    Lookups are keyed by a tuple (e.g. `('remote', package_name, version)`). The
+    first caller of a key runs the loader while concurrent callers of the same key
+    wait for its result (single-flight), so a document is never fetched or parsed
+    twice. Errors aren't kept, the next lookup tries again.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty metadata cache."""
+
+        self._entries: dict[Hashable, Future] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Gets the value of a key, loading it if it isn't cached yet.
+
+        Args:
+        key (Hashable): The key of the document.
+        loader (Callable[[], Any]): The function loading the document, it may return an `Error`.
+
+        Returns:
+        Any: The document (or the error returned by the loader)
+        """
+
+        with self._lock:
+            future: Future | None = self._entries.get(key)
+            owner: bool = future is None
+            if future is None:
+                future = self._entries[key] = Future()
+
+        count('mathget_cache_requests_total', cache='metadata', result='miss' if owner else 'hit')
+
+        if owner:
+            try:
+                value: Any = loader()
+            except BaseException as e:
+                with self._lock:
+                    self._entries.pop(key, None)
+                future.set_exception(e)
+                raise
+
+            if isinstance(value, Error):
+                with self._lock:
+                    self._entries.pop(key, None)
+            future.set_result(value)
+
+        return future.result()
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Stores a value already known for a key.
+
+        Args:
+        key (Hashable): The key of the document.
+        value (Any): The document.
+        """
+
+        future: Future = Future()
+        future.set_result(value)
+        with self._lock:
+            self._entries.setdefault(key, future)
+
+    def invalidate(self, *prefix: Hashable) -> None:
+        """Drops the keys starting with a prefix, e.g. `('local', package_name)`.
+
+        Args:
+        *prefix (Hashable): The first items of the keys to drop.
+        """
+
+        with self._lock:
+            for key in [k for k in self._entries if isinstance(k, tuple) and k[:len(prefix)] == prefix]:
+                del self._entries[key]
@@ -0,0 +1,213 @@
+from pathlib import Path
+from typing import Any
+import threading
+import json
+import uuid
+import os
+
+from locks import *
+
+# ################################## Variables ###################################
+
+# Upper bounds of the histogram buckets, in seconds
+duration_buckets: tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# The metrics recorded by MathGet: their type and description
+definitions: dict[str, tuple[str, str]] = {
+    'mathget_index_requests_total': ('counter', 'Responses received from index sources, by source, endpoint and status code.'),
+    'mathget_index_request_errors_total': ('counter', 'Requests to index sources that failed without a response (connection errors, timeouts).'),
+    'mathget_index_retries_total': ('counter', 'Requests retried after a throttled (429) or unavailable (502/503/504) response.'),
+    'mathget_index_hedged_requests_total': ('counter', 'Requests sent to another index source because the preferred one was slow or failed.'),
+    'mathget_index_request_duration_seconds': ('histogram', 'Time to the response headers of index requests, by source and endpoint.'),
+    'mathget_metadata_fetches_total': ('counter', 'Metadata documents fetched from the package index.'),
+    'mathget_metadata_bytes_total': ('counter', 'Bytes of metadata documents received (compressed size).'),
+    'mathget_cache_requests_total': ('counter', 'Cache lookups, by cache (metadata, archive, dependency_graph) and result (hit, miss).'),
+    'mathget_downloads_total': ('counter', 'Package archives downloaded.'),
+    'mathget_downloaded_bytes_total': ('counter', 'Bytes of package archives downloaded.'),
+    'mathget_download_duration_seconds': ('histogram', 'Time to transfer a package archive, once the response headers are received.'),
+    'mathget_packages_installed_total': ('counter', 'Packages installed or updated.'),
+    'mathget_extracted_bytes_total': ('counter', 'Bytes of package files extracted.'),
+    'mathget_extraction_duration_seconds': ('histogram', 'Time to extract a package archive.'),
+}
+
+# ################################### Metrics ####################################
+
+def _key(name: str, labels: dict[str, Any]) -> tuple[str, tuple[tuple[str, str], ...]]:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+class Metrics:
+    """Counters and histograms of the network and install paths, kept across runs.
+
+    A command records into memory, and `save` adds what it recorded to the metrics of
+    the previous runs (`user_packages/metrics.json`), under a lock so that concurrent
+    commands all count.
+    """
+
+    def __init__(self) -> None:
+        """Initialize empty metrics."""
+
+        self.counters: dict[tuple[str, tuple[tuple[str, str], ...]], float] = {}
+        self.histograms: dict[tuple[str, tuple[tuple[str, str], ...]], list[float]] = {} # bucket counts, then the sum
+
+        self._lock: threading.Lock = threading.Lock()
+
+    def count(self, name: str, value: float = 1, **labels: Any) -> None:
+        """Adds to a counter.
+
+        Args:
+        name (str): The name of the counter (see `definitions`).
+        value (float, optional): The amount to add. Defaults to 1
+        **labels (Any): The labels of the counter.
+        """
+
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        """Records a value in a histogram.
+
+        Args:
+        name (str): The name of the histogram (see `definitions`).
+        value (float): The value, in seconds.
+        **labels (Any): The labels of the histogram.
+        """
+
+        key = _key(name, labels)
+        with self._lock:
+            histogram: list[float] = self.histograms.setdefault(key, [0] * (len(duration_buckets) + 2))
+            histogram[next((i for i, bound in enumerate(duration_buckets) if value <= bound), len(duration_buckets))] += 1
+            histogram[-1] += value
+
+    def save(self, path: Path) -> None:
+        """Adds the recorded metrics to the persisted ones, then forgets them.
+
+        Args:
+        path (Path): The path of the metrics file.
+        """
+
+        with self._lock:
+            if not self.counters and not self.histograms:
+                return
+
+            counters, self.counters = self.counters, {}
+            histograms, self.histograms = self.histograms, {}
+
+        try:
+            self._merge(path, counters, histograms)
+        except OSError:
+            pass # metrics are best effort, they never fail a command
+
+    def _merge(self, path: Path, counters: dict, histograms: dict) -> None:
+        with FileLock(path.parent / '.locks' / f'{path.name}.lock'):
+            document: dict = load_metrics(path)
+
+            for name, labels, value in ((name, dict(labels), value) for (name, labels), value in counters.items()):
+                entry: dict | None = next((e for e in document['counters'] if e['name'] == name and e['labels'] == labels), None)
+                if entry is None:
+                    document['counters'].append({'name': name, 'labels': labels, 'value': value})
+                else:
+                    entry['value'] += value
+
+            for name, labels, buckets in ((name, dict(labels), buckets) for (name, labels), buckets in histograms.items()):
+                entry = next((e for e in document['histograms'] if e['name'] == name and e['labels'] == labels), None)
+                if entry is None:
+                    document['histograms'].append({'name': name, 'labels': labels, 'buckets': buckets[:-1], 'sum': buckets[-1]})
+                else:
+                    entry['buckets'] = [a + b for a, b in zip(entry['buckets'], buckets[:-1])]
+                    entry['sum'] += buckets[-1]
+
+            tmp_path: Path = path.with_name(f'.{path.name}.{uuid.uuid4().hex}.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(document, f, indent=1)
+            os.replace(tmp_path, path)
+
+def load_metrics(path: Path) -> dict:
+    """Loads the persisted metrics.
+
+    Args:
+    path (Path): The path of the metrics file.
+
+    Returns:
+    dict: The `counters` and `histograms`, each a list of `{name, labels, ...}` entries
+    """
+
+    try:
+        with open(path) as f:
+            document: dict = json.load(f)
+    except (OSError, ValueError):
+        return {'counters': [], 'histograms': []}
+
+    # Histograms recorded with other buckets can't be merged, they start over
+    document['histograms'] = [h for h in document.get('histograms', []) if len(h['buckets']) == len(duration_buckets) + 1]
+    document.setdefault('counters', [])
+
+    return document
+
+# ################################### Exports ####################################
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels: dict[str, str], **extra: str) -> str:
+    labels = {**labels, **extra}
+    if not labels:
+        return ''
+
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+def to_prometheus(document: dict) -> str:
+    """Formats metrics in the Prometheus text exposition format (e.g. for the node exporter textfile collector).
+
+    Args:
+    document (dict): The metrics (see `load_metrics`).
+
+    Returns:
+    str: The metrics text
+    """
+
+    lines: list[str] = []
+
+    for name, (kind, description) in definitions.items():
+        entries: list[dict] = [e for e in document['counters' if kind == 'counter' else 'histograms'] if e['name'] == name]
+        if not entries:
+            continue
+
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+
+        for entry in sorted(entries, key=lambda e: sorted(e['labels'].items())):
+            if kind == 'counter':
+                lines.append(f'{name}{_format_labels(entry["labels"])} {_format_value(entry["value"])}')
+                continue
+
+            cumulative: float = 0
+            for bound, count in zip((*map(str, duration_buckets), '+Inf'), entry['buckets']):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(entry["labels"], le=bound)} {_format_value(cumulative)}')
+            lines.append(f'{name}_sum{_format_labels(entry["labels"])} {_format_value(entry["sum"])}')
+            lines.append(f'{name}_count{_format_labels(entry["labels"])} {_format_value(cumulative)}')
+
+    return '\n'.join(lines) + '\n'
+
+def to_json(document: dict) -> str:
+    """Formats metrics as JSON, histograms with their bucket bounds.
+
+    Args:
+    document (dict): The metrics (see `load_metrics`).
+
+    Returns:
+    str: The metrics JSON document
+    """
+
+    return json.dumps({
+        'counters': document['counters'],
+        'histograms': [{**h, 'bounds': [*duration_buckets, None], 'count': sum(h['buckets'])} for h in document['histograms']],
+    }, indent=1)
+
+metrics: Metrics = Metrics()
+count = metrics.count
+observe = metrics.observe
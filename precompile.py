@@ -0,0 +1,67 @@
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import subprocess
+import shutil
+import os
+
+from errors import *
+from tracing import *
+
+# ################################## Variables ###################################
+
+# The MathScript toolchain builds the cached forms of the given sources next to them
+compile_arguments: list[str] = ['--compile']
+compile_timeout: float = 300.0 # seconds
+
+# ################################ Precompilation ################################
+
+def _package_files(package_dir: Path) -> set[str]:
+    return {f.relative_to(package_dir).as_posix() for f in package_dir.rglob('*') if f.is_file()}
+
+def precompile_package(package_dir: Path) -> list[str] | Error:
+    """Pre-builds the cached forms of the sources of an installed package with the MathScript toolchain.
+
+    Args:
+    package_dir (Path): The directory of the package.
+
+    Returns:
+    list[str] | Error: The files built, relative to the package directory, or the error
+    """
+
+    mathscript: str | None = shutil.which('mathscript')
+    if mathscript is None:
+        return InstallationNotFoundError()
+
+    before: set[str] = _package_files(package_dir)
+
+    # The entry point first, the toolchain may compile its imports along with it
+    sources: list[str] = sorted((f for f in before if f.endswith('.mscr')), key=lambda f: (f != 'init.mscr', f))
+    if sources == []:
+        return []
+
+    with span('precompile', package=package_dir.name):
+        try:
+            result: subprocess.CompletedProcess = subprocess.run(
+                [mathscript, *compile_arguments, *sources],
+                cwd=package_dir, capture_output=True, text=True, timeout=compile_timeout,
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            return PrecompileError(package_dir.name, str(e))
+
+    if result.returncode != 0:
+        return PrecompileError(package_dir.name, (result.stderr or result.stdout).strip())
+
+    return sorted(_package_files(package_dir) - before)
+
+def precompile_packages(package_dirs: list[Path]) -> dict[str, list[str] | Error]:
+    """Pre-builds the cached forms of the sources of installed packages, in parallel.
+
+    Args:
+    package_dirs (list[Path]): The directories of the packages.
+
+    Returns:
+    dict[str, list[str] | Error]: The files built for each package (by name), or the error
+    """
+
+    with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as executor:
+        return dict(zip((d.name for d in package_dirs), executor.map(precompile_package, package_dirs)))
@@ -0,0 +1,277 @@
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, Future
+from collections import deque
+from typing import BinaryIO, Iterator
+import hashlib
+import struct
+import zlib
+import json
+import uuid
+import os
+import re
+import toml # type: ignore
+
+from errors import *
+from tracing import *
+
+# ################################## Variables ###################################
+
+# The metadata of a package source, published along with its archive but not in it
+package_metadata_name: str = 'package.metadata'
+
+excluded_names: set[str] = {package_metadata_name, '.git', '.hg', '.svn', '.DS_Store', 'Thumbs.db'}
+
+# Already compressed formats, deflating them again only costs time
+stored_suffixes: set[str] = {'.zip', '.gz', '.tgz', '.bz2', '.xz', '.zst', '.7z', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.pdf', '.woff', '.woff2'}
+
+default_compression_level: int = 6
+
+_name_pattern: re.Pattern = re.compile(r'^[A-Za-z0-9_.\-]+$')
+_version_pattern: re.Pattern = re.compile(r'^\d+(\.\d+)*$')
+
+# Every entry gets the same timestamp (the earliest one zip can store, 1980-01-01)
+# and permissions, so that the same sources always give the same archive.
+_dos_time: int = 0
+_dos_date: int = (1 << 5) | 1
+_external_attributes: int = 0o100644 << 16
+
+_zip_stored: int = 0
+_zip_deflated: int = 8
+_zip_utf8_flag: int = 0x800
+_zip_version: int = 20
+_zip_made_by: int = (3 << 8) | _zip_version # Unix
+_zip_max: int = 0xFFFFFFFF
+
+# ############################### Archive building ###############################
+
+class PackedFile:
+    """A file of a package, compressed and hashed, ready to be written to its archive."""
+
+    def __init__(self, name: str, data: bytes, method: int, crc: int, size: int, sha256: str) -> None:
+        """Initialize a packed file.
+
+        Args:
+        name (str): The path of the file in the archive.
+        data (bytes): The (compressed) data of the file.
+        method (int): The zip compression method of the data (stored or deflated).
+        crc (int): The CRC-32 of the file.
+        size (int): The uncompressed size of the file, in bytes.
+        sha256 (str): The SHA-256 of the file, as a hexdigest.
+        """
+
+        self.name: str = name
+        self.data: bytes = data
+        self.method: int = method
+        self.crc: int = crc
+        self.size: int = size
+        self.sha256: str = sha256
+
+def package_files(package_dir: Path) -> list[str]:
+    """Lists the files to publish of a package source, in their archive order.
+
+    The entry point comes first, then the sources, then the other files, each group
+    sorted by path so that the files of a directory are contiguous. Installing reads
+    the archive front to back, the package is usable from its first entries.
+
+    Args:
+    package_dir (Path): The directory of the package source.
+
+    Returns:
+    list[str]: The files, relative to the package directory
+    """
+
+    files: list[str] = []
+
+    for root, dirs, names in os.walk(package_dir):
+        dirs[:] = [d for d in dirs if d not in excluded_names]
+
+        for name in names:
+            if name not in excluded_names:
+                files.append((Path(root) / name).relative_to(package_dir).as_posix())
+
+    return sorted(files, key=lambda f: (f != 'init.mscr', not f.endswith('.mscr'), f))
+
+def pack_file(package_dir: Path, name: str, level: int = default_compression_level) -> PackedFile:
+    """Compresses and hashes a file of a package (zlib and hashlib release the GIL, files are packed in parallel).
+
+    Args:
+    package_dir (Path): The directory of the package source.
+    name (str): The path of the file, relative to the package directory.
+    level (int, optional): The deflate level. Defaults to default_compression_level
+
+    Returns:
+    PackedFile: The packed file
+    """
+
+    data: bytes = (package_dir / name).read_bytes()
+    crc: int = zlib.crc32(data)
+    sha256: str = hashlib.sha256(data).hexdigest()
+
+    if Path(name).suffix.lower() not in stored_suffixes:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        compressed: bytes = compressor.compress(data) + compressor.flush()
+
+        if len(compressed) < len(data):
+            return PackedFile(name, compressed, _zip_deflated, crc, len(data), sha256)
+
+    return PackedFile(name, data, _zip_stored, crc, len(data), sha256)
+
+def _pack_files(package_dir: Path, names: list[str], level: int) -> Iterator[PackedFile]:
+    # In archive order, with a bounded number of packed files waiting to be written
+    max_pending: int = (os.cpu_count() or 1) * 2
+
+    with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as executor:
+        pending: deque[Future] = deque()
+
+        for name in names:
+            pending.append(executor.submit(pack_file, package_dir, name, level))
+
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+def write_archive(f: BinaryIO, package_dir: Path, names: list[str], level: int = default_compression_level) -> dict[str, tuple[int, str]] | Error:
+    """Writes a deterministic zip archive of package files, compressed in parallel.
+
+    Args:
+    f (BinaryIO): The file to write the archive to.
+    package_dir (Path): The directory of the package source.
+    names (list[str]): The files to archive, relative to the package directory, in order.
+    level (int, optional): The deflate level. Defaults to default_compression_level
+
+    Returns:
+    dict[str, tuple[int, str]] | Error: The size and SHA-256 of each archived file, or the error
+    """
+
+    if len(names) >= 0xFFFF:
+        return InvalidPackageError(package_dir, f'it has more than {0xFFFF - 1} files')
+
+    central_directory: list[bytes] = []
+    files: dict[str, tuple[int, str]] = {}
+    offset: int = 0
+
+    for packed in _pack_files(package_dir, names, level):
+        if offset + len(packed.data) > _zip_max or packed.size > _zip_max:
+            return InvalidPackageError(package_dir, 'it is larger than 4 GiB')
+
+        name: bytes = packed.name.encode()
+        fields: tuple = (_zip_utf8_flag, packed.method, _dos_time, _dos_date, packed.crc, len(packed.data), packed.size, len(name))
+
+        f.write(struct.pack('<IHHHHHIIIHH', 0x04034b50, _zip_version, *fields, 0))
+        f.write(name)
+        f.write(packed.data)
+
+        central_directory.append(struct.pack('<IHHHHHHIIIHHHHHII', 0x02014b50, _zip_made_by, _zip_version, *fields, 0, 0, 0, 0, _external_attributes, offset) + name)
+        files[packed.name] = (packed.size, packed.sha256)
+        offset += 30 + len(name) + len(packed.data)
+
+    central_directory_data: bytes = b''.join(central_directory)
+    f.write(central_directory_data)
+    f.write(struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, len(central_directory), len(central_directory), len(central_directory_data), offset, 0))
+
+    return files
+
+# ################################## Publishing ##################################
+
+def read_package_metadata(package_dir: Path) -> dict | Error:
+    """Reads and checks the metadata of a package source (its `package.metadata` file).
+
+    Args:
+    package_dir (Path): The directory of the package source.
+
+    Returns:
+    dict | Error: The metadata, or the error
+    """
+
+    metadata_path: Path = package_dir / package_metadata_name
+
+    if not metadata_path.is_file():
+        return FileOrDirectoryNotFoundError(metadata_path)
+
+    try:
+        with open(metadata_path) as f:
+            metadata: dict = toml.load(f)
+    except toml.TomlDecodeError as e:
+        return InvalidPackageError(package_dir, f'{package_metadata_name} isn\'t valid TOML ({e})')
+
+    package: dict = metadata.get('package', {})
+
+    if not _name_pattern.match(str(package.get('name', ''))):
+        return InvalidPackageError(package_dir, f'{package_metadata_name} has no valid [package] name')
+
+    if not _version_pattern.match(str(package.get('version', ''))):
+        return InvalidPackageError(package_dir, f'{package_metadata_name} has no valid [package] version (e.g. "1.2.0")')
+
+    if not (package_dir / 'init.mscr').is_file():
+        return InvalidPackageError(package_dir, 'it has no init.mscr')
+
+    return metadata
+
+def publish_package(package_dir: Path, index_dir: Path, level: int = default_compression_level, force: bool = False) -> dict | Error:
+    """Builds the archive and metadata of a package source into a package index directory.
+
+    Written are `install_files/<name>-<version>.zip`, then `metadata_json/<name>-<version>.json`
+    and last `metadata_files/<name>-<version>.metadata`, which makes the version visible
+    to clients. The metadata gets an `[archive]` table (size, unpacked size, SHA-256)
+    and a `[files]` table (the SHA-256 of every file).
+
+    Args:
+    package_dir (Path): The directory of the package source.
+    index_dir (Path): The directory of the package index.
+    level (int, optional): The deflate level. Defaults to default_compression_level
+    force (bool, optional): Whether to replace an already published version. Defaults to False
+
+    Returns:
+    dict | Error: The published metadata, or the error
+    """
+
+    metadata: dict | Error = read_package_metadata(package_dir)
+    if isinstance(metadata, Error):
+        return metadata
+
+    stem: str = f'{metadata["package"]["name"]}-{metadata["package"]["version"]}'
+    zip_path: Path = index_dir / 'install_files' / f'{stem}.zip'
+    metadata_path: Path = index_dir / 'metadata_files' / f'{stem}.metadata'
+    json_path: Path = index_dir / 'metadata_json' / f'{stem}.json'
+
+    # Clients may have pinned the hash of a published archive
+    if metadata_path.exists() and not force:
+        return PackageAlreadyPublishedError(metadata['package']['name'], metadata['package']['version'])
+
+    for directory in (zip_path.parent, metadata_path.parent, json_path.parent):
+        directory.mkdir(parents=True, exist_ok=True)
+
+    names: list[str] = package_files(package_dir)
+    tmp_zip_path: Path = zip_path.with_name(f'.{zip_path.name}.{uuid.uuid4().hex}.tmp')
+
+    with span('publish.pack', package=stem, files=len(names)) as s:
+        with open(tmp_zip_path, 'wb') as f:
+            files: dict[str, tuple[int, str]] | Error = write_archive(f, package_dir, names, level)
+
+        if isinstance(files, Error):
+            tmp_zip_path.unlink()
+            return files
+
+        s.add_bytes(sum(size for size, _ in files.values()))
+
+    with open(tmp_zip_path, 'rb') as f:
+        archive_sha256: str = hashlib.file_digest(f, 'sha256').hexdigest()
+
+    metadata['archive'] = {
+        'size': tmp_zip_path.stat().st_size,
+        'unpacked_size': sum(size for size, _ in files.values()),
+        'sha256': archive_sha256,
+    }
+    metadata['files'] = {name: f'sha256:{sha256}' for name, (_, sha256) in files.items()}
+
+    os.replace(tmp_zip_path, zip_path)
+
+    for path, text in ((json_path, json.dumps(metadata, separators=(',', ':'), default=str)), (metadata_path, toml.dumps(metadata))):
+        tmp_path: Path = path.with_name(f'.{path.name}.{uuid.uuid4().hex}.tmp')
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    return metadata
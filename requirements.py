@@ -0,0 +1,210 @@
+from pathlib import Path
+import re
+
+from errors import *
+
+# ################################## Variables ###################################
+
+# README operators and their spelling in the package index (and in metadata dependencies)
+operators: dict[str, str] = {
+    '==': '',
+    '~=': '~',
+    '>=': '^',
+    '<=': '_',
+}
+
+_requirement_pattern: re.Pattern = re.compile(r'^(?P<name>[A-Za-z0-9_.\-]+)\s*(?:(?P<operator>==|~=|>=|<=)\s*(?P<version>[A-Za-z0-9_.\-]+))?$')
+
+# The names and versions of `_requirement_pattern` that can be used as paths: not `.`, `..` or hidden (e.g. `.trash`)
+_path_safe_pattern: re.Pattern = re.compile(r'^[A-Za-z0-9_\-][A-Za-z0-9_.\-]*$')
+
+# ################################# Requirements #################################
+
+def is_valid_name(text: str) -> bool:
+    """Checks a package name or version from an untrusted source (a bundle, a plan), before it's used in a path.
+
+    Args:
+    text (str): The name or version.
+
+    Returns:
+    bool: Whether it's a valid name or version
+    """
+
+    return isinstance(text, str) and _path_safe_pattern.match(text) is not None
+
+class Requirement:
+    """A package requirement, e.g. `package>=1.2 --hash=sha256:...`."""
+
+    def __init__(self, name: str, operator: str | None = None, version: str | None = None, hashes: list[str] | None = None, source: str | None = None) -> None:
+        """Initialize a requirement.
+
+        Args:
+        name (str): The name of the package.
+        operator (str | None, optional): The version operator (`==`, `~=`, `>=` or `<=`), None for the latest version. Defaults to None
+        version (str | None, optional): The version the operator applies to. Defaults to None
+        hashes (list[str] | None, optional): The accepted hashes of the package archive, as `algorithm:hexdigest`. Defaults to None
+        source (str | None, optional): Where the requirement comes from (e.g. `file.req:3`), for error messages. Defaults to None
+        """
+
+        self.name: str = name
+        self.operator: str | None = operator
+        self.version: str | None = version
+        self.hashes: list[str] = hashes or []
+        self.source: str | None = source
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({str(self)!r})'
+
+    def __str__(self) -> str:
+        return f'{self.name}{self.operator or ""}{self.version or ""}'
+
+    @property
+    def index_version(self) -> str:
+        """The version specifier understood by the package index (`latest`, `1.2`, `~1.2`, `^1.2` or `_1.2`)."""
+
+        if self.operator is None or self.version is None:
+            return 'latest'
+
+        return operators[self.operator] + self.version
+
+    @classmethod
+    def from_index_version(cls, name: str, index_version: str) -> 'Requirement':
+        """Creates a requirement from a package index version specifier, as found in metadata dependencies.
+
+        Args:
+        name (str): The name of the package.
+        index_version (str): The version specifier (`latest`, `1.2`, `~1.2`, `^1.2` or `_1.2`).
+
+        Returns:
+        Requirement: The requirement
+        """
+
+        if index_version in ('', 'latest', '*'):
+            return cls(name)
+
+        for operator, prefix in operators.items():
+            if prefix and index_version.startswith(prefix):
+                return cls(name, operator, index_version[len(prefix):])
+
+        return cls(name, '==', index_version)
+
+def parse_requirement(text: str, source: str | None = None) -> Requirement | Error:
+    """Parses a requirement, e.g. `package~=1.2 --hash=sha256:...`.
+
+    Args:
+    text (str): The requirement.
+    source (str | None, optional): Where the requirement comes from, for error messages. Defaults to None
+
+    Returns:
+    Requirement | Error: The requirement, or the error
+    """
+
+    parts: list[str] = text.split()
+    hashes: list[str] = []
+
+    while parts and parts[-1].startswith('--hash'):
+        option: str = parts.pop()
+        if '=' not in option:
+            return InvalidRequirementError(text, source)
+        hashes.insert(0, option.split('=', 1)[1])
+
+    # Spaces are allowed around the operator, not inside a name or a version
+    match = _requirement_pattern.match(' '.join(parts))
+    if match is None:
+        return InvalidRequirementError(text, source)
+
+    for hash_ in hashes:
+        if ':' not in hash_:
+            return InvalidRequirementError(text, source)
+
+    return Requirement(match.group('name'), match.group('operator'), match.group('version'), hashes, source)
+
+def parse_requirements_file(path: Path, _included: set[Path] | None = None) -> list[Requirement] | Error:
+    """Parses a requirements file.
+
+    Blank lines and `#` comments are ignored, lines ending with `\\` continue on the
+    next one and `-r other.req` (or `--requirement other.req`) includes another file,
+    relative to the including one.
+
+    Args:
+    path (Path): The path of the requirements file.
+
+    Returns:
+    list[Requirement] | Error: The requirements, in order, or the error
+    """
+
+    if not path.exists() or not path.is_file():
+        return FileOrDirectoryNotFoundError(path)
+
+    included: set[Path] = _included if _included is not None else set()
+    if path.resolve() in included:
+        return []
+    included.add(path.resolve())
+
+    with open(path, 'r') as f:
+        lines: list[str] = f.read().replace('\\\n', ' ').splitlines()
+
+    requirements: list[Requirement] = []
+
+    for i, line in enumerate(lines, start=1):
+        line = line.split(' #', 1)[0].strip() if not line.lstrip().startswith('#') else ''
+        if not line:
+            continue
+
+        if line.startswith(('-r ', '--requirement ', '--requirement=')):
+            include_path: Path = path.parent / re.split(r'[ =]', line, maxsplit=1)[1].strip()
+            included_requirements: list[Requirement] | Error = parse_requirements_file(include_path, included)
+            if isinstance(included_requirements, Error):
+                return included_requirements
+            requirements += included_requirements
+            continue
+
+        requirement: Requirement | Error = parse_requirement(line, f'{path}:{i}')
+        if isinstance(requirement, Error):
+            return requirement
+        requirements.append(requirement)
+
+    return requirements
+
+# ############################### Resolved packages ##############################
+
+def dependency_specs(metadata: dict) -> dict[str, str]:
+    """Gets the dependencies of a package from its metadata, MathScript itself excluded.
+
+    Args:
+    metadata (dict): The metadata of the package.
+
+    Returns:
+    dict[str, str]: The package index version specifier of each dependency
+    """
+
+    return {name: version for name, version in (metadata.get('dependencies', None) or {}).items() if name != 'mathscript'}
+
+class ResolvedPackage:
+    """A package whose version has been resolved against the package index."""
+
+    def __init__(self, name: str, metadata: dict, requirement: Requirement, requested: bool) -> None:
+        """Initialize a resolved package.
+
+        Args:
+        name (str): The name of the package.
+        metadata (dict): The metadata of the resolved version.
+        requirement (Requirement): The requirement it was resolved from.
+        requested (bool): Whether the package was explicitly requested (not only pulled as a dependency).
+        """
+
+        self.name: str = name
+        self.metadata: dict = metadata
+        self.requirement: Requirement = requirement
+        self.requested: bool = requested
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({self.name!r}, {self.version!r})'
+
+    @property
+    def version(self) -> str:
+        return self.metadata['package']['version']
+
+    @property
+    def dependencies(self) -> dict[str, str]:
+        return dependency_specs(self.metadata)
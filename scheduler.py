@@ -0,0 +1,235 @@
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Iterator
+import threading
+import random
+import time
+
+# ################################## Variables ###################################
+
+# Lower goes first: resolution waits on metadata, downloads can be queued
+metadata_priority: int = 0
+download_priority: int = 1
+
+# Responses meaning the host is throttling or overloaded: retried after a delay
+retried_statuses: tuple[int, ...] = (429, 502, 503, 504)
+
+# ############################### Request scheduler ##############################
+
+class TokenBucket:
+    """A token bucket: `rate` requests per second on average, bursts of `capacity`."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        """Initialize a full token bucket.
+
+        Args:
+        rate (float): The number of tokens added per second.
+        capacity (float): The maximum number of tokens.
+        """
+
+        self.rate: float = rate
+        self.capacity: float = capacity
+        self.tokens: float = capacity
+        self.updated_at: float = time.monotonic()
+
+    def take(self) -> float:
+        """Takes a token if there is one.
+
+        Returns:
+        float: 0 if a token was taken, the time to wait for the next one otherwise, in seconds
+        """
+
+        now: float = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+
+        return (1 - self.tokens) / self.rate
+
+class RequestScheduler:
+    """Admission control for the requests sent to an index host.
+
+    A request waits for a slot before being sent. Slots are limited by a token bucket
+    (the request rate) and by a concurrency limit, both adapted with AIMD: they grow
+    with successful requests and are halved when the host throttles (429) or fails
+    (5xx). Like TCP, they grow fast (slow start) until the first push back from the
+    host, then by about one per window (congestion avoidance). A degraded latency
+    also lowers the concurrency. A `Retry-After` (or,
+    without one, an exponential backoff) holds every new request of the host until
+    it's over. Waiting metadata requests go before waiting downloads.
+    """
+
+    max_retries: int = 4
+    max_retry_after: float = 60.0 # seconds
+    latency_factor: float = 4.0 # latency degraded when above this factor of the best one
+    min_rate: float = 1.0 # requests per second
+
+    def __init__(self, initial_rate: float | None = None, max_rate: float | None = None, max_concurrency: int | None = None, initial_concurrency: int = 8) -> None:
+        """Initialize a request scheduler.
+
+        Args:
+        initial_rate (float | None, optional): The average number of requests per second to start from, None for no rate limit. Defaults to None
+        max_rate (float | None, optional): The maximum average number of requests per second, None for no maximum. Defaults to None
+        max_concurrency (int | None, optional): The maximum number of requests in flight, None for no limit (and no adaptation). Defaults to None
+        initial_concurrency (int, optional): The concurrency limit to start from. Defaults to 8
+        """
+
+        if initial_rate and max_rate:
+            initial_rate = min(initial_rate, max_rate)
+
+        self.bucket: TokenBucket | None = TokenBucket(initial_rate, max(1.0, initial_rate)) if initial_rate else None
+        self.max_rate: float = max_rate or float('inf')
+        self.max_concurrency: int | None = max_concurrency
+        self.limit: float = min(initial_concurrency, max_concurrency) if max_concurrency else float('inf')
+
+        self.in_flight: int = 0
+        self.waiting: dict[int, int] = {}
+        self.retry_at: float = 0.0
+        self.throttles: int = 0
+        self.best_latency: float | None = None
+        self.decreased_at: float = 0.0
+        self.slow_start: bool = True
+
+        self._condition: threading.Condition = threading.Condition()
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}(limit={self.limit:.1f}, in_flight={self.in_flight})'
+
+    @contextmanager
+    def slot(self, priority: int = metadata_priority) -> Iterator[None]:
+        """Waits for the right to send a request, held until the end of the `with` block.
+
+        Args:
+        priority (int, optional): The priority of the request, lower goes first. Defaults to metadata_priority
+        """
+
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self, priority: int = metadata_priority) -> None:
+        """Waits for the right to send a request, held until `release` is called.
+
+        Args:
+        priority (int, optional): The priority of the request, lower goes first. Defaults to metadata_priority
+        """
+
+        with self._condition:
+            self.waiting[priority] = self.waiting.get(priority, 0) + 1
+            try:
+                while True:
+                    delay: float | None = self._delay(priority)
+                    if delay == 0:
+                        break
+                    self._condition.wait(delay)
+            finally:
+                self.waiting[priority] -= 1
+                self._condition.notify_all()
+
+            self.in_flight += 1
+
+    def release(self) -> None:
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def _delay(self, priority: int) -> float | None:
+        # 0 to go now, otherwise how long to wait (None until notified)
+        now: float = time.monotonic()
+
+        if now < self.retry_at:
+            return self.retry_at - now
+
+        if any(count > 0 for p, count in self.waiting.items() if p < priority):
+            return None
+
+        if self.in_flight >= self.limit:
+            return None
+
+        if self.bucket is not None:
+            return self.bucket.take()
+
+        return 0.0
+
+    def record(self, status_code: int | None, latency: float, retry_after: str | None = None) -> None:
+        """Adapts the schedule to the outcome of a request.
+
+        Args:
+        status_code (int | None): The status code of the response, None if the request failed.
+        latency (float): The time to the response headers, in seconds.
+        retry_after (str | None, optional): The `Retry-After` header of the response. Defaults to None
+        """
+
+        with self._condition:
+            now: float = time.monotonic()
+
+            if status_code is not None and status_code in retried_statuses:
+                self.throttles += 1
+                delay: float | None = parse_retry_after(retry_after)
+                if delay is None:
+                    # Exponential backoff with jitter, so clients don't come back in lockstep
+                    delay = min(self.max_retry_after, 0.5 * 2 ** (self.throttles - 1)) * random.uniform(0.5, 1.0)
+                self.retry_at = max(self.retry_at, now + min(delay, self.max_retry_after))
+                self._decrease(now, 0.5, rate=status_code == 429)
+            elif status_code is None or status_code >= 500:
+                self._decrease(now, 0.5)
+            else:
+                self.throttles = 0
+                self.best_latency = latency if self.best_latency is None else min(self.best_latency, latency)
+
+                if latency > self.latency_factor * self.best_latency and latency > 0.5:
+                    self._decrease(now, 0.8)
+                elif self.max_concurrency:
+                    self.limit = min(self.max_concurrency, self.limit + (1 if self.slow_start else 1 / self.limit))
+
+                if self.bucket is not None:
+                    self.bucket.rate = min(self.max_rate, self.bucket.rate + (1 if self.slow_start else 1 / self.bucket.rate))
+                    self.bucket.capacity = max(1.0, self.bucket.rate)
+
+            self._condition.notify_all()
+
+    def _decrease(self, now: float, factor: float, rate: bool = False) -> None:
+        # Once per latency window: the requests in flight when the host pushed back
+        # all report it, that's a single congestion event.
+        if now - self.decreased_at < (self.best_latency or 0.1):
+            return
+
+        if self.max_concurrency:
+            self.limit = max(1.0, self.limit * factor)
+
+        if rate and self.bucket is not None:
+            self.bucket.rate = max(self.min_rate, self.bucket.rate * factor)
+            self.bucket.capacity = max(1.0, self.bucket.rate)
+            self.bucket.tokens = min(self.bucket.tokens, self.bucket.capacity)
+
+        self.decreased_at = now
+        self.slow_start = False
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parses a `Retry-After` header (a number of seconds or an HTTP date).
+
+    Args:
+    value (str | None): The header value.
+
+    Returns:
+    float | None: The delay, in seconds (None if there isn't a valid one)
+    """
+
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
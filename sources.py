@@ -0,0 +1,485 @@
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Callable
+import threading
+import time
+import io
+import json
+import socket
+import requests
+import toml # type: ignore
+from urllib3.util.request import ACCEPT_ENCODING
+
+from errors import *
+from _types import *
+from tracing import *
+from scheduler import *
+from metrics import *
+
+# ################################## Variables ###################################
+
+connect_timeout: float = 5.0 # seconds
+read_timeout: float = 30.0 # seconds
+
+# The defaults of remote sources (`rate` and `max_concurrency` in `indexes.toml` set
+# their maximums). The request rate starts from `initial_rate` and adapts to the host.
+initial_rate: float = 20.0 # requests per second
+default_max_concurrency: int = 16
+
+# The content encodings the HTTP stack decodes: gzip and deflate, plus br and zstd
+# when the optional brotli and zstandard modules are installed.
+accept_encoding: str = ACCEPT_ENCODING
+
+# The request schedulers of the sources bound the concurrency, not this pool
+_executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=32, thread_name_prefix='mathget-index')
+
+def _release_on_close(response: requests.Response, release: Callable[[], None]) -> None:
+    close: Callable[[], None] = response.close
+    # Taken by the first close and never released: the slot is given back once
+    released: threading.Lock = threading.Lock()
+
+    def close_and_release() -> None:
+        try:
+            close()
+        finally:
+            if released.acquire(blocking=False):
+                release()
+
+    response.close = close_and_release # type: ignore
+
+# ############################## Version resolution ##############################
+
+def _pad_version(version: str, max_length: int) -> str:
+    """Pads a version with trailing zeros the same way the PHP index does.
+
+    Args:
+    version (str): The version to pad.
+    max_length (int): The length of the longest version found.
+
+    Returns:
+    str: The padded version.
+    """
+
+    version = version + '.0' * ((max_length - len(version)) // 2)
+
+    if len(version) != max_length:
+        version += '0'
+
+    return version
+
+def resolve_version(found_versions: list[str], version: str = 'latest') -> str | None:
+    """Resolves a version specifier against a list of available versions.
+
+    This mirrors the resolution done by `metadata.php` and `install.php` so that a
+    local directory index answers exactly like the remote one.
+
+    Args:
+    found_versions (list[str]): The versions available in the index.
+    version (str, optional): The version specifier (`latest`, `~x`, `^x`, `_x` or an exact version). Defaults to 'latest'
+
+    Returns:
+    str | None: The resolved version (None if there isn't)
+    """
+
+    if found_versions == []:
+        return None
+
+    max_length: int = max(len(v) for v in found_versions)
+    padded_versions: list[str] = [_pad_version(v, max_length) for v in found_versions]
+
+    if version == 'latest':
+        version = max(padded_versions)
+    elif version.startswith('~'):
+        version = version[1:]
+        matching_versions = [v for v in padded_versions if v.startswith(version + '.') or v == version]
+        if matching_versions == []:
+            return None
+        version = max(matching_versions)
+    else:
+        if version.startswith('^'):
+            version = max(_pad_version(version[1:], max_length), max(padded_versions))
+        elif version.startswith('_'):
+            version = max(_pad_version(version[1:], max_length), min(padded_versions))
+        else:
+            version = _pad_version(version, max_length)
+
+    if version not in padded_versions:
+        return None
+
+    return found_versions[padded_versions.index(version)]
+
+def _natural_key(version: str) -> list:
+    return [int(part) if part.isdigit() else part for part in version.split('.')]
+
+# ################################# Index sources ################################
+
+class IndexSource:
+    """A package index (a remote host or a local directory) with health tracking.
+
+    The source keeps an exponentially weighted moving average of its latency and a
+    circuit breaker: after `failure_threshold` consecutive failures it is skipped
+    for `cooldown` seconds, then a single probe request is let through. The
+    requests to a remote source go through its request scheduler.
+    """
+
+    failure_threshold: int = 3
+    cooldown: float = 30.0 # seconds
+
+    def __init__(self, location: str, priority: int = 0, rate: float | None = None, max_concurrency: int | None = default_max_concurrency) -> None:
+        """Initialize an index source.
+
+        Args:
+        location (str): The URL of the index, or the path of a local index directory.
+        priority (int, optional): The priority of the source, lower goes first. Defaults to 0
+        rate (float | None, optional): The maximum average number of requests per second to a remote source, None for no maximum. Defaults to None
+        max_concurrency (int | None, optional): The maximum number of requests in flight to a remote source, None for no limit. Defaults to default_max_concurrency
+        """
+
+        self.location: str = location
+        self.priority: int = priority
+        self.is_local: bool = len(URL(location).parts.scheme) <= 1 or URL(location).parts.scheme == 'file' # drive letters parse as schemes
+
+        if self.is_local:
+            self.path: Path = Path(URL(location).parts.path if location.startswith('file:') else location)
+        else:
+            self.url: URL = URL(location)
+            self.session: requests.Session = requests.Session()
+            self.session.headers['Accept-Encoding'] = accept_encoding
+            # The default pool keeps 10 connections, enough for the default concurrency
+            adapter: requests.adapters.HTTPAdapter = requests.adapters.HTTPAdapter(pool_maxsize=max(10, max_concurrency or 0))
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+
+        self.scheduler: RequestScheduler = RequestScheduler() if self.is_local else RequestScheduler(initial_rate, rate, max_concurrency)
+
+        self.latency: float | None = None
+        self.resolved: bool = False
+        self.failures: int = 0
+        self.opened_at: float | None = None
+        self._lock: threading.Lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({repr(self.location)}, priority={self.priority})'
+
+    # ----------------------------------- Health -----------------------------------
+
+    def is_available(self) -> bool:
+        """Whether the circuit breaker lets a request through.
+
+        Returns:
+        bool: True if the source can be queried
+        """
+
+        with self._lock:
+            if self.opened_at is None:
+                return True
+
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                # Half-open: let one probe through and re-open it right away,
+                # a success will close the circuit.
+                self.opened_at = time.monotonic()
+                return True
+
+            return False
+
+    def record_success(self, latency: float) -> None:
+        with self._lock:
+            self.latency = latency if self.latency is None else 0.7 * self.latency + 0.3 * latency
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    # ---------------------------------- Requests ----------------------------------
+
+    def get(self, endpoint: str, argument: str, query: dict[str, str] | None = None, stream: bool = False, headers: dict[str, str] | None = None) -> requests.Response:
+        """Sends a request to an endpoint of the index.
+
+        Args:
+        endpoint (str): The endpoint (`metadata.php`, `install.php`, `versions.php` or `search.php`).
+        argument (str): The path argument of the endpoint (a package name or a keyword).
+        query (dict[str, str] | None, optional): The query string parameters. Defaults to None
+        stream (bool, optional): Whether to stream the response body. Defaults to False
+        headers (dict[str, str] | None, optional): The request headers. Defaults to None
+
+        Returns:
+        requests.Response: The response of the index
+
+        Raises:
+        requests.exceptions.RequestException: When the index can't be reached
+        """
+
+        if self.is_local:
+            return self._get_local(endpoint, argument, query or {}, headers or {})
+
+        if tracer.enabled and not self.resolved:
+            self.resolved = True
+            with span('index.dns', host=self.url.parts.hostname):
+                try:
+                    socket.getaddrinfo(self.url.parts.hostname, self.url.parts.port or 80)
+                except OSError:
+                    pass
+
+        url: URL = self.url / 'search.php' / argument if endpoint == 'search.php' else self.url / 'packages' / endpoint / argument
+        return self.session.get(str(url), params=query, stream=stream, headers=headers, timeout=(connect_timeout, read_timeout))
+
+    def _get_local(self, endpoint: str, argument: str, query: dict[str, str], headers: dict[str, str]) -> requests.Response:
+        response: requests.Response = requests.Response()
+        response.url = str(self.path / endpoint / argument)
+        response.status_code = 404
+        response.raw = io.BytesIO(b'')
+
+        wants_json: bool = 'application/json' in headers.get('Accept', '')
+
+        def document(data: dict) -> io.BytesIO:
+            response.headers['content-type'] = 'application/json' if wants_json else 'text/plain'
+            return io.BytesIO((json.dumps(data) if wants_json else toml.dumps(data)).encode())
+
+        if endpoint == 'search.php':
+            response.status_code = 200
+            response.raw = document({'packages': self._search_local(argument)})
+            return response
+
+        directory, extension = ('install_files', '.zip') if endpoint == 'install.php' else ('metadata_files', '.metadata')
+        files: list[Path] = self._package_files(directory, argument, extension)
+        versions: list[str] = [f.name[len(argument) + 1:-len(extension)] for f in files]
+
+        if endpoint == 'versions.php':
+            if versions == []:
+                return response
+            response.status_code = 200
+            response.raw = document({'versions': sorted(versions, key=_natural_key)})
+            return response
+
+        version: str | None = resolve_version(versions, query.get('version', 'latest') or 'latest')
+        if version is None:
+            return response
+
+        file_path: Path = self.path / directory / f'{argument}-{version}{extension}'
+        content_type: str = 'application/zip' if endpoint == 'install.php' else 'text/plain'
+
+        if endpoint == 'metadata.php' and wants_json and (self.path / 'metadata_json' / f'{argument}-{version}.json').exists():
+            file_path = self.path / 'metadata_json' / f'{argument}-{version}.json'
+            content_type = 'application/json'
+
+        response.status_code = 200
+        response.raw = open(file_path, 'rb')
+        response.headers['content-type'] = content_type
+        response.headers['content-length'] = str(file_path.stat().st_size)
+        return response
+
+    def _package_files(self, directory: str, package_name: str, extension: str) -> list[Path]:
+        if not (self.path / directory).is_dir():
+            raise requests.exceptions.ConnectionError(f'"{self.path}" is not a package index directory.')
+
+        return [
+            f for f in (self.path / directory).glob(f'{package_name}-*{extension}')
+            if f.name[:-len(extension)].rsplit('-', 1)[0] == package_name
+        ]
+
+    def _search_local(self, keyword: str) -> list[dict]:
+        latest: dict[str, str] = {}
+        for f in (self.path / 'metadata_files').glob('*.metadata'):
+            name, version = f.name[:-len('.metadata')].rsplit('-', 1)
+            if name not in latest or _natural_key(version) > _natural_key(latest[name]):
+                latest[name] = version
+
+        packages: list[dict] = []
+        for name, version in sorted(latest.items()):
+            with open(self.path / 'metadata_files' / f'{name}-{version}.metadata') as f:
+                metadata: dict = toml.load(f)
+
+            package: dict = metadata.get('package', {})
+            haystack: str = ' '.join([name, package.get('description', ''), *package.get('keywords', [])]).lower()
+            if keyword.lower() in haystack:
+                packages.append({'name': name, 'version': version, **({'license': package['license']} if 'license' in package else {})})
+
+        return packages
+
+class IndexSources:
+    """An ordered list of index sources queried with failover.
+
+    Small requests (metadata, versions, search) are hedged: the best source is
+    queried first and, if it hasn't answered within a delay derived from its
+    latency, the next one is raced against it. Downloads go to the fastest
+    healthy source and fail over to the next one on errors.
+    """
+
+    min_hedge_delay: float = 0.25 # seconds
+
+    def __init__(self, sources: list[IndexSource]) -> None:
+        """Initialize a list of index sources.
+
+        Args:
+        sources (list[IndexSource]): The index sources.
+        """
+
+        self.sources: list[IndexSource] = sorted(sources, key=lambda s: s.priority)
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({self.sources!r})'
+
+    def _ranked(self, by_latency: bool) -> list[IndexSource]:
+        available: list[IndexSource] = [s for s in self.sources if s.is_available()]
+
+        if available == []:
+            # Every circuit is open: trying is better than failing right away.
+            available = list(self.sources)
+
+        if by_latency:
+            return sorted(available, key=lambda s: (s.latency is None, s.latency or 0.0, s.priority))
+        return available
+
+    def _attempt(self, source: IndexSource, endpoint: str, argument: str, query: dict[str, str] | None, stream: bool, headers: dict[str, str] | None) -> requests.Response:
+        priority: int = download_priority if stream else metadata_priority
+        attempt: int = 0
+
+        while True:
+            with span('index.wait', source=source.location, endpoint=endpoint):
+                source.scheduler.acquire(priority)
+
+            start: float = time.monotonic()
+            try:
+                # Until the headers are received: connection and time to first byte
+                with span('index.request', source=source.location, endpoint=endpoint, argument=argument) as s:
+                    # Bodies are always streamed: callers read them with bounded memory
+                    # and a losing hedged request is closed before its body is sent.
+                    response: requests.Response = source.get(endpoint, argument, query, True, headers)
+                    s.set('status', response.status_code)
+                    s.set('attempt', attempt)
+            except requests.exceptions.RequestException:
+                source.scheduler.record(None, time.monotonic() - start)
+                source.scheduler.release()
+                source.record_failure()
+                count('mathget_index_request_errors_total', source=source.location, endpoint=endpoint)
+                raise
+
+            latency: float = time.monotonic() - start
+            source.scheduler.record(response.status_code, latency, response.headers.get('retry-after'))
+
+            if stream:
+                # A download holds its slot until its response is closed, so that the
+                # concurrency limit bounds the transfers and not only their requests
+                _release_on_close(response, source.scheduler.release)
+            else:
+                source.scheduler.release()
+
+            count('mathget_index_requests_total', source=source.location, endpoint=endpoint, status=response.status_code)
+            observe('mathget_index_request_duration_seconds', latency, source=source.location, endpoint=endpoint)
+
+            # The scheduler holds the next slot until the Retry-After or the backoff is over
+            if response.status_code in retried_statuses and attempt < source.scheduler.max_retries:
+                response.close()
+                attempt += 1
+                count('mathget_index_retries_total', source=source.location, endpoint=endpoint)
+                continue
+
+            break
+
+        if response.status_code >= 500 or response.status_code == 429:
+            source.record_failure()
+        else:
+            source.record_success(latency)
+
+        return response
+
+    def fetch(self, endpoint: str, argument: str, query: dict[str, str] | None = None, stream: bool = False, headers: dict[str, str] | None = None) -> requests.Response | Error:
+        """Fetches an endpoint from the best available index source.
+
+        Args:
+        endpoint (str): The endpoint (`metadata.php`, `install.php`, `versions.php` or `search.php`).
+        argument (str): The path argument of the endpoint (a package name or a keyword).
+        query (dict[str, str] | None, optional): The query string parameters. Defaults to None
+        stream (bool, optional): Whether the request is a download, downloads aren't raced and hold their scheduler slot until their response is closed. Defaults to False
+        headers (dict[str, str] | None, optional): The request headers. Defaults to None
+
+        Returns:
+        requests.Response | Error: The first successful response, the last 404/HTTP error response if no source has the document, or the error
+        """
+
+        candidates: list[IndexSource] = self._ranked(by_latency=stream)
+        pending: dict[Future, IndexSource] = {}
+        fallback: requests.Response | None = None
+        last_exception: requests.exceptions.RequestException | None = None
+
+        while candidates or pending:
+            if candidates:
+                source: IndexSource = candidates.pop(0)
+                if pending or fallback is not None or last_exception is not None:
+                    count('mathget_index_hedged_requests_total', source=source.location, endpoint=endpoint)
+                pending[_executor.submit(self._attempt, source, endpoint, argument, query, stream, headers)] = source
+
+            hedge_delay: float | None = None
+            if candidates and not stream:
+                latency: float | None = pending[next(iter(pending))].latency
+                hedge_delay = max(self.min_hedge_delay, 2 * latency) if latency is not None else self.min_hedge_delay
+
+            done, _ = wait(pending, timeout=hedge_delay, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                pending.pop(future)
+                try:
+                    response: requests.Response = future.result()
+                except requests.exceptions.RequestException as e:
+                    last_exception = e
+                    continue
+
+                if 200 <= response.status_code <= 299:
+                    for other in pending:
+                        other.add_done_callback(lambda f: f.exception() is None and f.result().close())
+                    return response
+
+                if fallback is None or fallback.status_code == 404:
+                    fallback = response
+                else:
+                    response.close()
+
+        if fallback is not None:
+            return fallback
+
+        if isinstance(last_exception, requests.exceptions.Timeout):
+            return NetworkError("Request timed out.")
+        elif isinstance(last_exception, requests.exceptions.ConnectionError):
+            return NetworkError("Unable to connect to the package index.")
+        return NetworkError(f"An error occurred while fetching from the package index: {last_exception}")
+
+def load_index_sources(config_file: Path, default_url: URL, extra_locations: list[str] | None = None) -> IndexSources:
+    """Loads the index sources from a configuration file.
+
+    The configuration file is a TOML file with an `index` array of tables, each one
+    having an `url` (an URL or a local directory), an optional `priority` and, for
+    remote indexes, optional `rate` (requests per second) and `max_concurrency`:
+
+        [[index]]
+        url = "http://mirror.internal/mathget-index/"
+        priority = 0
+        rate = 50
+
+    Args:
+    config_file (Path): The path to the configuration file.
+    default_url (URL): The URL of the official package index, used when no source is configured.
+    extra_locations (list[str] | None, optional): Locations given on the command line, they go before the configured ones. Defaults to None
+
+    Returns:
+    IndexSources: The index sources
+    """
+
+    sources: list[IndexSource] = []
+
+    for i, location in enumerate(extra_locations or []):
+        sources.append(IndexSource(location, priority=-len(extra_locations) + i)) # type: ignore
+
+    if config_file.exists():
+        with open(config_file) as f:
+            config: dict = toml.load(f)
+        for entry in config.get('index', []):
+            sources.append(IndexSource(entry['url'], entry.get('priority', 0), entry.get('rate'), entry.get('max_concurrency', default_max_concurrency)))
+
+    if sources == []:
+        sources.append(IndexSource(str(default_url)))
+
+    return IndexSources(sources)
@@ -0,0 +1,5 @@
+from pathlib import Path
+import sys
+
+# The modules are imported by name, as `main.py` does
+sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -0,0 +1,55 @@
+from pathlib import Path
+import hashlib
+import zipfile
+import zlib
+
+from integrity import *
+
+def sha256(data: bytes) -> str:
+    return f'sha256:{hashlib.sha256(data).hexdigest()}'
+
+# ################################# File hashes ##################################
+
+def test_digest() -> None:
+    assert digest(b'abc', 'sha256') == sha256(b'abc')
+    assert digest(b'abc', 'crc32') == f'crc32:{zlib.crc32(b"abc"):08x}'
+
+def test_check_file(tmp_path: Path) -> None:
+    path: Path = tmp_path / 'init.mscr'
+    path.write_bytes(b'print(1)')
+
+    assert check_file(path, sha256(b'print(1)')) is None
+    assert check_file(path, digest(b'print(1)', 'crc32')) is None
+    assert check_file(path, None) is None
+
+    path.write_bytes(b'print(2)')
+    assert check_file(path, sha256(b'print(1)')) == 'modified'
+
+    path.unlink()
+    assert check_file(path, sha256(b'print(1)')) == 'missing'
+    assert check_file(path, None) == 'missing'
+
+def test_check_empty_file(tmp_path: Path) -> None:
+    path: Path = tmp_path / 'empty'
+    path.touch()
+
+    assert check_file(path, sha256(b'')) is None
+
+def test_archive_hashes(tmp_path: Path) -> None:
+    with zipfile.ZipFile(tmp_path / 'package.zip', 'w') as zip_ref:
+        zip_ref.writestr('init.mscr', b'print(1)')
+        zip_ref.writestr('lib/', b'')
+        zip_ref.writestr('lib/util.mscr', b'print(2)')
+        zip_ref.writestr('data.bin', b'\x00')
+
+    published: dict[str, str] = {'init.mscr': sha256(b'print(1)'), 'data.bin': 'md5:93b885adfe0da089cdf634904fd59f71'}
+
+    with zipfile.ZipFile(tmp_path / 'package.zip') as zip_ref:
+        hashes: dict[str, str] = archive_hashes(zip_ref, published)
+
+    # The published hash when there's a usable one, the CRC-32 of the archive otherwise
+    assert hashes == {
+        'init.mscr': sha256(b'print(1)'),
+        'lib/util.mscr': digest(b'print(2)', 'crc32'),
+        'data.bin': digest(b'\x00', 'crc32'),
+    }
@@ -0,0 +1,82 @@
+from pathlib import Path
+
+import pytest
+
+from manifest import *
+
+def make_manifest(path: Path, packages: dict[str, tuple[bool, list[str]]]) -> Manifest:
+    manifest: Manifest = Manifest(path / 'manifest.json')
+
+    for name, (requested, dependencies) in packages.items():
+        manifest.add(name, '1.0', requested, dependencies, [])
+
+    return manifest
+
+@pytest.fixture
+def manifest(tmp_path: Path) -> Manifest:
+    # app -> lib -> base, tool -> base, and a leftover orphan holding old -> base
+    return make_manifest(tmp_path, {
+        'app': (True, ['lib']),
+        'lib': (False, ['base']),
+        'base': (False, []),
+        'tool': (True, ['base']),
+        'leftover': (False, ['old', 'base']),
+        'old': (False, []),
+    })
+
+# ################################ Dependency graph ##############################
+
+def test_reachable(manifest: Manifest) -> None:
+    assert manifest.reachable() == {'app', 'lib', 'base', 'tool'}
+    assert manifest.reachable({'leftover'}) == {'leftover', 'old', 'base'}
+    assert manifest.reachable({'missing'}) == set()
+
+def test_dependents(manifest: Manifest) -> None:
+    assert manifest.dependents('base') == {'lib', 'tool', 'leftover'}
+    assert manifest.dependents('base', recursive=True) == {'lib', 'tool', 'leftover', 'app'}
+
+def test_orphans_of_the_installation(manifest: Manifest) -> None:
+    assert manifest.orphans() == {'leftover', 'old'}
+
+def test_orphans_of_removed_packages(manifest: Manifest) -> None:
+    # The leftover orphans aren't the removed package's, they stay for `gc`
+    assert manifest.orphans({'app'}) == {'lib'}
+
+def test_orphans_keep_dependencies_still_used(manifest: Manifest) -> None:
+    # `base` is still used by `leftover`, which stays installed
+    assert manifest.orphans({'app', 'tool'}) == {'lib'}
+    assert manifest.orphans({'app', 'tool', 'leftover'}) == {'lib', 'base', 'old'}
+
+def test_orphans_with_cycle(tmp_path: Path) -> None:
+    manifest: Manifest = make_manifest(tmp_path, {'app': (True, ['a']), 'a': (False, ['b']), 'b': (False, ['a'])})
+
+    assert manifest.orphans() == set()
+    assert manifest.orphans({'app'}) == {'a', 'b'}
+
+# ################################ Package entries ###############################
+
+def test_requested_stays_requested(manifest: Manifest) -> None:
+    manifest.add('app', '2.0', False, ['lib'], [])
+
+    assert manifest.packages['app']['requested']
+    assert manifest.stored('app') == {'1.0': {'dependencies': ['lib'], 'files': [], 'size': 0}}
+
+def test_set_requested(manifest: Manifest) -> None:
+    manifest.set_requested('lib')
+    manifest.set_requested('missing')
+
+    assert manifest.packages['lib']['requested']
+    assert 'missing' not in manifest
+    assert manifest.orphans({'app'}) == set()
+
+def test_save_merges_concurrent_changes(tmp_path: Path) -> None:
+    first: Manifest = make_manifest(tmp_path, {'app': (True, [])})
+    first.save()
+
+    second: Manifest = Manifest(tmp_path / 'manifest.json')
+    second.add('tool', '1.0', True, [], [])
+    first.remove('app')
+    first.save()
+    second.save()
+
+    assert set(Manifest(tmp_path / 'manifest.json').packages) == {'tool'}
@@ -0,0 +1,63 @@
+from pathlib import Path
+import hashlib
+import zipfile
+import io
+import os
+
+from publish import *
+
+def make_package(package_dir: Path) -> None:
+    (package_dir / 'lib').mkdir(parents=True)
+    (package_dir / '.git').mkdir()
+    (package_dir / 'init.mscr').write_text('import lib.util\n' * 100)
+    (package_dir / 'lib' / 'util.mscr').write_text('x = 1\n')
+    (package_dir / 'README.md').write_text('# Package\n')
+    (package_dir / 'logo.png').write_bytes(bytes(range(256)))
+    (package_dir / '.git' / 'HEAD').write_text('ref: refs/heads/main\n')
+    (package_dir / package_metadata_name).write_text('[package]\nname = "package"\nversion = "1.0"\n')
+
+# ############################### Archive building ###############################
+
+def test_package_files(tmp_path: Path) -> None:
+    make_package(tmp_path)
+
+    # The entry point, the sources, then the rest, without the metadata and VCS files
+    assert package_files(tmp_path) == ['init.mscr', 'lib/util.mscr', 'README.md', 'logo.png']
+
+def test_write_archive(tmp_path: Path) -> None:
+    make_package(tmp_path)
+    names: list[str] = package_files(tmp_path)
+
+    archive: io.BytesIO = io.BytesIO()
+    files: dict[str, tuple[int, str]] | Error = write_archive(archive, tmp_path, names)
+
+    assert isinstance(files, dict)
+
+    with zipfile.ZipFile(archive) as zip_ref:
+        assert zip_ref.testzip() is None
+        assert zip_ref.namelist() == names
+
+        for info in zip_ref.infolist():
+            data: bytes = (tmp_path / info.filename).read_bytes()
+            assert zip_ref.read(info) == data
+            assert files[info.filename] == (len(data), hashlib.sha256(data).hexdigest())
+
+        # Already compressed formats are stored, the sources deflated
+        assert zip_ref.getinfo('logo.png').compress_type == zipfile.ZIP_STORED
+        assert zip_ref.getinfo('init.mscr').compress_type == zipfile.ZIP_DEFLATED
+
+def test_write_archive_is_deterministic(tmp_path: Path) -> None:
+    make_package(tmp_path)
+    names: list[str] = package_files(tmp_path)
+
+    first: io.BytesIO = io.BytesIO()
+    write_archive(first, tmp_path, names)
+
+    # Neither the modification times nor the permissions of the sources are archived
+    os.utime(tmp_path / 'init.mscr', (0, 0))
+    os.chmod(tmp_path / 'lib' / 'util.mscr', 0o600)
+
+    second: io.BytesIO = io.BytesIO()
+    write_archive(second, tmp_path, names)
+
+    assert first.getvalue() == second.getvalue()
@@ -0,0 +1,108 @@
+from pathlib import Path
+
+import pytest
+
+from errors import *
+from requirements import *
+
+# ################################# Requirements #################################
+
+@pytest.mark.parametrize('text, index_version', [
+    ('foo', 'latest'),
+    ('foo==1.2', '1.2'),
+    ('foo~=1.2', '~1.2'),
+    ('foo>=1.2', '^1.2'),
+    ('foo<=1.2', '_1.2'),
+    ('foo >= 1.2', '^1.2'),
+])
+def test_parse_requirement_operators(text: str, index_version: str) -> None:
+    requirement: Requirement | Error = parse_requirement(text)
+
+    assert isinstance(requirement, Requirement)
+    assert requirement.name == 'foo'
+    assert requirement.index_version == index_version
+
+@pytest.mark.parametrize('index_version', ['latest', '1.2', '~1.2', '^1.2', '_1.2'])
+def test_from_index_version_round_trip(index_version: str) -> None:
+    assert Requirement.from_index_version('foo', index_version).index_version == index_version
+
+@pytest.mark.parametrize('index_version', ['', '*'])
+def test_from_index_version_any(index_version: str) -> None:
+    assert Requirement.from_index_version('foo', index_version).index_version == 'latest'
+
+def test_parse_requirement_hashes() -> None:
+    requirement: Requirement | Error = parse_requirement('foo>=1.2 --hash=sha256:ab --hash=crc32:cd')
+
+    assert isinstance(requirement, Requirement)
+    assert str(requirement) == 'foo>=1.2'
+    assert requirement.hashes == ['sha256:ab', 'crc32:cd']
+
+@pytest.mark.parametrize('text', ['', 'foo>1.2', 'foo==', 'foo --hash', 'foo --hash=abc', '../foo', 'foo bar'])
+def test_parse_requirement_invalid(text: str) -> None:
+    assert isinstance(parse_requirement(text), InvalidRequirementError)
+
+@pytest.mark.parametrize('text, valid', [
+    ('foo', True),
+    ('foo-bar_2.0', True),
+    ('1.2', True),
+    ('', False),
+    ('.', False),
+    ('..', False),
+    ('.trash', False),
+    ('../foo', False),
+    ('foo/bar', False),
+    ('foo\\bar', False),
+    (None, False),
+    (['foo'], False),
+])
+def test_is_valid_name(text: str, valid: bool) -> None:
+    assert is_valid_name(text) == valid
+
+# ############################## Requirements files ##############################
+
+def test_parse_requirements_file(tmp_path: Path) -> None:
+    path: Path = tmp_path / 'requirements.req'
+    path.write_text('# Comment\n\nfoo==1.2 # pinned\nbar>=1.0 \\\n    --hash=sha256:ab\n  baz\n')
+
+    requirements: list[Requirement] | Error = parse_requirements_file(path)
+
+    assert isinstance(requirements, list)
+    assert [str(r) for r in requirements] == ['foo==1.2', 'bar>=1.0', 'baz']
+    assert requirements[1].hashes == ['sha256:ab']
+    assert requirements[0].source == f'{path}:3'
+
+def test_parse_requirements_file_includes(tmp_path: Path) -> None:
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'main.req').write_text('foo\n-r sub/other.req\nbaz\n')
+    (tmp_path / 'sub' / 'other.req').write_text('bar\n--requirement=last.req\n')
+    (tmp_path / 'sub' / 'last.req').write_text('qux\n')
+
+    requirements: list[Requirement] | Error = parse_requirements_file(tmp_path / 'main.req')
+
+    assert isinstance(requirements, list)
+    assert [r.name for r in requirements] == ['foo', 'bar', 'qux', 'baz']
+
+def test_parse_requirements_file_include_cycle(tmp_path: Path) -> None:
+    (tmp_path / 'a.req').write_text('foo\n-r b.req\n')
+    (tmp_path / 'b.req').write_text('bar\n-r a.req\n')
+
+    requirements: list[Requirement] | Error = parse_requirements_file(tmp_path / 'a.req')
+
+    assert isinstance(requirements, list)
+    assert [r.name for r in requirements] == ['foo', 'bar']
+
+def test_parse_requirements_file_errors(tmp_path: Path) -> None:
+    (tmp_path / 'main.req').write_text('foo\n-r missing.req\n')
+    (tmp_path / 'invalid.req').write_text('foo\nbar>1\n')
+
+    assert isinstance(parse_requirements_file(tmp_path / 'missing.req'), FileOrDirectoryNotFoundError)
+    assert isinstance(parse_requirements_file(tmp_path / 'main.req'), FileOrDirectoryNotFoundError)
+    assert isinstance(parse_requirements_file(tmp_path / 'invalid.req'), InvalidRequirementError)
+
+# ############################### Resolved packages ##############################
+
+def test_dependency_specs() -> None:
+    metadata: dict = {'package': {'name': 'foo', 'version': '1.0'}, 'dependencies': {'bar': '^1.0', 'mathscript': '^1.0'}}
+
+    assert dependency_specs(metadata) == {'bar': '^1.0'}
+    assert dependency_specs({'dependencies': None}) == {}
@@ -0,0 +1,72 @@
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+import time
+
+import pytest
+
+from sources import *
+from scheduler import *
+
+# ############################## Version resolution ##############################
+
+versions: list[str] = ['1.0', '1.2', '2.0.1']
+
+@pytest.mark.parametrize('version, resolved', [
+    ('latest', '2.0.1'),
+    ('1.2', '1.2'),
+    ('1.2.0', '1.2'), # padded like the index pads it
+    ('~1', '1.2'),
+    ('~2.0', '2.0.1'),
+    ('^1.2', '2.0.1'),
+    ('_1.0', '1.0'),
+    ('3.0', None),
+    ('^3.0', None),
+    ('~3', None),
+])
+def test_resolve_version(version: str, resolved: str | None) -> None:
+    assert resolve_version(versions, version) == resolved
+
+def test_resolve_version_without_versions() -> None:
+    assert resolve_version([], 'latest') is None
+
+# ############################### Request scheduler ##############################
+
+@pytest.mark.parametrize('value, delay', [
+    ('5', 5.0),
+    ('0.5', 0.5),
+    ('-3', 0.0),
+    ('Wed, 21 Oct 2015 07:28:00 GMT', 0.0), # in the past
+    (None, None),
+    ('', None),
+    ('soon', None),
+])
+def test_parse_retry_after(value: str | None, delay: float | None) -> None:
+    assert parse_retry_after(value) == delay
+
+def test_parse_retry_after_date() -> None:
+    delay: float | None = parse_retry_after(format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True))
+
+    assert delay is not None and 25 < delay <= 30
+
+def test_scheduler_backs_off_when_throttled() -> None:
+    scheduler: RequestScheduler = RequestScheduler(10, None, 16)
+    limit: float = scheduler.limit
+
+    scheduler.record(429, 0.1, '2')
+
+    assert scheduler.limit == limit / 2
+    assert scheduler.retry_at > time.monotonic() + 1
+
+def test_scheduler_slots_bound_concurrency() -> None:
+    scheduler: RequestScheduler = RequestScheduler(None, None, 2, initial_concurrency=2)
+
+    scheduler.acquire()
+    scheduler.acquire()
+    assert scheduler._delay(metadata_priority) is None
+
+    scheduler.release()
+    assert scheduler._delay(metadata_priority) == 0
+    with scheduler.slot():
+        assert scheduler.in_flight == 2
+
+    assert scheduler.in_flight == 1
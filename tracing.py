@@ -0,0 +1,177 @@
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+import functools
+import threading
+import json
+import time
+import os
+import sys
+
+# ################################### Tracing ####################################
+
+class Span:
+    """A timed operation, with its attributes and the number of bytes it handled."""
+
+    def __init__(self, name: str, attributes: dict[str, Any]) -> None:
+        """Initialize a span.
+
+        Args:
+        name (str): The name of the operation (e.g. `metadata.fetch`).
+        attributes (dict[str, Any]): The attributes of the operation (e.g. the package name).
+        """
+
+        self.name: str = name
+        self.attributes: dict[str, Any] = attributes
+        self.bytes: int = 0
+        self.start: float = time.perf_counter()
+        self.end: float | None = None
+        self.thread_id: int = threading.get_ident()
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def add_bytes(self, count: int) -> None:
+        self.bytes += count
+
+class _NullSpan(Span):
+    """The span given when tracing is disabled, it records nothing."""
+
+    def __init__(self) -> None:
+        pass
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def add_bytes(self, count: int) -> None:
+        pass
+
+class Tracer:
+    """Records the spans of the hot paths when profiling is enabled."""
+
+    def __init__(self) -> None:
+        """Initialize a disabled tracer."""
+
+        self.enabled: bool = False
+        self.spans: list[Span] = []
+        self.origin: float = time.perf_counter()
+        self._null_span: _NullSpan = _NullSpan()
+        self._lock: threading.Lock = threading.Lock()
+
+    def enable(self) -> None:
+        self.enabled = True
+        self.origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """Times the operation run in the `with` block.
+
+        Args:
+        name (str): The name of the operation.
+        **attributes (Any): The attributes of the operation.
+
+        Yields:
+        Span: The span, to add attributes and byte counts to
+        """
+
+        if not self.enabled:
+            yield self._null_span
+            return
+
+        span: Span = Span(name, attributes)
+        try:
+            yield span
+        finally:
+            span.end = time.perf_counter()
+            with self._lock:
+                self.spans.append(span)
+
+    def traced(self, name: str) -> Callable:
+        """Decorator timing every call of a function, its first argument is recorded as `argument`.
+
+        Args:
+        name (str): The name of the operation.
+
+        Returns:
+        Callable: The decorator
+        """
+
+        def decorator(function: Callable) -> Callable:
+            @functools.wraps(function)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not self.enabled:
+                    return function(*args, **kwargs)
+
+                with self.span(name, **({'argument': args[0]} if args else {})):
+                    return function(*args, **kwargs)
+            return wrapper
+
+        return decorator
+
+    def summary(self) -> str:
+        """Summarizes the recorded spans by operation.
+
+        Returns:
+        str: The summary table
+        """
+
+        rows: dict[str, list[Span]] = {}
+        for span in self.spans:
+            rows.setdefault(span.name, []).append(span)
+
+        lines: list[str] = [f'{"Operation":<24} {"Count":>6} {"Total (ms)":>11} {"Mean (ms)":>10} {"Max (ms)":>10} {"Bytes":>12} {"MB/s":>8}']
+        lines.append('-' * len(lines[0]))
+
+        for name, spans in sorted(rows.items(), key=lambda item: -sum(s.duration for s in item[1])):
+            total: float = sum(s.duration for s in spans)
+            total_bytes: int = sum(s.bytes for s in spans)
+            throughput: str = f'{total_bytes / total / 1e6:.2f}' if total_bytes and total else '-'
+            lines.append(f'{name:<24} {len(spans):>6} {total * 1000:>11.1f} {total / len(spans) * 1000:>10.1f} {max(s.duration for s in spans) * 1000:>10.1f} {total_bytes or "-":>12} {throughput:>8}')
+
+        lines.append(f'\nWall time: {(time.perf_counter() - self.origin) * 1000:.1f} ms')
+
+        return '\n'.join(lines)
+
+    def export_chrome_trace(self, path: Path) -> None:
+        """Exports the recorded spans in the Chrome trace event format (`chrome://tracing`, Perfetto).
+
+        Args:
+        path (Path): The path of the JSON file to write.
+        """
+
+        events: list[dict] = [
+            {
+                'name': span.name,
+                'ph': 'X',
+                'ts': (span.start - self.origin) * 1e6,
+                'dur': span.duration * 1e6,
+                'pid': os.getpid(),
+                'tid': span.thread_id,
+                'args': {**{k: str(v) for k, v in span.attributes.items()}, 'bytes': span.bytes},
+            }
+            for span in self.spans
+        ]
+
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def report(self, output: Path | None = None) -> None:
+        """Prints the summary on stderr and exports the trace if asked.
+
+        Args:
+        output (Path | None, optional): The path of the Chrome trace file to write. Defaults to None
+        """
+
+        print('\n' + self.summary(), file=sys.stderr)
+
+        if output is not None:
+            self.export_chrome_trace(output)
+            print(f'Trace written to "{output}".', file=sys.stderr)
+
+tracer: Tracer = Tracer()
+span = tracer.span
+traced = tracer.traced
@@ -0,0 +1,159 @@
+from pathlib import Path
+from typing import Callable
+import uuid
+import os
+import re
+
+from errors import *
+
+# ################################## Variables ###################################
+
+# Every installed version of a package is kept in `<packages_dir>/.versions/<name>/`,
+# as a directory (`<version>/`) or, installed without extraction, as an archive
+# (`<version>.zip`). `<packages_dir>/<name>` (or `<name>.zip`) points to the active one.
+versions_dir_name: str = '.versions'
+
+# The version a package store has active, rewritten atomically on every switch
+active_file_name: str = 'active'
+
+_version_pattern: re.Pattern = re.compile(r'^\d+(\.\d+)*$')
+
+# ############################### Versioned storage ##############################
+
+def version_key(version: str) -> list[int]:
+    return [int(part) if part.isdigit() else 0 for part in version.split('.')]
+
+def store_dir(packages_dir: Path, package_name: str) -> Path:
+    """The directory holding the installed versions of a package.
+
+    Args:
+    packages_dir (Path): The directory of the installed packages (`user_packages`).
+    package_name (str): The name of the package.
+
+    Returns:
+    Path: The directory (which may not exist)
+    """
+
+    return packages_dir / versions_dir_name / package_name
+
+def stored_path(packages_dir: Path, package_name: str, version: str) -> Path | None:
+    """Gets where a version of a package is stored.
+
+    Args:
+    packages_dir (Path): The directory of the installed packages.
+    package_name (str): The name of the package.
+    version (str): The version.
+
+    Returns:
+    Path | None: Its directory or archive, None if it isn't stored
+    """
+
+    store: Path = store_dir(packages_dir, package_name)
+
+    for path in (store / version, store / f'{version}.zip'):
+        if path.exists():
+            return path
+
+    return None
+
+def stored_versions(packages_dir: Path, package_name: str) -> list[str]:
+    """Lists the versions of a package in its store, oldest first.
+
+    Where symlinks aren't available, the active version is moved out of the store
+    and isn't listed.
+
+    Args:
+    packages_dir (Path): The directory of the installed packages.
+    package_name (str): The name of the package.
+
+    Returns:
+    list[str]: The versions
+    """
+
+    store: Path = store_dir(packages_dir, package_name)
+    if not store.is_dir():
+        return []
+
+    versions: set[str] = {path.name.removesuffix('.zip') for path in store.iterdir()}
+
+    return sorted((v for v in versions if _version_pattern.match(v)), key=version_key)
+
+def active_version(packages_dir: Path, package_name: str) -> str | None:
+    """Gets the active version of a package from its store.
+
+    Args:
+    packages_dir (Path): The directory of the installed packages.
+    package_name (str): The name of the package.
+
+    Returns:
+    str | None: The version, None if the package has no store (it isn't installed, or was installed before versioned storage)
+    """
+
+    try:
+        return (store_dir(packages_dir, package_name) / active_file_name).read_text().strip() or None
+    except OSError:
+        return None
+
+def activate(packages_dir: Path, package_name: str, version: str, previous_version: str | None, trash: Callable[[Path], Path]) -> list[Path] | Error:
+    """Makes a stored version of a package the active one.
+
+    `<packages_dir>/<name>` (or `<name>.zip`) is replaced by a symlink to the version
+    in a single rename, so MathScript sees either version, never a missing package.
+    Where symlinks can't be created (e.g. Windows without the privilege), the version
+    is moved in place instead, and moved back to the store on the next switch.
+
+    An active version that isn't a symlink (moved in place, or installed before
+    versioned storage) goes back to the store under `previous_version`.
+
+    Args:
+    packages_dir (Path): The directory of the installed packages.
+    package_name (str): The name of the package.
+    version (str): The version to activate, it must be stored.
+    previous_version (str | None): The active version, as recorded in the install manifest.
+    trash (Callable[[Path], Path]): Moves what has to be deleted out of the way, returning its new path.
+
+    Returns:
+    list[Path] | Error: The trashed paths, to delete once done, or the error
+    """
+
+    store: Path = store_dir(packages_dir, package_name)
+    trashed: list[Path] = []
+
+    for pointer, suffix in ((packages_dir / package_name, ''), (packages_dir / f'{package_name}.zip', '.zip')):
+        if pointer.is_symlink() or not pointer.exists():
+            continue
+
+        destination: Path = store / f'{previous_version}{suffix}'
+        if previous_version is None or stored_path(packages_dir, package_name, previous_version) is not None:
+            trashed.append(trash(pointer))
+        else:
+            store.mkdir(parents=True, exist_ok=True)
+            pointer.rename(destination)
+
+    target: Path | None = stored_path(packages_dir, package_name, version)
+    if target is None:
+        return FileOrDirectoryNotFoundError(store / version)
+
+    archived: bool = target.name.endswith('.zip')
+    pointer = packages_dir / (f'{package_name}.zip' if archived else package_name)
+    other: Path = packages_dir / (package_name if archived else f'{package_name}.zip')
+
+    tmp_path: Path = packages_dir / f'.{pointer.name}.{uuid.uuid4().hex}.tmp'
+    try:
+        # Relative, so that the packages directory can be moved
+        os.symlink(Path(versions_dir_name) / package_name / target.name, tmp_path, target_is_directory=not archived)
+        os.replace(tmp_path, pointer)
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
+        if pointer.is_symlink():
+            pointer.unlink()
+        target.rename(pointer)
+
+    if other.is_symlink():
+        other.unlink()
+
+    tmp_path = store / f'.{active_file_name}.{uuid.uuid4().hex}.tmp'
+    tmp_path.write_text(version)
+    os.replace(tmp_path, store / active_file_name)
+
+    return trashed